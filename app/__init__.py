@@ -40,6 +40,38 @@ def create_app(config_name=None):
     limiter.init_app(app)
     mail.init_app(app)
     
+    # Keep the availability index in sync with bookings and blocked dates
+    from app.services.availability_index import AvailabilityIndex
+    AvailabilityIndex.init_app(app)
+    
+    # Deliver push notifications and Pusher events off the request path
+    from app.services.outbox_service import OutboxService
+    OutboxService.init_app(app)
+    
+    # Keep property_images rows in step with Property.images
+    from app.services.property_image_service import PropertyImageService
+    PropertyImageService.init_app(app)
+    
+    # Buffer listing views and write them in periodic batches
+    from app.services.view_counter import ViewCounter
+    ViewCounter.init_app(app)
+    
+    # Cache public property responses, dropped by tag on commit
+    from app.services.response_cache import ResponseCache
+    ResponseCache.init_app(app)
+    
+    # Keep property geohashes in step with their coordinates
+    from app.services.geo_index import GeoIndex
+    GeoIndex.init_app(app)
+    
+    # Normalized location keys and the city autocomplete trie
+    from app.services.location_index import LocationIndex
+    LocationIndex.init_app(app)
+    
+    # Mirror listing amenities into the indexed catalog tables
+    from app.services.amenity_service import AmenityService
+    AmenityService.init_app(app)
+    
     # Register blueprints
     register_blueprints(app)
     
@@ -9,6 +9,7 @@ from app.models.property import Property
 from app.models.booking import Booking
 from extensions import db
 from app.utils.decorators.admin_required import admin_required
+from app.utils.pagination import SortKey, CursorError, paginate_request
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -43,7 +44,7 @@ def admin_dashboard():
                 'active_hosts': active_hosts,
                 'active_guests': active_guests
             },
-            'recent_users': [user.to_dict() for user in recent_users],
+            'recent_users': [user.to_admin_dict() for user in recent_users],
             'recent_bookings': [booking.to_dict() for booking in recent_bookings]
         }), 200
         
@@ -57,18 +58,16 @@ def admin_dashboard():
 def get_all_users():
     """Get all users (admin only)"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        users = User.query.paginate(page=page, per_page=per_page, error_out=False)
+        items, pagination = paginate_request(User.query, [SortKey(User.id)])
         
         return jsonify({
-            'users': [user.to_dict(include_email=True) for user in users.items],
-            'total': users.total,
-            'pages': users.pages,
-            'current_page': page
+            'users': [user.to_admin_dict() for user in items],
+            **pagination
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -92,7 +91,7 @@ def make_user_admin(user_id):
         
         return jsonify({
             'message': f'Successfully made {user.full_name} an admin',
-            'user': user.to_dict(include_email=True)
+            'user': user.to_admin_dict()
         }), 200
         
     except Exception as e:
@@ -125,7 +124,7 @@ def remove_user_admin(user_id):
         
         return jsonify({
             'message': f'Successfully removed admin privileges from {user.full_name}',
-            'user': user.to_dict(include_email=True)
+            'user': user.to_admin_dict()
         }), 200
         
     except Exception as e:
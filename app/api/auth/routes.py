@@ -15,6 +15,7 @@ from app.models.password_reset_token import PasswordResetToken
 from app.services.email_service import EmailService
 from datetime import datetime
 from app.models.email_verification_token import EmailVerificationToken
+from app.models.device_token import DeviceToken
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -80,7 +81,7 @@ def register():
         
         return jsonify({
             'message': 'User registered successfully',
-            'user': user.to_dict(include_email=True),
+            'user': user.to_self_dict(),
             'access_token': access_token,
             'refresh_token': refresh_token
         }), 201
@@ -119,14 +120,14 @@ def login():
 
         print(jsonify({
             'message': 'Login successful',
-            'user': user.to_dict(include_email=True),
+            'user': user.to_self_dict(),
             'access_token': access_token,
             'refresh_token': refresh_token
         }), 200)
         
         return jsonify({
             'message': 'Login successful',
-            'user': user.to_dict(include_email=True),
+            'user': user.to_self_dict(),
             'access_token': access_token,
             'refresh_token': refresh_token
         }), 200
@@ -170,7 +171,7 @@ def admin_login():
         
         return jsonify({
             'message': 'Admin login successful',
-            'user': user.to_dict(include_email=True),
+            'user': user.to_self_dict(),
             'access_token': access_token,
             'refresh_token': refresh_token,
             'is_admin': True
@@ -372,7 +373,7 @@ def get_current_user():
             return jsonify({'error': 'User not found'}), 404
         
         return jsonify({
-            'user': user.to_dict(include_email=True)
+            'user': user.to_self_dict()
         }), 200
         
     except Exception as e:
@@ -417,14 +418,19 @@ def change_password():
 @auth_bp.route('/logout', methods=['POST'])
 @jwt_required()
 def logout():
-    """Logout user and clear FCM token to stop notifications"""
+    """Logout user and clear the device's FCM token to stop notifications"""
     try:
         user_id = get_jwt_identity()
         user = User.query.get(user_id)
 
-        if user:
-            # Clear the FCM token so this device stops receiving pushes
-            user.fcm_token = None
+        # Only the token this device sends: the user's other devices keep
+        # receiving pushes (older clients send none and unregister separately)
+        data = request.get_json(silent=True) or {}
+        token = data.get('fcm_token')
+        if user and token:
+            DeviceToken.query.filter_by(user_id=user.id, token=token).delete(synchronize_session=False)
+            if user.fcm_token == token:
+                user.fcm_token = None
             db.session.commit()
 
         return jsonify({
@@ -7,9 +7,13 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db, limiter
 from app.models.booking import Booking, BookingStatus
 from app.models.property import Property
+from sqlalchemy.orm import selectinload
 from datetime import datetime, date, timedelta
 from app.models.blocked_date import BlockedDate
-from app.api.firebase.routes import notify_user
+from app.services.outbox_service import OutboxService
+from app.services.calendar_service import CalendarService
+from app.services.resource_versions import ResourceVersions
+from app.utils.conditional import conditional_get
 
 bookings_bp = Blueprint('bookings', __name__)
 
@@ -41,6 +45,9 @@ def create_booking():
         check_in = datetime.strptime(data['check_in'], '%Y-%m-%d').date()
         check_out = datetime.strptime(data['check_out'], '%Y-%m-%d').date()
         
+        if check_out <= check_in:
+            return jsonify({'error': 'check_out must be after check_in'}), 400
+        
         # Check availability
         if not property.is_available(check_in, check_out):
             return jsonify({'error': 'Property not available for selected dates'}), 400
@@ -82,11 +89,14 @@ def create_booking():
 
 @bookings_bp.route('/my-bookings', methods=['GET'])
 @jwt_required()
+@conditional_get(lambda: ResourceVersions.guest_bookings(int(get_jwt_identity())), private=True)
 def get_my_bookings():
     """Get current user's bookings"""
     try:
         current_user_id = get_jwt_identity()
-        bookings = Booking.query.filter(
+        bookings = Booking.query.options(
+            selectinload(Booking.property).selectinload(Property.photos)
+        ).filter(
             Booking.guest_id == current_user_id,
             Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.COMPLETED])
         ).all()
@@ -100,7 +110,7 @@ def get_my_bookings():
         db.session.commit()
         
         return jsonify({
-            'bookings': [booking.to_dict(include_property=True) for booking in bookings]
+            'bookings': [booking.to_dict(include_property=True, include_photos=True) for booking in bookings]
         }), 200
         
     except Exception as e:
@@ -162,6 +172,7 @@ def cancel_booking(booking_id):
 
 @bookings_bp.route('/calendar', methods=['GET'])
 @jwt_required()
+@conditional_get(lambda: ResourceVersions.host_calendar(int(get_jwt_identity())), private=True)
 def get_properties_calendar():
     """Get all properties and calendar availability for the host"""
     try:
@@ -182,38 +193,23 @@ def get_properties_calendar():
         start = datetime.strptime(start_date_str, '%Y-%m-%d').date()
         end = datetime.strptime(end_date_str, '%Y-%m-%d').date()
         
+        calendar_format = request.args.get('calendar_format', 'days')
+        if calendar_format not in CalendarService.CALENDAR_FORMATS:
+            return jsonify({'error': 'calendar_format must be days or ranges'}), 400
+        
+        # Booked dates include PENDING and COMPLETED, exclude CANCELLED
+        property_calendars = CalendarService.load(
+            [property.id for property in properties],
+            start=start,
+            end=end + timedelta(days=1),
+            statuses=(BookingStatus.CONFIRMED, BookingStatus.PENDING, BookingStatus.COMPLETED)
+        )
+        
         calendars = {}
         properties_data = []
         
         for property in properties:
-            # Get booked dates (include PENDING and COMPLETED, exclude CANCELLED)
-            bookings = Booking.query.filter(
-                Booking.property_id == property.id,
-                Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PENDING, BookingStatus.COMPLETED]),
-                Booking.check_in < end,
-                Booking.check_out > start
-            ).all()
-            
-            booked_dates = []
-            for booking in bookings:
-                current = booking.check_in
-                while current < booking.check_out:
-                    booked_dates.append(current.isoformat())
-                    current = current + timedelta(days=1)
-            
-            # Get blocked dates
-            blocked_dates_query = BlockedDate.query.filter(
-                BlockedDate.property_id == property.id,
-                BlockedDate.blocked_date >= start,
-                BlockedDate.blocked_date <= end
-            ).all()
-            
-            blocked_dates = [bd.blocked_date.isoformat() for bd in blocked_dates_query]
-            
-            calendars[str(property.id)] = {
-                'booked_dates': booked_dates,
-                'blocked_dates': blocked_dates
-            }
+            calendars[str(property.id)] = property_calendars[property.id].to_dict(calendar_format)
             
             # Add property data
             properties_data.append({
@@ -245,6 +241,7 @@ Add these routes to your bookings routes.py file
 
 @bookings_bp.route('/host-bookings', methods=['GET'])
 @jwt_required()
+@conditional_get(lambda: ResourceVersions.host_bookings(int(get_jwt_identity())), private=True)
 def get_host_bookings():
     """Get all bookings for the host's properties, categorized by status"""
     try:
@@ -265,14 +262,17 @@ def get_host_bookings():
             db.session.commit()
         
         # Get all bookings for this host
-        bookings = Booking.query.filter_by(host_id=current_user_id).order_by(Booking.created_at.desc()).all()
+        bookings = Booking.query.options(
+            selectinload(Booking.property).selectinload(Property.photos),
+            selectinload(Booking.guest),
+        ).filter_by(host_id=current_user_id).order_by(Booking.created_at.desc()).all()
         
         pending = []
         ongoing = []
         past = []
         
         for booking in bookings:
-            booking_data = booking.to_dict(include_property=True, include_guest=True)
+            booking_data = booking.to_dict(include_property=True, include_guest=True, include_photos=True)
             
             if booking.status == BookingStatus.PENDING:
                 pending.append(booking_data)
@@ -327,9 +327,7 @@ def confirm_booking(booking_id):
         
         booking.status = BookingStatus.CONFIRMED
         booking.updated_at = datetime.utcnow()
-        db.session.commit()
-
-        notify_user(
+        OutboxService.enqueue_push(
             booking.guest_id,
             'Booking Confirmed! ✅',
             f'Your booking at {booking.property.title} has been confirmed.',
@@ -340,6 +338,7 @@ def confirm_booking(booking_id):
                 'property_id': str(booking.property_id),
             }
         )
+        db.session.commit()
         
         return jsonify({
             'message': 'Booking confirmed successfully',
@@ -373,9 +372,7 @@ def reject_booking(booking_id):
         booking.status = BookingStatus.REJECTED
         booking.cancellation_reason = data.get('reason', 'Rejected by host')
         booking.updated_at = datetime.utcnow()
-        db.session.commit()
-
-        notify_user(
+        OutboxService.enqueue_push(
             booking.guest_id,
             'Booking Update',
             f'Your booking at {booking.property.title} was not approved.',
@@ -386,6 +383,7 @@ def reject_booking(booking_id):
                 'property_id': str(booking.property_id),
             }
         )
+        db.session.commit()
         
         return jsonify({
             'message': 'Booking rejected',
@@ -1,9 +1,10 @@
 from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import firebase_admin
-from firebase_admin import credentials, messaging, app_check
+from firebase_admin import credentials, app_check
 from app.models import User
 from extensions import db
+from app.models.device_token import DeviceToken
 from datetime import datetime
 from functools import wraps
 import os
@@ -29,68 +30,6 @@ if not firebase_admin._apps:
     else:
         print(f"⚠️ Warning: Firebase credentials not found at {cred_path}")
 
-def send_push_notification(fcm_token: str, title: str, body: str, data: dict = None):
-    """
-    Sends a "Data-Only" message to Android (to force a custom popup)
-    and a standard Notification to iOS.
-    """
-    if not fcm_token:
-        return None
-    
-    # 1. Prepare Data: FCM requires all data values to be strings
-    clean_data = {k: str(v) for k, v in (data or {}).items()}
-    
-    # 2. Add Title/Body to Data: 
-    # This allows your Flutter background handler to read them on Android
-    clean_data['title'] = title
-    clean_data['body'] = body
-    
-    try:
-        message = messaging.Message(
-            token=fcm_token,
-            data=clean_data,
-            android=messaging.AndroidConfig(
-                priority='high',
-            ),
-
-            # --- iOS CONFIG ---
-            # Apple still needs the specific 'aps' block to show a notification.
-            apns=messaging.APNSConfig(
-                payload=messaging.APNSPayload(
-                    aps=messaging.Aps(
-                        alert=messaging.ApsAlert(
-                            title=title,
-                            body=body,
-                        ),
-                        sound="default",
-                        content_available=True # Helps wake up the app in background
-                    )
-                )
-            )
-        )
-        return messaging.send(message)
-        
-    except Exception as e:
-        print(f"FCM send error: {e}")
-        return None
-
-
-def notify_user(user_id: int, title: str, body: str, data: dict = None):
-    user = User.query.get(user_id)
-    
-    # 1. Check if user exists
-    if not user:
-        print(f"❌ Notify User: User {user_id} not found.")
-        return None
-        
-    # 2. Check if token exists
-    if not user.fcm_token:
-        print(f"⚠️ Notify User: User {user_id} has NO FCM TOKEN in DB.")
-        return None
-
-    print(f"🚀 Sending push to User {user_id} with token: {user.fcm_token[:10]}...")
-    return send_push_notification(user.fcm_token, title, body, data)
-
 
 def require_app_check(f):
     @wraps(f)
@@ -111,7 +50,7 @@ def require_app_check(f):
 @firebase_bp.route('/register-token', methods=['POST'])
 @jwt_required()
 def register_fcm_token():
-    """Saves the FCM token to the user's profile for later messaging"""
+    """Saves the device's FCM token; a user can have one per device"""
     user_id = int(get_jwt_identity())
     data = request.get_json()
     token = data.get('fcm_token')
@@ -121,12 +60,31 @@ def register_fcm_token():
 
     user = User.query.get(user_id)
     if user:
+        DeviceToken.register(user.id, token, data.get('platform'))
+        # Most recent token, kept for older readers of users.fcm_token
         user.fcm_token = token
         db.session.commit()
         return jsonify({'success': True, 'message': 'FCM Token updated'}), 200
     
     return jsonify({'error': 'User not found'}), 404
 
+
+@firebase_bp.route('/unregister-token', methods=['POST'])
+@jwt_required()
+def unregister_fcm_token():
+    """Stops pushes to one device"""
+    user_id = int(get_jwt_identity())
+    data = request.get_json() or {}
+    token = data.get('fcm_token')
+    
+    if not token:
+        return jsonify({'error': 'No token provided'}), 400
+
+    DeviceToken.query.filter_by(user_id=user_id, token=token).delete(synchronize_session=False)
+    User.query.filter_by(id=user_id, fcm_token=token).update({'fcm_token': None}, synchronize_session=False)
+    db.session.commit()
+    return jsonify({'success': True, 'message': 'FCM Token removed'}), 200
+
 # --- 3. APP CHECK VERIFICATION ENDPOINT ---
 @firebase_bp.route('/verify-device', methods=['POST'])
 @jwt_required()
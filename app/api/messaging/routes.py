@@ -5,8 +5,11 @@ from app.models.message import Message, Conversation
 from datetime import datetime
 import logging
 import traceback
-from app.api.firebase.routes import notify_user
+from app.services.outbox_service import OutboxService
 from app.models.user import User
+from app.utils.pagination import (
+    SortKey, CursorError, MAX_PER_PAGE, keyset_filter, decode_cursor, encode_cursor, wants_cursor_pagination
+)
 
 # Setup logging
 logging.basicConfig(level=logging.DEBUG)
@@ -14,36 +17,51 @@ logger = logging.getLogger(__name__)
 
 messaging_bp = Blueprint('messaging', __name__)
 
+MESSAGE_PAGE_SIZE = 50
+
 
 @messaging_bp.route('/conversations/get', methods=['GET'])
 @jwt_required()
 def get_conversations():
+    """Inbox: one row per conversation with its last message, unread count and block flags"""
     user_id = int(get_jwt_identity())
-    current_user = User.query.get(user_id)
 
-    convos = Conversation.query.filter(
-        (Conversation.user1_id == user_id) | (Conversation.user2_id == user_id)
-    ).order_by(Conversation.updated_at.desc()).all()
+    query = Conversation.inbox_query(user_id)
+    sort_keys = [
+        SortKey(Conversation.updated_at, descending=True),
+        SortKey(Conversation.id, descending=True),
+    ]
+
+    # Opt-in cursor pagination by updated_at; without it the full inbox is returned
+    pagination = {}
+    limit = None
+    if wants_cursor_pagination():
+        limit = max(1, min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE))
+        cursor = request.args.get('cursor')
+        if cursor:
+            try:
+                query = query.filter(keyset_filter(sort_keys, decode_cursor(sort_keys, cursor)))
+            except CursorError as e:
+                return jsonify({'error': str(e)}), 400
+
+    query = query.order_by(*[key.order_clause() for key in sort_keys])
+    rows = query.limit(limit + 1).all() if limit else query.all()
+
+    if limit:
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort_keys, rows[-1][0])
+        pagination = {'next_cursor': next_cursor, 'has_more': next_cursor is not None, 'per_page': limit}
 
     results = []
-    for c in convos:
-        data = c.to_dict(current_user_id=user_id)
-        
-        other_user_id = c.user2_id if c.user1_id == user_id else c.user1_id
-        
-        is_blocked_by_me = any(u.id == other_user_id for u in current_user.blocked)
-
-        other_user = User.query.get(other_user_id)
-        is_blocking_me = False
-        if other_user:
-            is_blocking_me = any(u.id == user_id for u in other_user.blocked)
-
-        data['is_blocked_by_me'] = is_blocked_by_me
-        data['is_blocking_me'] = is_blocking_me
-        
+    for convo, user1, user2, last_message, is_blocked_by_me, is_blocking_me in rows:
+        data = convo.to_inbox_dict(user_id, user1, user2, last_message)
+        data['is_blocked_by_me'] = bool(is_blocked_by_me)
+        data['is_blocking_me'] = bool(is_blocking_me)
         results.append(data)
 
-    return jsonify({'conversations': results})
+    return jsonify({'conversations': results, **pagination})
 
 @messaging_bp.route('/conversations/<int:convo_id>/mark_read', methods=['POST'])
 @jwt_required()
@@ -51,15 +69,8 @@ def mark_conversation_read(convo_id):
     user_id = int(get_jwt_identity())
     convo = Conversation.query.get_or_404(convo_id)
     
-    # 1. Get the current total number of messages
-    total_messages = convo.messages.count()
-    
-    # 2. Update the specific user's read count
-    if user_id == convo.user1_id:
-        convo.user1_read_count = total_messages
-    elif user_id == convo.user2_id:
-        convo.user2_read_count = total_messages
-    else:
+    # Read state comes from the denormalized counters, no message scan
+    if not convo.mark_read(user_id):
         return jsonify({'error': 'Unauthorized'}), 403
         
     db.session.commit()
@@ -70,24 +81,57 @@ def mark_conversation_read(convo_id):
 @messaging_bp.route('/conversations/<int:convo_id>/messages', methods=['GET'])
 @jwt_required()
 def get_messages(convo_id):
+    """
+    Message history, newest first, paginated by message id
+    
+    Query params:
+        before_id: older messages than this id (infinite scroll)
+        after_id: newer messages than this id (polling for new messages)
+        limit: page size (default 50, max 100)
+    """
     user_id = int(get_jwt_identity())
     convo = Conversation.query.get_or_404(convo_id)
     
     if user_id not in [convo.user1_id, convo.user2_id]:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    messages = Message.query.filter_by(conversation_id=convo_id)\
-        .order_by(Message.created_at.desc()).all()
+    before_id = request.args.get('before_id', type=int)
+    after_id = request.args.get('after_id', type=int)
+    limit = max(1, min(request.args.get('limit', MESSAGE_PAGE_SIZE, type=int), MAX_PER_PAGE))
+    
+    if before_id and after_id:
+        return jsonify({'error': 'Use either before_id or after_id, not both'}), 400
+    
+    query = Message.query.filter(Message.conversation_id == convo_id)
+    
+    if after_id:
+        # Oldest unseen first so gaps are filled in order, returned newest first
+        messages = query.filter(Message.id > after_id).order_by(Message.id.asc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = list(reversed(messages[:limit]))
+    else:
+        if before_id:
+            query = query.filter(Message.id < before_id)
+        messages = query.order_by(Message.id.desc()).limit(limit + 1).all()
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+    
+    # Senders are always participants: side-load both once instead of per message
+    participants = User.query.filter(User.id.in_([convo.user1_id, convo.user2_id])).all()
     
     return jsonify({
-        'messages': [m.to_dict() for m in messages]
+        'messages': [m.to_dict(include_sender=False) for m in messages],
+        'users': {str(u.id): u.to_public_dict() for u in participants},
+        'has_more': has_more,
+        'oldest_id': messages[-1].id if messages else None,
+        'newest_id': messages[0].id if messages else None,
     })
 
 
 @messaging_bp.route('/conversations', methods=['POST'])
 @jwt_required()
 def create_conversation():
-    current_user_id = get_jwt_identity()
+    current_user_id = int(get_jwt_identity())
     data = request.get_json()
     
     other_user_id = data.get('user_id')
@@ -117,25 +161,23 @@ def create_conversation():
             property_id=property_id
         )
         db.session.add(conversation)
-        db.session.commit()
+        db.session.flush()
     
     # 2. Logic to handle the initial message
-    response_data = {'conversation': conversation.to_dict()}
-    
+    new_message = None
     if content:
-        new_message = Message(
-            conversation_id=conversation.id,
-            sender_id=current_user_id,
-            content=content
-        )
-        db.session.add(new_message)
-        db.session.commit()
-        
-        # 3. Add message to response so Provider can update UI
-        response_data['message'] = new_message.to_dict()
+        new_message = conversation.add_message(current_user_id, content)
         
         # Optional: Trigger Pusher event here so the receiver gets it immediately
         # pusher_client.trigger(...) 
+    
+    db.session.commit()
+    
+    response_data = {'conversation': conversation.to_dict(current_user_id=current_user_id)}
+    
+    if new_message:
+        # 3. Add message to response so Provider can update UI
+        response_data['message'] = new_message.to_dict()
 
     return jsonify(response_data), 201
 
@@ -162,32 +204,8 @@ def send_message():
             return jsonify({'error': 'Unauthorized'}), 403
         
 
-        convo = Conversation.query.get_or_404(convo_id)
-    
-        total_messages = convo.messages.count()
-    
-        if sender_id == convo.user1_id:
-            convo.user1_read_count = total_messages
-        elif sender_id == convo.user2_id:
-            convo.user2_read_count = total_messages
-
-        message = Message(
-            conversation_id=convo_id,
-            sender_id=sender_id,
-            content=content
-        )
-        db.session.add(message)
-        convo.updated_at = datetime.utcnow()
-        db.session.commit()
-
-        new_total = convo.messages.count()
-        
-        if sender_id == convo.user1_id:
-            convo.user1_read_count = new_total
-        elif sender_id == convo.user2_id:
-            convo.user2_read_count = new_total
-            
-        db.session.commit()
+        # Message insert, counter updates and outbound events share one transaction
+        message = convo.add_message(sender_id, content)
 
         # Determine recipient
         recipient_id = convo.user2_id if convo.user1_id == sender_id else convo.user1_id
@@ -196,8 +214,8 @@ def send_message():
         sender = User.query.get(sender_id)
         sender_name = sender.username or sender.first_name or "Someone"
     
-        # Send push notification
-        notify_user(
+        # Push notification and Pusher event are delivered by the outbox workers
+        OutboxService.enqueue_push(
             user_id=recipient_id,
             title=sender_name,
             body=content[:100],
@@ -206,17 +224,12 @@ def send_message():
                 "conversation_id": str(convo_id),
                 "sender_id": str(sender_id),
                 "id": message.id
-            }
+            },
+            collapse_key=f"convo_{convo_id}"
         )
+        OutboxService.enqueue_pusher(f"convo_{convo_id}", 'new_message', message.to_dict())
 
-        # Pusher
-        try:
-            channel_name = f"convo_{convo_id}"
-            pusher_client.trigger(channel_name, 'new_message', message.to_dict())
-            logger.info(f"Pusher event triggered on channel {channel_name}")
-        except Exception as e:
-            logger.error(f"Pusher Error: {e}")
-            logger.error(traceback.format_exc())
+        db.session.commit()
 
         return jsonify({'message': message.to_dict()}), 201
 
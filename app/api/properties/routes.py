@@ -2,94 +2,262 @@
 Property Routes
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db, limiter
 from app.models.property import Property, PropertyStatus, PropertyType
 from app.models.user import User, UserRole
+from app.models.booking import Booking
+from app.models.blocked_date import BlockedDate
+from sqlalchemy.orm import selectinload
 from datetime import datetime
-from app.api.upload.routes import upload_property_images_internal
+from app.api.upload.routes import upload_property_images_internal, redeem_property_uploads
+from app.services.upload_grant_service import UploadGrantError
 from app.services.s3_service import S3Service
+from app.services.image_pipeline import ImageUploadError
+from app.services.calendar_service import CalendarService, ACTIVE_STATUSES
+from app.services.availability_index import AvailabilityIndex
+from app.services.view_counter import ViewCounter
+from app.services.response_cache import (
+    ResponseCache, cached_response, property_tag, user_tag, LISTS_TAG, AVAILABILITY_TAG
+)
+from app.services.resource_versions import ResourceVersions
+from app.services.geo_index import GeoIndex, MAX_RADIUS_KM, CLUSTER_THRESHOLD
+from app.services.location_index import LocationIndex, location_key, prefix_filter
+from app.services.amenity_service import AmenityService
+from app.services.search_facets import SearchFacets
+from app.utils.pagination import (
+    SortKey, CursorError, paginate_request, wants_cursor_pagination, MAX_PER_PAGE
+)
+from app.utils.conditional import conditional_get
 import json
 
 properties_bp = Blueprint('properties', __name__)
 
+# /nearby search radius when only lat/lng are given
+DEFAULT_NEARBY_RADIUS_KM = 25
+
+
+def filter_available(query, check_in, check_out):
+    """
+    Restrict a property query to listings bookable for [check_in, check_out)
+    
+    Uses NOT EXISTS anti-joins so the whole search stays a single query
+    backed by the bookings and blocked_dates composite indexes.
+    """
+    nights = (check_out - check_in).days
+    
+    overlapping_booking = db.session.query(Booking.id).filter(
+        Booking.property_id == Property.id,
+        Booking.status.in_(ACTIVE_STATUSES),
+        Booking.check_in < check_out,
+        Booking.check_out > check_in,
+    ).exists()
+    
+    blocked_day = db.session.query(BlockedDate.id).filter(
+        BlockedDate.property_id == Property.id,
+        BlockedDate.blocked_date >= check_in,
+        BlockedDate.blocked_date < check_out,
+    ).exists()
+    
+    return query.filter(
+        ~overlapping_booking,
+        ~blocked_day,
+        db.or_(Property.min_nights.is_(None), Property.min_nights <= nights),
+        db.or_(Property.max_nights.is_(None), Property.max_nights >= nights),
+    )
+
+
+def tag_properties(properties):
+    """Tag a cached response with the listings (and hosts) it shows"""
+    ResponseCache.tag(LISTS_TAG, *[property_tag(p.id) for p in properties],
+                      *{user_tag(p.host_id) for p in properties})
+
+
+class SearchError(ValueError):
+    """Invalid search parameters"""
+
+
+# Query parameters that narrow the listing search (and so its facets)
+SEARCH_PARAMS = (
+    'city', 'country', 'property_type', 'min_price', 'max_price', 'bedrooms',
+    'guests', 'host_id', 'amenities', 'check_in', 'check_out',
+)
+
+
+def search_query():
+    """
+    Active listings matching the search filters in the query string
+    
+    Returns:
+        (query, check_in, check_out); the dates are None without a stay
+    
+    Raises:
+        SearchError: Unknown property type, or stay dates that are
+            malformed, incomplete or reversed
+    """
+    city = request.args.get('city')
+    country = request.args.get('country')
+    property_type = request.args.get('property_type')
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    bedrooms = request.args.get('bedrooms', type=int)
+    guests = request.args.get('guests', type=int)
+    host_id = request.args.get('host_id', type=int)
+    amenities = request.args.getlist('amenities')  # NEW: Get list of amenities
+    check_in_str = request.args.get('check_in')
+    check_out_str = request.args.get('check_out')
+    
+    check_in = check_out = None
+    if check_in_str or check_out_str:
+        if not check_in_str or not check_out_str:
+            raise SearchError('check_in and check_out must be provided together')
+        
+        try:
+            check_in = datetime.strptime(check_in_str, '%Y-%m-%d').date()
+            check_out = datetime.strptime(check_out_str, '%Y-%m-%d').date()
+        except ValueError:
+            raise SearchError('check_in and check_out must be dates (YYYY-MM-DD)')
+        
+        if check_out <= check_in:
+            raise SearchError('check_out must be after check_in')
+    
+    query = Property.query.filter_by(status=PropertyStatus.ACTIVE)
+
+    if host_id:
+        query = query.filter(Property.host_id == host_id)
+    
+    # Prefix match on the normalized keys ("lah" and "LAHORE" both find Lahore)
+    if location_key(city):
+        query = query.filter(prefix_filter(Property.city_key, city))
+    
+    if location_key(country):
+        query = query.filter(prefix_filter(Property.country_key, country))
+    
+    if property_type:
+        try:
+            query = query.filter_by(property_type=PropertyType(property_type))
+        except ValueError:
+            raise SearchError(f'Unknown property_type: {property_type}')
+    
+    if min_price:
+        query = query.filter(Property.price_per_night >= min_price)
+    
+    if max_price:
+        query = query.filter(Property.price_per_night <= max_price)
+    
+    if bedrooms:
+        query = query.filter(Property.bedrooms >= bedrooms)
+    
+    if guests:
+        query = query.filter(Property.max_guests >= guests)
+    
+    # Listings with every requested amenity, from the indexed catalog table
+    amenity_condition = AmenityService.condition(amenities)
+    if amenity_condition is not None:
+        query = query.filter(amenity_condition)
+    
+    # Exclude listings that are booked, blocked or outside their stay limits
+    if check_in:
+        query = filter_available(query, check_in, check_out)
+    
+    return query, check_in, check_out
+
 
 @properties_bp.route('/', methods=['GET'])
 @limiter.limit("100 per hour")
 def get_properties():
-    """Get all properties with filters"""
+    """
+    Get all properties with filters
+    
+    facets=true adds facet counts to the page; facets=only returns just the
+    counts.
+    """
+    if request.args.get('facets') == 'only':
+        return property_facets()
+    return property_listings()
+
+
+@cached_response('properties')
+def property_listings():
+    """A page of listings matching the search filters"""
     try:
-        # Pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
-        
-        # Filters
-        city = request.args.get('city')
-        country = request.args.get('country')
-        property_type = request.args.get('property_type')
-        min_price = request.args.get('min_price', type=float)
-        max_price = request.args.get('max_price', type=float)
-        bedrooms = request.args.get('bedrooms', type=int)
-        guests = request.args.get('guests', type=int)
-        host_id = request.args.get('host_id', type=int)
-        amenities = request.args.getlist('amenities')  # NEW: Get list of amenities
-        
-        # Build query
-        query = Property.query.filter_by(status=PropertyStatus.ACTIVE)
-
-        if host_id:
-            query = query.filter(Property.host_id == host_id)
-        
-        if city:
-            query = query.filter(Property.city.ilike(f'%{city}%'))
-        
-        if country:
-            query = query.filter(Property.country.ilike(f'%{country}%'))
-        
-        if property_type:
-            query = query.filter_by(property_type=PropertyType(property_type))
-        
-        if min_price:
-            query = query.filter(Property.price_per_night >= min_price)
-        
-        if max_price:
-            query = query.filter(Property.price_per_night <= max_price)
+        calendar_format = request.args.get('calendar_format', 'days')
         
-        if bedrooms:
-            query = query.filter(Property.bedrooms >= bedrooms)
+        if calendar_format not in CalendarService.CALENDAR_FORMATS:
+            return jsonify({'error': 'calendar_format must be days or ranges'}), 400
         
-        if guests:
-            query = query.filter(Property.max_guests >= guests)
-        
-        # NEW: Filter by amenities
-        if amenities:
-            for amenity in amenities:
-                query = query.filter(Property.amenities.contains(amenity))
+        query, check_in, check_out = search_query()
         
         # Sort
         sort_by = request.args.get('sort_by', 'created_at')
         sort_order = request.args.get('sort_order', 'desc')
+        descending = sort_order == 'desc'
         
         if sort_by == 'price':
-            query = query.order_by(Property.price_per_night.desc() if sort_order == 'desc' else Property.price_per_night.asc())
+            sort_column = SortKey(Property.price_per_night, descending)
         elif sort_by == 'rating':
-            query = query.order_by(Property.average_rating.desc() if sort_order == 'desc' else Property.average_rating.asc())
+            sort_column = SortKey(Property.average_rating, descending, default=0.0)
         else:
-            query = query.order_by(Property.created_at.desc() if sort_order == 'desc' else Property.created_at.asc())
+            sort_column = SortKey(Property.created_at, descending)
+        sort_keys = [sort_column, SortKey(Property.id, descending)]
+        
+        # Paginate (page/per_page, or opt-in cursor)
+        listings = query.options(selectinload(Property.host), selectinload(Property.photos))
+        items, pagination = paginate_request(listings, sort_keys)
+        
+        # Load calendars for the whole page at once
+        calendars = AvailabilityIndex.calendars([prop.id for prop in items])
+        
+        tag_properties(items)
+        if check_in:
+            ResponseCache.tag(AVAILABILITY_TAG)
+        
+        properties = []
+        for prop in items:
+            prop_data = prop.to_dict(include_host=True, include_calendar=True,
+                                     calendar=calendars[prop.id], calendar_format=calendar_format,
+                                     image_view='card', include_photos=True)
+            if check_in:
+                prop_data['pricing'] = prop.calculate_total_price(check_in, check_out)
+            properties.append(prop_data)
+        
+        response = {
+            'properties': properties,
+            **pagination
+        }
+        if request.args.get('facets') == 'true':
+            # Counts cover every match, not just this page
+            ResponseCache.tag(LISTS_TAG)
+            response['facets'] = SearchFacets.compute(query)
         
-        # Paginate
-        paginated_properties = query.paginate(page=page, per_page=per_page, error_out=False)
+        return jsonify(response), 200
         
-        properties = [prop.to_dict(include_host=True, include_calendar=True) for prop in paginated_properties.items]
+    except (SearchError, CursorError) as e:
+        return jsonify({'error': str(e)}), 400
         
-        return jsonify({
-            'properties': properties,
-            'total': paginated_properties.total,
-            'pages': paginated_properties.pages,
-            'current_page': page,
-            'per_page': per_page
-        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@cached_response('property-facets', params=SEARCH_PARAMS)
+def property_facets():
+    """
+    Facet counts for the search filters
+    
+    Cached per normalized filter set; paging and sorting don't change them.
+    """
+    try:
+        query, check_in, _ = search_query()
+        
+        ResponseCache.tag(LISTS_TAG)
+        if check_in:
+            ResponseCache.tag(AVAILABILITY_TAG)
+        
+        return jsonify({'facets': SearchFacets.compute(query)}), 200
+        
+    except SearchError as e:
+        return jsonify({'error': str(e)}), 400
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -99,17 +267,33 @@ def get_properties():
 @limiter.limit("100 per hour")
 def get_property(property_id):
     """Get single property by ID"""
+    response = make_response(property_detail(property_id=property_id))
+    # Counted even when the response comes from the cache or is a 304
+    # (buffered, so the detail view stays read-only); unknown ids never
+    # reach the buffer
+    if response.status_code in (200, 304):
+        ViewCounter.record(property_id)
+    return response
+
+
+@conditional_get(ResourceVersions.property_detail)
+@cached_response('property')
+def property_detail(property_id):
     try:
         property = Property.query.get(property_id)
         
         if not property:
             return jsonify({'error': 'Property not found'}), 404
         
-        # Increment view count
-        property.increment_views()
+        calendar_format = request.args.get('calendar_format', 'days')
+        if calendar_format not in CalendarService.CALENDAR_FORMATS:
+            return jsonify({'error': 'calendar_format must be days or ranges'}), 400
+        
+        ResponseCache.tag(property_tag(property.id), user_tag(property.host_id))
         
         return jsonify({
-            'property': property.to_dict(include_host=True, include_calendar=True)
+            'property': property.to_dict(include_host=True, include_calendar=True,
+                                         calendar_format=calendar_format, include_photos=True)
         }), 200
         
     except Exception as e:
@@ -141,6 +325,8 @@ def create_property():
                 images_urls = upload_property_images_internal(request=request, jwt_identity=current_user_id)
             else: 
                 images_urls = []
+        except ImageUploadError as e:
+            return jsonify(e.to_dict()), 400
         except Exception as e:
             return jsonify({'error': f'Image upload failed: {str(e)}'}), 400
         
@@ -164,6 +350,17 @@ def create_property():
                     grouped_images[category] = []
                 grouped_images[category].append(url)
 
+        # Images the client uploaded straight to S3 with /upload/grants
+        if 'image_uploads' in data:
+            try:
+                direct_uploads = redeem_property_uploads(data['image_uploads'], current_user_id)
+            except UploadGrantError as e:
+                # Grants redeemed before the failing one stay usable
+                db.session.rollback()
+                return jsonify({'error': f'Image upload failed: {str(e)}'}), 400
+            for url, category in direct_uploads:
+                grouped_images.setdefault(category, []).append(url)
+
         # Parse amenities
         amenities_list = []
         if 'amenities' in data:
@@ -204,7 +401,7 @@ def create_property():
         
         return jsonify({
             'message': 'Property created successfully',
-            'property': property.to_dict()
+            'property': property.to_dict(include_photos=True)
         }), 201
         
     except Exception as e:
@@ -282,6 +479,8 @@ def update_property(property_id):
         if request.files:
             try:
                  new_image_urls = upload_property_images_internal(request=request, jwt_identity=current_user_id)
+            except ImageUploadError as e:
+                return jsonify(e.to_dict()), 400
             except Exception as e:
                 return jsonify({'error': f'Image upload failed: {str(e)}'}), 400
 
@@ -303,15 +502,28 @@ def update_property(property_id):
                     current_images_map[cat] = []
                 current_images_map[cat].append(url)
         
+        # 4. Merge images the client uploaded straight to S3
+        if 'image_uploads' in data:
+            try:
+                direct_uploads = redeem_property_uploads(data['image_uploads'], current_user_id)
+            except UploadGrantError as e:
+                # Grants redeemed before the failing one stay usable
+                db.session.rollback()
+                return jsonify({'error': f'Image upload failed: {str(e)}'}), 400
+            for url, cat in direct_uploads:
+                if cat not in current_images_map:
+                    current_images_map[cat] = []
+                current_images_map[cat].append(url)
+        
         # Update property images
-        if 'existing_images' in data or request.files:
+        if 'existing_images' in data or request.files or 'image_uploads' in data:
              property.images = current_images_map
 
         db.session.commit()
         
         return jsonify({
             'message': 'Property updated successfully',
-            'property': property.to_dict()
+            'property': property.to_dict(include_photos=True)
         }), 200
         
     except Exception as e:
@@ -336,14 +548,17 @@ def delete_property(property_id):
         from app.models.message import Conversation, Message
         from app.models.blocked_date import BlockedDate
         from app.models.booking import Booking
-        from app.services.s3_service import S3Service
-        
-        if property.images:
-            if isinstance(property.images, dict):
-                for category, urls in property.images.items():
-                    if isinstance(urls, list):
-                        for url in urls:
-                            S3Service.delete_file(url)
+        from app.services.storage_cleanup_service import StorageCleanupService
+        from app.services.property_image_service import PropertyImageService, flatten_images
+        
+        # Files nothing else uses are deleted in the background once this
+        # transaction commits
+        photos = list(property.photos)
+        PropertyImageService.release(db.session, property, photos)
+        synced = {photo.original_url for photo in photos}
+        StorageCleanupService.delete_later(
+            [url for _, url in flatten_images(property.images) if url not in synced]
+        )
         
         # Delete related records
         conversations = Conversation.query.filter_by(property_id=property_id).all()
@@ -385,6 +600,9 @@ def check_availability(property_id):
         check_in = datetime.strptime(check_in_str, '%Y-%m-%d').date()
         check_out = datetime.strptime(check_out_str, '%Y-%m-%d').date()
         
+        if check_out <= check_in:
+            return jsonify({'error': 'check_out must be after check_in'}), 400
+        
         is_available = property.is_available(check_in, check_out)
         
         pricing = None
@@ -406,10 +624,10 @@ def get_my_properties():
     """Get current user's properties"""
     try:
         current_user_id = get_jwt_identity()
-        properties = Property.query.filter_by(host_id=current_user_id).all()
+        properties = Property.query.options(selectinload(Property.photos)).filter_by(host_id=current_user_id).all()
         
         return jsonify({
-            'properties': [prop.to_dict() for prop in properties]
+            'properties': [prop.to_dict(include_photos=True) for prop in properties]
         }), 200
         
     except Exception as e:
@@ -417,65 +635,153 @@ def get_my_properties():
 
 @properties_bp.route('/nearby', methods=['GET'])
 @limiter.limit("100 per hour")
+@cached_response('nearby')
 def get_nearby_properties():
-    """Get properties in user's city and nearby cities"""
+    """Get properties near a point (lat/lng/radius_km), or in the user's city"""
     try:
-        # Pagination
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 20, type=int)
+        if 'lat' in request.args or 'lng' in request.args:
+            return nearby_by_distance()
         
         # Required: user's current city
         user_city = request.args.get('city')
         user_country = request.args.get('country')
         
-        if not user_city:
-            return jsonify({'error': 'city parameter is required'}), 400
+        if not location_key(user_city):
+            return jsonify({'error': 'city (or lat and lng) parameter is required'}), 400
         
         # Build query for properties in the same city/country
-        query = Property.query.filter_by(status=PropertyStatus.ACTIVE)
+        query = Property.query.options(selectinload(Property.host), selectinload(Property.photos)).filter_by(status=PropertyStatus.ACTIVE)
         
-        if user_country:
+        if location_key(user_country):
             # Prioritize same country
-            query = query.filter(Property.country.ilike(f'%{user_country}%'))
+            query = query.filter(prefix_filter(Property.country_key, user_country))
         
-        # Find properties in the same city or nearby
-        # Using ILIKE for case-insensitive search
-        query = query.filter(Property.city.ilike(f'%{user_city}%'))
+        # Find properties in the same city or nearby, on the normalized key
+        query = query.filter(prefix_filter(Property.city_key, user_city))
         
         # Sort by rating and recency
-        query = query.order_by(
-            Property.average_rating.desc(),
-            Property.created_at.desc()
-        )
+        sort_keys = [
+            SortKey(Property.average_rating, descending=True, default=0.0),
+            SortKey(Property.created_at, descending=True),
+            SortKey(Property.id, descending=True),
+        ]
         
-        # Paginate
-        paginated_properties = query.paginate(page=page, per_page=per_page, error_out=False)
+        # Paginate (page/per_page, or opt-in cursor)
+        items, pagination = paginate_request(query, sort_keys)
         
-        properties = [prop.to_dict(include_host=True) for prop in paginated_properties.items]
+        tag_properties(items)
+        properties = [prop.to_dict(include_host=True, image_view='card', include_photos=True) for prop in items]
         
         return jsonify({
             'properties': properties,
-            'total': paginated_properties.total,
-            'pages': paginated_properties.pages,
-            'current_page': page,
-            'per_page': per_page,
+            **pagination,
             'location': {
                 'city': user_city,
                 'country': user_country
             }
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+def nearby_by_distance():
+    """Active properties within radius_km of lat/lng, nearest first"""
+    latitude = request.args.get('lat', type=float)
+    longitude = request.args.get('lng', type=float)
+    radius_km = request.args.get('radius_km', DEFAULT_NEARBY_RADIUS_KM, type=float)
+    
+    if latitude is None or longitude is None:
+        return jsonify({'error': 'lat and lng must both be numbers'}), 400
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return jsonify({'error': 'lat must be within ±90 and lng within ±180'}), 400
+    if radius_km is None or radius_km <= 0:
+        return jsonify({'error': 'radius_km must be a positive number'}), 400
+    if wants_cursor_pagination():
+        return jsonify({'error': 'Distance results support page/per_page pagination only'}), 400
+    
+    radius_km = min(radius_km, MAX_RADIUS_KM)
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), MAX_PER_PAGE))
+    
+    found = GeoIndex.search(latitude, longitude, radius_km)
+    page_ids = found[(page - 1) * per_page:page * per_page]
+    
+    by_id = {
+        prop.id: prop for prop in Property.query.options(
+            selectinload(Property.host), selectinload(Property.photos)
+        ).filter(Property.id.in_([property_id for property_id, _ in page_ids]))
+    }
+    items = [by_id[property_id] for property_id, _ in page_ids if property_id in by_id]
+    distances = dict(page_ids)
+    
+    tag_properties(items)
+    properties = []
+    for prop in items:
+        data = prop.to_dict(include_host=True, image_view='card', include_photos=True)
+        data['distance_km'] = round(distances[prop.id], 2)
+        properties.append(data)
+    
+    return jsonify({
+        'properties': properties,
+        'total': len(found),
+        'pages': (len(found) + per_page - 1) // per_page,
+        'current_page': page,
+        'per_page': per_page,
+        'location': {
+            'lat': latitude,
+            'lng': longitude,
+            'radius_km': radius_km
+        }
+    }), 200
+
+
+@properties_bp.route('/amenities', methods=['GET'])
+@limiter.limit("100 per hour")
+@cached_response('amenities')
+def get_amenities():
+    """Amenity catalog with the number of active listings offering each"""
+    try:
+        ResponseCache.tag(LISTS_TAG)
+        active = Property.query.filter(Property.status == PropertyStatus.ACTIVE)
+        return jsonify({'amenities': AmenityService.facet_counts(active)}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@properties_bp.route('/locations/autocomplete', methods=['GET'])
+@limiter.limit("600 per hour")
+def autocomplete_locations():
+    """Cities with active listings matching what the user typed, most listings first"""
+    try:
+        query = request.args.get('q', '')
+        if not location_key(query):
+            return jsonify({'error': 'q parameter is required'}), 400
+        
+        suggestions = LocationIndex.autocomplete(
+            query,
+            country=request.args.get('country'),
+            limit=request.args.get('limit', 10, type=int)
+        )
+        return jsonify({'suggestions': suggestions}), 200
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @properties_bp.route('/explore', methods=['GET'])
 @limiter.limit("100 per hour")
+@cached_response('explore')
 def get_explore_properties():
     """Get curated properties for explore page - grouped by random cities"""
     try:
         from sqlalchemy import func
         
+        ResponseCache.tag(LISTS_TAG)
         cities = db.session.query(Property.city).filter(
             Property.status == PropertyStatus.ACTIVE
         ).distinct().all()
@@ -489,7 +795,7 @@ def get_explore_properties():
         
         city_groups = []
         for city in selected_cities:
-            properties = Property.query.filter(
+            properties = Property.query.options(selectinload(Property.host), selectinload(Property.photos)).filter(
                 Property.status == PropertyStatus.ACTIVE,
                 Property.city == city
             ).order_by(
@@ -498,9 +804,10 @@ def get_explore_properties():
             ).all()
             
             if properties:
+                tag_properties(properties)
                 city_groups.append({
                     'city': city,
-                    'properties': [prop.to_dict(include_host=True) for prop in properties]
+                    'properties': [prop.to_dict(include_host=True, image_view='card', include_photos=True) for prop in properties]
                 })
         
         return jsonify({
@@ -513,38 +820,68 @@ def get_explore_properties():
     
 @properties_bp.route('/bounds', methods=['GET'])
 @limiter.limit("100 per hour")
+@cached_response('bounds')
 def get_properties_in_bounds():
-    """Get properties within map coordinate bounds"""
+    """
+    Get properties within map coordinate bounds
+    
+    With `zoom`, crowded viewports get clusters (centroid, count, min price)
+    from the cell pyramid instead of listings.
+    """
     try:
         min_lat = request.args.get('min_lat', type=float)
         max_lat = request.args.get('max_lat', type=float)
         min_lng = request.args.get('min_lng', type=float)
         max_lng = request.args.get('max_lng', type=float)
+        zoom = request.args.get('zoom', type=int)
         
         if None in [min_lat, max_lat, min_lng, max_lng]:
             return jsonify({'error': 'min_lat, max_lat, min_lng, and max_lng are required'}), 400
         
-        query = Property.query.filter(
+        # Latitudes can't wrap (min_lng > max_lng is a box across the antimeridian)
+        if min_lat > max_lat:
+            return jsonify({'error': 'min_lat must not be greater than max_lat'}), 400
+        
+        bounds = {
+            'min_lat': min_lat,
+            'max_lat': max_lat,
+            'min_lng': min_lng,
+            'max_lng': max_lng
+        }
+        
+        if 'zoom' in request.args:
+            if zoom is None or zoom < 0:
+                return jsonify({'error': 'zoom must be a non-negative integer'}), 400
+            
+            clusters = GeoIndex.clusters(min_lat, min_lng, max_lat, max_lng, zoom)
+            total = sum(cluster['count'] for cluster in clusters or [])
+            if clusters is not None and total > CLUSTER_THRESHOLD:
+                ResponseCache.tag(LISTS_TAG)
+                return jsonify({
+                    'mode': 'clusters',
+                    'clusters': clusters,
+                    'count': total,
+                    'zoom': zoom,
+                    'bounds': bounds
+                }), 200
+        
+        # Geohash index ranges covering the box, then the exact bounds
+        query = Property.query.options(selectinload(Property.host), selectinload(Property.photos)).filter(
             Property.status == PropertyStatus.ACTIVE,
-            Property.latitude.isnot(None),
-            Property.longitude.isnot(None),
-            Property.latitude.between(min_lat, max_lat),
-            Property.longitude.between(min_lng, max_lng)
+            GeoIndex.box_condition(min_lat, min_lng, max_lat, max_lng)
         ).order_by(
             Property.average_rating.desc()
-        ).limit(100)  # Limit to prevent overload
+        ).limit(CLUSTER_THRESHOLD)  # Limit to prevent overload
         
-        properties = [prop.to_dict(include_host=True) for prop in query.all()]
+        items = query.all()
+        tag_properties(items)
+        properties = [prop.to_dict(include_host=True, image_view='card', include_photos=True) for prop in items]
         
         return jsonify({
+            'mode': 'listings',
             'properties': properties,
             'count': len(properties),
-            'bounds': {
-                'min_lat': min_lat,
-                'max_lat': max_lat,
-                'min_lng': min_lng,
-                'max_lng': max_lng
-            }
+            'bounds': bounds
         }), 200
         
     except Exception as e:
@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
 from app.models.review import Review
 from app.models.booking import Booking, BookingStatus
+from app.utils.pagination import SortKey, CursorError, paginate_request
 
 reviews_bp = Blueprint('reviews', __name__)
 
@@ -83,25 +84,27 @@ def create_review():
 def get_property_reviews(property_id):
     """Get all reviews for a property"""
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         reviews_query = Review.query.filter_by(
             property_id=property_id,
             is_visible=True
-        ).order_by(Review.created_at.desc())
+        )
         
-        paginated_reviews = reviews_query.paginate(page=page, per_page=per_page, error_out=False)
+        sort_keys = [
+            SortKey(Review.created_at, descending=True),
+            SortKey(Review.id, descending=True),
+        ]
+        items, pagination = paginate_request(reviews_query, sort_keys, default_per_page=10)
         
-        reviews = [review.to_dict(include_user=True) for review in paginated_reviews.items]
+        reviews = [review.to_dict(include_user=True) for review in items]
         
         return jsonify({
             'reviews': reviews,
-            'total': paginated_reviews.total,
-            'pages': paginated_reviews.pages,
-            'current_page': page
+            **pagination
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
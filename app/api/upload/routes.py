@@ -3,53 +3,69 @@ Image Upload Routes
 """
 
 from flask import Blueprint, request, jsonify, current_app
+import json
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
 from app.models.property import Property
 from app.models.user import User
 from app.services.s3_service import S3Service, LocalStorageService
+from app.services.image_pipeline import ImageUploadPipeline, ImageUploadError
+from app.services.upload_grant_service import UploadGrantService, UploadGrantError
+from app.services.storage_cleanup_service import StorageCleanupService
 
 upload_bp = Blueprint('upload', __name__)
 
 
 def upload_property_images_internal(request, jwt_identity):
-    """Upload property images"""
-    try:
-        current_user_id = int(jwt_identity)
-        
-        # Check if files were uploaded
-        if 'images' not in request.files:
-            return jsonify({'error': 'No images provided'}), 400
-        
-        files = request.files.getlist('images')
-        
-        if not files or len(files) == 0:
-            return jsonify({'error': 'No images provided'}), 400
-        
-        # Limit number of images
-        max_images = 10
-        if len(files) > max_images:
-            return jsonify({'error': f'Maximum {max_images} images allowed'}), 400
-        
-        # Check if S3 is configured
-        use_s3 = current_app.config.get('AWS_ACCESS_KEY_ID') and \
-                 current_app.config.get('S3_BUCKET_NAME')
-        
-        # Upload images
-        if use_s3:
-            uploaded_urls = S3Service.upload_multiple_files(files, folder='properties', compress=True)
-        else:
-            # Fallback to local storage
-            uploaded_urls = LocalStorageService.upload_multiple_files(files, folder='uploads/properties')
-        
+    """
+    Upload property images, compressed and uploaded in parallel
+    
+    Returns:
+        List of URLs in the same order as the uploaded files
+    
+    Raises:
+        ValueError: No images, or too many
+        ImageUploadError: Some files failed; the ones that made it are deleted
+                          again so URLs never drift out of line with categories
+    """
+    current_user_id = int(jwt_identity)
+    
+    # Check if files were uploaded
+    if 'images' not in request.files:
+        raise ValueError('No images provided')
+    
+    files = request.files.getlist('images')
+    
+    if not files or len(files) == 0:
+        raise ValueError('No images provided')
+    
+    # Limit number of images
+    max_images = 10
+    if len(files) > max_images:
+        raise ValueError(f'Maximum {max_images} images allowed')
+    
+    # Check if S3 is configured
+    use_s3 = current_app.config.get('AWS_ACCESS_KEY_ID') and \
+             current_app.config.get('S3_BUCKET_NAME')
+    
+    if not use_s3:
+        # Fallback to local storage
+        uploaded_urls = LocalStorageService.upload_multiple_files(files, folder='uploads/properties')
         if not uploaded_urls:
-            return jsonify({'error': 'Failed to upload images'}), 500
-        
+            raise ValueError('Failed to upload images')
         return uploaded_urls
-        
-    except Exception as e:
-        current_app.logger.error(f'Image upload error: {str(e)}')
-        return jsonify({'error': str(e)}), 500
+    
+    # Re-uploaded photos resolve to the object stored the first time
+    results = ImageUploadPipeline.upload_files(files, folder='properties', compress=True, dedupe=True)
+    
+    if not all(result.ok for result in results):
+        current_app.logger.error(f'Image upload error: {[r.to_dict() for r in results if not r.ok]}')
+        # Only objects this request created; the rest may be in use elsewhere
+        S3Service.delete_multiple_files([result.url for result in results if result.ok and result.created])
+        db.session.rollback()
+        raise ImageUploadError(results)
+    
+    return [result.url for result in results]
 
 
 
@@ -78,10 +94,6 @@ def upload_verification_photo():
         
         # Upload image
         if use_s3:
-            # Delete old profile picture if exists
-            if user.verification_photo_url:
-                S3Service.delete_file(user.verification_photo_url)
-            
             image_url = S3Service.upload_file(file, folder='verification_photo', compress=True)
         else:
             # Fallback to local storage
@@ -90,14 +102,17 @@ def upload_verification_photo():
         if not image_url:
             return jsonify({'error': 'Failed to upload image'}), 500
         
-        # Update user profile picture
+        # Delete the previous photo once the new one is saved
+        if user.verification_photo_url and user.verification_photo_url != image_url:
+            StorageCleanupService.delete_later([user.verification_photo_url])
+        
         user.verification_photo_url = image_url
         db.session.commit()
         
         return jsonify({
             'message': 'Verification photo uploaded successfully',
             'verification_photo': image_url,
-            'user': user.to_dict(include_email=True)
+            'user': user.to_self_dict()
         }), 200
         
     except Exception as e:
@@ -105,3 +120,141 @@ def upload_verification_photo():
         current_app.logger.error(f'Profile picture upload error: {str(e)}')
         return jsonify({'error': str(e)}), 500
 
+
+
+def redeem_property_uploads(uploads, jwt_identity):
+    """
+    Confirm directly uploaded property images
+    
+    Args:
+        uploads: List of {'token': ..., 'category': ...} from /upload/grants,
+                 or the same as a JSON string (multipart forms)
+    
+    Returns:
+        List of (url, category) in the given order
+    
+    Raises:
+        UploadGrantError
+    """
+    if isinstance(uploads, str):
+        try:
+            uploads = json.loads(uploads)
+        except ValueError:
+            raise UploadGrantError('uploads must be valid JSON')
+    
+    if not isinstance(uploads, list) or not all(isinstance(u, dict) and u.get('token') for u in uploads):
+        raise UploadGrantError('uploads must be a list of {token, category}')
+    
+    urls = UploadGrantService.redeem_many(
+        int(jwt_identity), 'property_image', [upload['token'] for upload in uploads]
+    )
+    return [(url, upload.get('category') or 'Other') for url, upload in zip(urls, uploads)]
+
+
+@upload_bp.route('/grants', methods=['POST'])
+@jwt_required()
+def create_upload_grants():
+    """
+    Issue presigned uploads so the client sends files straight to S3
+    
+    Body:
+        purpose: property_image, profile_picture, verification_photo or cnic
+        files: [{content_type, size, method}] where method is 'post'
+               (default, multipart form to url with fields) or 'put'
+               (raw body to url with headers; size required)
+    """
+    try:
+        if not UploadGrantService.is_available():
+            return jsonify({'error': 'Direct uploads are not configured'}), 503
+        
+        data = request.get_json() or {}
+        grants = UploadGrantService.issue(int(get_jwt_identity()), data.get('purpose'), data.get('files'))
+        
+        return jsonify({'grants': grants}), 201
+        
+    except UploadGrantError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        current_app.logger.error(f'Upload grant error: {str(e)}')
+        return jsonify({'error': str(e)}), 500
+
+
+@upload_bp.route('/confirm', methods=['POST'])
+@jwt_required()
+def confirm_uploads():
+    """
+    Attach directly uploaded files to a property or the current user
+    
+    Body:
+        purpose: Same purpose the grants were issued for
+        uploads: [{token, category}] (category only for property images)
+        property_id: Required for property_image
+    """
+    try:
+        current_user_id = int(get_jwt_identity())
+        user = User.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        
+        data = request.get_json() or {}
+        purpose = data.get('purpose')
+        uploads = data.get('uploads') or []
+        
+        if purpose == 'property_image':
+            property = Property.query.get(data.get('property_id'))
+            if not property:
+                return jsonify({'error': 'Property not found'}), 404
+            if property.host_id != current_user_id:
+                return jsonify({'error': 'Unauthorized'}), 403
+            
+            images = dict(property.images) if isinstance(property.images, dict) else {'Other': list(property.images or [])}
+            # Each grant can be confirmed once, so every url is new here
+            for url, category in redeem_property_uploads(uploads, current_user_id):
+                images[category] = list(images.get(category, [])) + [url]
+            property.images = images
+            db.session.commit()
+            
+            return jsonify({
+                'message': 'Images added',
+                'property': property.to_dict(include_photos=True)
+            }), 200
+        
+        if purpose not in ('profile_picture', 'verification_photo', 'cnic'):
+            return jsonify({'error': 'Invalid purpose'}), 400
+        if len(uploads) != 1 or not isinstance(uploads[0], dict):
+            return jsonify({'error': 'Exactly one upload expected'}), 400
+        if purpose == 'cnic' and not user.cnic:
+            return jsonify({'error': 'Please submit your CNIC number first'}), 400
+        
+        url = UploadGrantService.redeem(current_user_id, purpose, uploads[0].get('token'))
+        
+        field = {
+            'profile_picture': 'profile_picture',
+            'verification_photo': 'verification_photo_url',
+            'cnic': 'cnic_image_url',
+        }[purpose]
+        
+        old_url = getattr(user, field)
+        if old_url and old_url != url:
+            StorageCleanupService.delete_later([old_url])
+        
+        setattr(user, field, url)
+        if purpose == 'cnic':
+            user.cnic_verified = False  # Reset verification status
+            user.verification_notes = 'CNIC image uploaded, pending verification'
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'Upload confirmed',
+            purpose: url,
+            'user': user.to_self_dict()
+        }), 200
+        
+    except UploadGrantError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Upload confirm error: {str(e)}')
+        return jsonify({'error': str(e)}), 500
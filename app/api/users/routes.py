@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from extensions import db
 from app.services.s3_service import S3Service
+from app.services.storage_cleanup_service import StorageCleanupService
 
 users_bp = Blueprint('users', __name__)
 
@@ -27,8 +28,6 @@ def get_user(user_id):
             print(f"DEBUG: User {user_id} not found in database.")
             return jsonify({'error': 'User not found'}), 404
         
-        user_data = user.to_dict()
-
         # 2. FIX: Safely handle the identity check
         current_identity = get_jwt_identity()
         
@@ -36,12 +35,17 @@ def get_user(user_id):
         if current_identity is not None:
             current_user_id = int(current_identity)
             
+            # Owners see their own blocked list; everyone else gets the public profile
+            if current_user_id == user.id:
+                user_data = user.to_self_dict()
+            else:
+                user_data = user.to_public_dict()
+            
             # Check if the profile owner (user) has blocked the viewer (current_user_id)
-            # Ensure your User model has the 'blocked' relationship set up correctly
-            is_blocking_viewer = any(u.id == current_user_id for u in user.blocked)
-            user_data['is_blocking_viewer'] = is_blocking_viewer
+            user_data['is_blocking_viewer'] = user.has_blocked(current_user_id)
         else:
             # Guest user: cannot be blocked personally
+            user_data = user.to_public_dict()
             user_data['is_blocking_viewer'] = False
         
         return jsonify({
@@ -77,7 +81,7 @@ def update_profile():
         
         return jsonify({
             'message': 'Profile updated successfully',
-            'user': user.to_dict(include_email=True)
+            'user': user.to_self_dict()
         }), 200
         
     except Exception as e:
@@ -104,23 +108,23 @@ def upload_profile_picture():
         if not file or file.filename == '':
             return jsonify({'error': 'No file selected'}), 400
         
-        # Delete old profile picture from S3
-        if user.profile_picture:
-            S3Service.delete_file(user.profile_picture)
-        
         # Upload new picture
         new_url = S3Service.upload_file(file, folder='profile-pictures', compress=True)
         
         if not new_url:
             return jsonify({'error': 'Failed to upload image'}), 400
         
+        # Delete the old picture once the new one is saved
+        if user.profile_picture:
+            StorageCleanupService.delete_later([user.profile_picture])
+        
         user.profile_picture = new_url
         db.session.commit()
         
         return jsonify({
             'message': 'Profile picture updated',
             'profile_picture': new_url,
-            'user': user.to_dict(include_email=True)
+            'user': user.to_self_dict()
         }), 200
         
     except Exception as e:
@@ -140,13 +144,13 @@ def delete_profile_picture():
             return jsonify({'error': 'User not found'}), 404
         
         if user.profile_picture:
-            S3Service.delete_file(user.profile_picture)
+            StorageCleanupService.delete_later([user.profile_picture])
             user.profile_picture = None
             db.session.commit()
         
         return jsonify({
             'message': 'Profile picture removed',
-            'user': user.to_dict(include_email=True)
+            'user': user.to_self_dict()
         }), 200
         
     except Exception as e:
@@ -211,7 +215,7 @@ def block_user_endpoint(user_id):
 
     return jsonify({
         'message': f'User {user_to_block.username} blocked successfully',
-        'blocked_user_ids': [u.id for u in current_user.blocked]
+        'blocked_user_ids': current_user.blocked_user_ids()
     }), 200
 
 
@@ -233,5 +237,5 @@ def unblock_user_endpoint(user_id):
 
     return jsonify({
         'message': f'User {user_to_unblock.username} unblocked',
-        'blocked_user_ids': [u.id for u in current_user.blocked]
+        'blocked_user_ids': current_user.blocked_user_ids()
     }), 200
\ No newline at end of file
@@ -9,6 +9,7 @@ from app.models.user import User
 from extensions import db
 from functools import wraps
 from app.models.email_verification_token import EmailVerificationToken
+from app.utils.pagination import SortKey, CursorError, paginate_request
 
 verification_bp = Blueprint('verification', __name__, url_prefix='/api/verification')
 
@@ -65,7 +66,7 @@ def submit_cnic():
     
     return jsonify({
         'message': 'CNIC submitted successfully. Awaiting verification.',
-        'user': user.to_dict(include_email=True, include_cnic=True)
+        'user': user.to_self_dict(include_cnic=True)
     }), 200
 
 
@@ -91,23 +92,25 @@ def get_verification_status():
 @admin_required
 def get_pending_verifications():
     """Get all users pending verification (Admin only)"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 20, type=int)
-    
     # Users with CNIC but not verified
-    pending_users = User.query.filter(
+    pending_query = User.query.filter(
         User.cnic.isnot(None),
         User.cnic_verified == False
-    ).order_by(User.created_at.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
     )
     
+    sort_keys = [
+        SortKey(User.created_at, descending=True),
+        SortKey(User.id, descending=True),
+    ]
+    try:
+        items, pagination = paginate_request(pending_query, sort_keys)
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
+    
     return jsonify({
-        'users': [user.to_dict(include_email=True, include_cnic=True)  # Add include_cnic=True
-                  for user in pending_users.items],
-        'total': pending_users.total,
-        'pages': pending_users.pages,
-        'current_page': page
+        'users': [user.to_admin_dict()
+                  for user in items],
+        **pagination
     }), 200
 
 
@@ -132,7 +135,7 @@ def verify_user(user_id):
     
     return jsonify({
         'message': 'User verified successfully',
-        'user': user.to_dict(include_email=True, include_cnic=True)
+        'user': user.to_admin_dict()
     }), 200
 
 
@@ -157,7 +160,7 @@ def reject_user(user_id):
     
     return jsonify({
         'message': 'Verification rejected',
-        'user': user.to_dict(include_email=True, include_cnic=True)
+        'user': user.to_admin_dict()
     }), 200
 
 
@@ -177,7 +180,7 @@ def get_verified_users():
     )
     
     return jsonify({
-        'users': [user.to_dict(include_email=True, include_cnic=True) 
+        'users': [user.to_admin_dict() 
                   for user in verified_users.items],
         'total': verified_users.total,
         'pages': verified_users.pages,
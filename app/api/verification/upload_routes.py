@@ -7,6 +7,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from extensions import db
 from app.models.user import User
 from app.services.s3_service import S3Service
+from app.services.storage_cleanup_service import StorageCleanupService
 from werkzeug.utils import secure_filename
 import os
 
@@ -48,9 +49,6 @@ def upload_cnic_image():
                  current_app.config.get('S3_BUCKET_NAME')
         
         if use_s3:
-            if user.cnic_image_url:
-                S3Service.delete_file(user.cnic_image_url)
-            
             # Upload to S3
             compress = file_ext in ['png', 'jpg', 'jpeg']  # Don't compress PDFs
             image_url = S3Service.upload_file(file, folder='cnic', compress=compress)
@@ -65,6 +63,10 @@ def upload_cnic_image():
             if not image_url:
                 return jsonify({'error': 'Failed to upload CNIC image 2'}), 500
         
+        # Delete the previous image once the new one is saved
+        if user.cnic_image_url and user.cnic_image_url != image_url:
+            StorageCleanupService.delete_later([user.cnic_image_url])
+        
         # Update user CNIC image URL
         user.cnic_image_url = image_url
         user.cnic_verified = False  # Reset verification status
@@ -75,7 +77,7 @@ def upload_cnic_image():
         return jsonify({
             'message': 'CNIC image uploaded successfully',
             'cnic_image_url': image_url,
-            'user': user.to_dict(include_email=True)
+            'user': user.to_self_dict()
         }), 200
         
     except Exception as e:
@@ -3,6 +3,7 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models.user import User
 from app.models.property import Property
 from extensions import db
+from sqlalchemy.orm import selectinload
 
 wishlist_bp = Blueprint('wishlist', __name__)
 
@@ -43,9 +44,9 @@ def get_wishlist():
         return jsonify({'error': 'User not found'}), 404
     
     wishlist_ids = user.wishlist or []
-    properties = Property.query.filter(Property.id.in_(wishlist_ids)).all()
+    properties = Property.query.options(selectinload(Property.host), selectinload(Property.photos)).filter(Property.id.in_(wishlist_ids)).all()
     
     return jsonify({
         'wishlist_ids': wishlist_ids,
-        'properties': [p.to_dict(include_host=True) for p in properties]
+        'properties': [p.to_dict(include_host=True, image_view='card', include_photos=True) for p in properties]
     }), 200
\ No newline at end of file
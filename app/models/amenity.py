@@ -0,0 +1,36 @@
+"""
+Amenity Models
+"""
+
+from extensions import db
+
+
+# Which amenities each listing has; mirrors Property.amenities (AmenityService)
+property_amenities = db.Table(
+    'property_amenities',
+    db.Column('property_id', db.Integer, db.ForeignKey('properties.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('amenity_id', db.Integer, db.ForeignKey('amenities.id'), primary_key=True),
+    # Amenity filters and facet counts: amenity_id IN (...) -> property_id
+    db.Index('ix_property_amenities_amenity_property', 'amenity_id', 'property_id'),
+)
+
+
+class Amenity(db.Model):
+    """Canonical amenity; every spelling hosts use maps to one row by its key"""
+
+    __tablename__ = 'amenities'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Normalized name (see amenity_key), e.g. 'wifi' for 'Wi-Fi' and 'WIFI '
+    key = db.Column(db.String(100), unique=True, nullable=False)
+    # Spelling of the first listing that used it
+    name = db.Column(db.String(100), nullable=False)
+
+    def to_dict(self):
+        return {
+            'key': self.key,
+            'name': self.name,
+        }
+
+    def __repr__(self):
+        return f'<Amenity {self.key}>'
@@ -0,0 +1,27 @@
+"""
+Property Availability Index Model
+"""
+
+from extensions import db
+from datetime import datetime
+
+
+class PropertyAvailability(db.Model):
+    """Per-property bitsets of booked and blocked days over a rolling window"""
+
+    __tablename__ = 'property_availability'
+
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id', ondelete='CASCADE'), primary_key=True)
+
+    # Day 0 of both bitsets; bit N covers window_start + N days
+    window_start = db.Column(db.Date, nullable=False)
+    window_days = db.Column(db.Integer, nullable=False)
+    booked_bits = db.Column(db.LargeBinary, nullable=False)
+    blocked_bits = db.Column(db.LargeBinary, nullable=False)
+
+    # Bumped on every rebuild so clients can detect calendar changes
+    version = db.Column(db.Integer, default=1, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<PropertyAvailability {self.property_id} from {self.window_start}>'
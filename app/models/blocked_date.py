@@ -4,6 +4,9 @@ from datetime import datetime
 class BlockedDate(db.Model):
     """Dates when property cannot be booked"""
     __tablename__ = 'blocked_dates'
+    __table_args__ = (
+        db.Index('ix_blocked_dates_property_date', 'property_id', 'blocked_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
@@ -20,6 +20,10 @@ class Booking(db.Model):
     """Booking/Reservation model"""
     
     __tablename__ = 'bookings'
+    __table_args__ = (
+        # Overlap checks: property_id = ? AND check_in < ? AND check_out > ? AND status IN (...)
+        db.Index('ix_bookings_property_dates', 'property_id', 'check_in', 'check_out', 'status'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     property_id = db.Column(db.Integer, db.ForeignKey('properties.id'), nullable=False)
@@ -93,8 +97,16 @@ class Booking(db.Model):
         """Check if booking can be cancelled"""
         return self.status in [BookingStatus.PENDING, BookingStatus.CONFIRMED]
     
-    def to_dict(self, include_property=False, include_guest=False):
-        """Convert booking to dictionary"""
+    def to_dict(self, include_property=False, include_guest=False, include_photos=False):
+        """
+        Convert booking to dictionary
+        
+        Args:
+            include_property: Embed the property
+            include_guest: Embed the guest profile
+            include_photos: Embed the property's photo rows (preload
+                            Property.photos when serializing several bookings)
+        """
         data = {
             'id': self.id,
             'property_id': self.property_id,
@@ -116,10 +128,10 @@ class Booking(db.Model):
         }
         
         if include_property:
-            data['property'] = self.property.to_dict()
+            data['property'] = self.property.to_dict(include_photos=include_photos)
         
         if include_guest:
-            data['guest'] = self.guest.to_dict()
+            data['guest'] = self.guest.to_public_dict()
         
         return data
     
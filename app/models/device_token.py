@@ -0,0 +1,74 @@
+"""
+Device Token Model
+"""
+
+from extensions import db
+from datetime import datetime
+
+
+class DeviceToken(db.Model):
+    """FCM registration token for one of a user's devices"""
+
+    __tablename__ = 'device_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    token = db.Column(db.String(512), nullable=False, unique=True)
+    platform = db.Column(db.String(20))  # android, ios
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    user = db.relationship('User', backref=db.backref('device_tokens', lazy='dynamic', passive_deletes=True))
+
+    @staticmethod
+    def register(user_id, token, platform=None):
+        """
+        Attach a token to a user, moving it if another account registered it
+        on the same device before
+
+        Returns:
+            DeviceToken (added to the session, not committed)
+        """
+        device = DeviceToken.query.filter_by(token=token).first()
+        if device is None:
+            device = DeviceToken(token=token)
+            db.session.add(device)
+
+        device.user_id = user_id
+        device.platform = platform or device.platform
+        device.last_seen_at = datetime.utcnow()
+        return device
+
+    @staticmethod
+    def tokens_for(user_ids):
+        """
+        Returns:
+            Dict of user_id -> list of tokens, newest first
+        """
+        user_ids = list(user_ids)
+        tokens = {user_id: [] for user_id in user_ids}
+        if not user_ids:
+            return tokens
+
+        rows = db.session.query(DeviceToken.user_id, DeviceToken.token).filter(
+            DeviceToken.user_id.in_(user_ids)
+        ).order_by(DeviceToken.last_seen_at.desc())
+        for user_id, token in rows:
+            tokens[user_id].append(token)
+        return tokens
+
+    @staticmethod
+    def prune(tokens):
+        """
+        Delete tokens FCM reported as invalid
+
+        Returns:
+            Number of tokens deleted
+        """
+        tokens = list(tokens)
+        if not tokens:
+            return 0
+        return DeviceToken.query.filter(DeviceToken.token.in_(tokens)).delete(synchronize_session=False)
+
+    def __repr__(self):
+        return f'<DeviceToken {self.id} user={self.user_id}>'
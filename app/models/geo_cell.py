@@ -0,0 +1,35 @@
+"""
+Property Geo Cell Model
+"""
+
+from extensions import db
+from datetime import datetime
+
+
+class PropertyGeoCell(db.Model):
+    """Active listings aggregated per geohash cell, one level per prefix length (the map cluster pyramid)"""
+
+    __tablename__ = 'property_geo_cells'
+
+    precision = db.Column(db.Integer, primary_key=True)
+    # Geohash prefix of length `precision`
+    cell = db.Column(db.String(12), primary_key=True)
+
+    listing_count = db.Column(db.Integer, nullable=False)
+    # Sums rather than means so the centroid of merged cells stays exact
+    latitude_sum = db.Column(db.Float, nullable=False)
+    longitude_sum = db.Column(db.Float, nullable=False)
+    min_price = db.Column(db.Numeric(10, 2), nullable=False)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    @property
+    def latitude(self):
+        return self.latitude_sum / self.listing_count
+
+    @property
+    def longitude(self):
+        return self.longitude_sum / self.listing_count
+
+    def __repr__(self):
+        return f'<PropertyGeoCell {self.cell} ({self.listing_count})>'
@@ -1,5 +1,7 @@
 from extensions import db
 from datetime import datetime
+from sqlalchemy import case, exists, or_
+from sqlalchemy.orm import aliased
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
@@ -16,56 +18,146 @@ class Conversation(db.Model):
     user2 = db.relationship('User', foreign_keys=[user2_id])
     user1_read_count = db.Column(db.Integer, default=0)
     user2_read_count = db.Column(db.Integer, default=0)
-    
+
+    # Denormalized counters, maintained by add_message in the insert's transaction
+    message_count = db.Column(db.Integer, default=0, nullable=False)
+    last_message_id = db.Column(db.Integer)
+    last_message_at = db.Column(db.DateTime)
+    user1_last_read_message_id = db.Column(db.Integer)
+    user2_last_read_message_id = db.Column(db.Integer)
+
+    last_message = db.relationship(
+        'Message',
+        primaryjoin='foreign(Conversation.last_message_id) == Message.id',
+        uselist=False,
+        viewonly=True,
+    )
+
+    def add_message(self, sender_id, content):
+        """
+        Add a message and update the counters without committing
+
+        The sender has implicitly read everything up to their own message.
+        Counters are incremented in SQL so concurrent senders don't lose updates.
+        """
+        message = Message(conversation_id=self.id, sender_id=sender_id, content=content)
+        db.session.add(message)
+        db.session.flush()
+
+        next_count = Conversation.message_count + 1
+        self.message_count = next_count
+        self.last_message_id = message.id
+        self.last_message_at = message.created_at
+        self.updated_at = message.created_at
+
+        if sender_id == self.user1_id:
+            self.user1_read_count = next_count
+            self.user1_last_read_message_id = message.id
+        elif sender_id == self.user2_id:
+            self.user2_read_count = next_count
+            self.user2_last_read_message_id = message.id
+
+        return message
+
+    def mark_read(self, user_id):
+        """Mark everything up to the last message as read for a participant"""
+        if user_id == self.user1_id:
+            self.user1_read_count = self.message_count
+            self.user1_last_read_message_id = self.last_message_id
+        elif user_id == self.user2_id:
+            self.user2_read_count = self.message_count
+            self.user2_last_read_message_id = self.last_message_id
+        else:
+            return False
+        return True
+
+    def unread_count_for(self, user_id):
+        """Unread messages for a participant, from the stored counters"""
+        if user_id == self.user1_id:
+            read = self.user1_read_count or 0
+        elif user_id == self.user2_id:
+            read = self.user2_read_count or 0
+        else:
+            return 0
+        return max((self.message_count or 0) - read, 0)
+
+    def last_read_message_id_for(self, user_id):
+        if user_id == self.user1_id:
+            return self.user1_last_read_message_id
+        if user_id == self.user2_id:
+            return self.user2_last_read_message_id
+        return None
+
     def to_dict(self, current_user_id=None):
-        # 1. Get messages (limit to 20 for performance in list view)
-        last_message = self.messages.order_by(Message.created_at.desc()).first()
-        total_messages = self.messages.count()
-        
-        unread_count = 0
-        
-        if current_user_id:
-            try:
-                # FIX 1: Force Integer Comparison
-                uid = int(current_user_id) 
-                
-                # FIX 2: Handle NULL values from DB (defaults to 0)
-                u1_read = self.user1_read_count if self.user1_read_count is not None else 0
-                u2_read = self.user2_read_count if self.user2_read_count is not None else 0
-
-                if uid == self.user1_id:
-                    unread_count = total_messages - u1_read
-                elif uid == self.user2_id:
-                    unread_count = total_messages - u2_read
-            except Exception as e:
-                print(f"Error calculating unread: {e}")
-
-        # Safety Check
-        if unread_count < 0: 
-            unread_count = 0
-
-        # FIX 3: Safe Sender Serialization (Handle Deleted Users)
-        msgs_list = []
-        try:
-            # Only sending last message needed for the list view, 
-            # but if you need all, keep this.
-            msgs_list = [m.to_dict() for m in self.messages.order_by(Message.created_at.desc()).all()]
-        except:
-            pass
+        uid = int(current_user_id) if current_user_id else None
+        last_message = self.last_message
+        return self.to_inbox_dict(uid, self.user1, self.user2, last_message)
+
+    @staticmethod
+    def inbox_query(user_id):
+        """
+        One query for a user's whole inbox
+
+        Each row is (Conversation, user1, user2, last Message, blocked_by_me,
+        blocking_me). The last message is joined through last_message_id,
+        so no message history is read.
+        """
+        from app.models.user import User, blocked_users
+
+        participant = or_(Conversation.user1_id == user_id, Conversation.user2_id == user_id)
+
+        other_user_id = case((Conversation.user1_id == user_id, Conversation.user2_id), else_=Conversation.user1_id)
+        blocked_by_me = exists().where(
+            blocked_users.c.blocker_id == user_id,
+            blocked_users.c.blocked_id == other_user_id,
+        )
+        blocking_me = exists().where(
+            blocked_users.c.blocker_id == other_user_id,
+            blocked_users.c.blocked_id == user_id,
+        )
 
+        user1 = aliased(User)
+        user2 = aliased(User)
+        last_message = aliased(Message)
+
+        return db.session.query(
+            Conversation,
+            user1,
+            user2,
+            last_message,
+            blocked_by_me.label('is_blocked_by_me'),
+            blocking_me.label('is_blocking_me'),
+        ).outerjoin(
+            user1, user1.id == Conversation.user1_id
+        ).outerjoin(
+            user2, user2.id == Conversation.user2_id
+        ).outerjoin(
+            last_message, last_message.id == Conversation.last_message_id
+        ).filter(participant)
+
+    def to_inbox_dict(self, current_user_id, user1, user2, last_message):
+        """Inbox entry without the message history"""
+        last = last_message.to_dict() if last_message else None
         return {
             'id': self.id,
-            'user1': self.user1.to_dict() if self.user1 else None,
-            'user2': self.user2.to_dict() if self.user2 else None,
+            'user1': user1.to_public_dict() if user1 else None,
+            'user2': user2.to_public_dict() if user2 else None,
             'property_id': self.property_id,
-            'updated_at': self.updated_at.isoformat(),
-            'last_message': last_message.to_dict() if last_message else None,
-            'messages': msgs_list,
-            'unread_count': unread_count
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'last_message': last,
+            # Kept for older clients that read the newest entry from the list
+            'messages': [last] if last else [],
+            'message_count': self.message_count or 0,
+            'unread_count': self.unread_count_for(current_user_id),
+            'last_read_message_id': self.last_read_message_id_for(current_user_id),
         }
 
 class Message(db.Model):
     __tablename__ = 'messages'
+    __table_args__ = (
+        # History pages and "new since" polling are range scans on this index
+        db.Index('ix_messages_conversation_id_id', 'conversation_id', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
@@ -75,12 +167,16 @@ class Message(db.Model):
     
     sender = db.relationship('User')
     
-    def to_dict(self):
-        return {
+    def to_dict(self, include_sender=True):
+        data = {
             'id': self.id,
             'conversation_id': self.conversation_id,
             'sender_id': self.sender_id,
-            'sender': self.sender.to_dict(),
             'content': self.content,
             'created_at': self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+        
+        if include_sender:
+            data['sender'] = self.sender.to_public_dict()
+        
+        return data
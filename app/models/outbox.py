@@ -0,0 +1,51 @@
+"""
+Outbox Event Model
+"""
+
+from extensions import db
+from datetime import datetime
+from enum import Enum
+
+
+class OutboxStatus(str, Enum):
+    """Outbox event status enum"""
+    PENDING = 'pending'
+    DELIVERED = 'delivered'
+    FAILED = 'failed'
+
+
+class OutboxEvent(db.Model):
+    """Push notification or realtime event waiting to be delivered"""
+
+    __tablename__ = 'outbox_events'
+    __table_args__ = (
+        # Workers claim due events: status = 'pending' AND next_attempt_at <= now
+        db.Index('ix_outbox_events_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # push, pusher, image_derivatives
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.String(20), default=OutboxStatus.PENDING.value, nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    # Also used as a lease while a worker is delivering the event
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    delivered_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'channel': self.channel,
+            'payload': self.payload,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None,
+        }
+
+    def __repr__(self):
+        return f'<OutboxEvent {self.id} {self.channel} {self.status}>'
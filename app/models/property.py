@@ -6,6 +6,7 @@ from extensions import db
 from datetime import datetime
 from enum import Enum
 from app.models.blocked_date import BlockedDate
+from app.models.property_image import PropertyImage, CARD_WIDTHS
 
 
 class PropertyType(str, Enum):
@@ -35,6 +36,12 @@ class Property(db.Model):
     """Property/Listing model"""
     
     __tablename__ = 'properties'
+    __table_args__ = (
+        # Exact and prefix (LIKE 'x%') location search; pattern ops let
+        # PostgreSQL use them for LIKE whatever the database collation
+        db.Index('ix_properties_city_key', 'city_key', postgresql_ops={'city_key': 'text_pattern_ops'}),
+        db.Index('ix_properties_country_key', 'country_key', postgresql_ops={'country_key': 'text_pattern_ops'}),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     host_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -50,9 +57,14 @@ class Property(db.Model):
     city = db.Column(db.String(100), nullable=False)
     state = db.Column(db.String(100))
     country = db.Column(db.String(100), nullable=False)
+    # Casefolded, accent-stripped city and country, maintained by LocationIndex
+    city_key = db.Column(db.String(100))
+    country_key = db.Column(db.String(100))
     postal_code = db.Column(db.String(20))
     latitude = db.Column(db.Float, nullable=True)
     longitude = db.Column(db.Float, nullable=True)
+    # Geohash of the coordinates, maintained by GeoIndex for spatial search
+    geohash = db.Column(db.String(12), index=True)
     available = db.Column(db.Integer, nullable=True)
     
     
@@ -93,6 +105,9 @@ class Property(db.Model):
     bookings = db.relationship('Booking', backref='property', lazy='dynamic')
     reviews = db.relationship('Review', backref='property', lazy='dynamic')
     blocked_dates = db.relationship('BlockedDate', backref='property', lazy='dynamic')
+    # Normalized copy of `images` with resized derivatives, kept in sync by PropertyImageService
+    photos = db.relationship('PropertyImage', backref='property', order_by='PropertyImage.position',
+                             cascade='all, delete-orphan', passive_deletes=True)
     
     def __init__(self, **kwargs):
         """Initialize property"""
@@ -101,9 +116,9 @@ class Property(db.Model):
                 setattr(self, key, value)
     
     def increment_views(self):
-        """Increment view count"""
-        self.view_count += 1
-        db.session.commit()
+        """Count a view; written to view_count by the next ViewCounter flush"""
+        from app.services.view_counter import ViewCounter
+        ViewCounter.record(self.id)
     
     def update_rating(self):
         """Recalculate average rating from reviews"""
@@ -120,6 +135,12 @@ class Property(db.Model):
     def is_available(self, check_in, check_out):
         """Check if property is available for given dates"""
         from app.models.booking import Booking, BookingStatus
+        from app.services.availability_index import AvailabilityIndex
+        
+        # Answer from the availability index when it covers the range
+        indexed = AvailabilityIndex.is_available(self.id, check_in, check_out)
+        if indexed is not None:
+            return indexed
         
         # Check for overlapping bookings
         overlapping_bookings = Booking.query.filter(
@@ -157,8 +178,34 @@ class Property(db.Model):
             'total': total
         }
     
-    def to_dict(self, include_host=False, include_calendar=False):
-        """Convert property to dictionary"""
+    def card_images(self):
+        """`images` with each photo swapped for its listing-card thumbnail"""
+        thumbnails = {photo.original_url: photo.url_for(CARD_WIDTHS[-1]) for photo in self.photos}
+        if isinstance(self.images, dict):
+            return {
+                category: [thumbnails.get(url, url) for url in urls] if isinstance(urls, list) else urls
+                for category, urls in self.images.items()
+            }
+        if isinstance(self.images, list):
+            return [thumbnails.get(url, url) for url in self.images]
+        return self.images
+    
+    def to_dict(self, include_host=False, include_calendar=False, calendar=None, calendar_format='days',
+                image_view='full', include_photos=False):
+        """
+        Convert property to dictionary
+
+        Args:
+            include_host: Embed the host profile
+            include_calendar: Embed booked and blocked dates
+            calendar: Preloaded PropertyCalendar (from AvailabilityIndex.calendars) to
+                      avoid per-property queries when serializing a page
+            calendar_format: 'days' or 'ranges'
+            image_view: 'full' for originals and every size, 'card' for
+                        listing thumbnails only (preload Property.photos)
+            include_photos: Embed the photo rows (preload Property.photos
+                            when serializing several properties)
+        """
         data = {
             'id': self.id,
             'host_id': self.host_id,
@@ -185,7 +232,7 @@ class Property(db.Model):
             'min_nights': self.min_nights,
             'max_nights': self.max_nights,
             'cancellation_policy': self.cancellation_policy,
-            'images': self.images,
+            'images': self.card_images() if image_view == 'card' else self.images,
             'view_count': self.view_count,
             'average_rating': self.average_rating,
             'total_reviews': self.total_reviews,
@@ -193,40 +240,18 @@ class Property(db.Model):
             'available': self.available if self.available else None,
         }
         
+        if include_photos:
+            data['photos'] = [photo.to_dict(image_view) for photo in self.photos]
+        
         if include_host:
-            data['host'] = self.host.to_dict()
+            data['host'] = self.host.to_public_dict()
         
         if include_calendar:
-            from app.models.booking import Booking, BookingStatus
-            from datetime import timedelta, date as date_type
-
-            today = date_type.today()
-            end = today + timedelta(days=365)
-
-            bookings = Booking.query.filter(
-                Booking.property_id == self.id,
-                Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PENDING]),
-                Booking.check_in < end,
-                Booking.check_out > today
-            ).all()
-
-            booked_dates = []
-            for booking in bookings:
-                current = booking.check_in
-                while current < booking.check_out:
-                    if current >= today:
-                        booked_dates.append(current.isoformat())
-                    current += timedelta(days=1)
-
-            blocked_dates_query = BlockedDate.query.filter(
-                BlockedDate.property_id == self.id,
-                BlockedDate.blocked_date >= today,
-                BlockedDate.blocked_date <= end
-            ).all()
-            blocked_dates = [bd.blocked_date.isoformat() for bd in blocked_dates_query]
+            if calendar is None:
+                from app.services.availability_index import AvailabilityIndex
+                calendar = AvailabilityIndex.calendars([self.id])[self.id]
 
-            data['booked_dates'] = booked_dates
-            data['blocked_dates'] = blocked_dates
+            data.update(calendar.to_dict(calendar_format))
         
         return data
     
@@ -0,0 +1,99 @@
+"""
+Property Image Model
+"""
+
+from extensions import db
+from datetime import datetime
+from enum import Enum
+
+
+# Widths (px) generated for every photo, and the subset sent to listing cards
+DERIVATIVE_WIDTHS = (320, 640, 1280)
+CARD_WIDTHS = (320, 640)
+DERIVATIVE_FORMATS = ('webp', 'jpeg')
+
+
+class PropertyImageStatus(str, Enum):
+    """Derivative generation status enum"""
+    PENDING = 'pending'
+    READY = 'ready'
+
+
+class PropertyImage(db.Model):
+    """One photo of a property with its resized derivatives"""
+
+    __tablename__ = 'property_images'
+    __table_args__ = (
+        db.Index('ix_property_images_property_position', 'property_id', 'position'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('properties.id', ondelete='CASCADE'), nullable=False)
+    category = db.Column(db.String(50), nullable=False, default='Other')
+    position = db.Column(db.Integer, nullable=False, default=0)
+    original_url = db.Column(db.String(500), nullable=False)
+
+    # {"320": {"webp": url, "jpeg": url}, "640": {...}, ...}
+    variants = db.Column(db.JSON, default=dict)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    # Tiny WebP as a data URI, shown while the real image loads
+    placeholder = db.Column(db.Text)
+    status = db.Column(db.String(20), default=PropertyImageStatus.PENDING.value, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def srcset(self, widths=None):
+        """Derivative URLs per width, limited to `widths` when given"""
+        variants = self.variants or {}
+        if widths is None:
+            return dict(variants)
+        allowed = {str(w) for w in widths}
+        return {width: urls for width, urls in variants.items() if width in allowed}
+
+    def url_for(self, width, fmt='jpeg'):
+        """Smallest derivative at least `width` wide, else the largest, else the original"""
+        variants = sorted(((int(w), urls) for w, urls in (self.variants or {}).items()), key=lambda v: v[0])
+        candidates = [urls for w, urls in variants if w >= width] or [urls for w, urls in variants[-1:]]
+        for urls in candidates:
+            if fmt in urls:
+                return urls[fmt]
+        return self.original_url
+
+    def all_urls(self):
+        """Original and derivative URLs, for deleting from storage"""
+        urls = [self.original_url]
+        for formats in (self.variants or {}).values():
+            urls.extend(formats.values())
+        return urls
+
+    def to_dict(self, image_view='full'):
+        """
+        Args:
+            image_view: 'full' for every size and the original, 'card' for
+                        listing thumbnails only
+        """
+        if image_view == 'card':
+            return {
+                'id': self.id,
+                'category': self.category,
+                'url': self.url_for(CARD_WIDTHS[-1]),
+                'srcset': self.srcset(CARD_WIDTHS),
+                'placeholder': self.placeholder,
+            }
+
+        return {
+            'id': self.id,
+            'category': self.category,
+            'position': self.position,
+            'url': self.original_url,
+            'srcset': self.srcset(),
+            'width': self.width,
+            'height': self.height,
+            'placeholder': self.placeholder,
+            'status': self.status,
+        }
+
+    def __repr__(self):
+        return f'<PropertyImage {self.id} property={self.property_id}>'
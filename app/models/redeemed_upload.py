@@ -0,0 +1,21 @@
+"""
+Redeemed Upload Model
+"""
+
+from extensions import db
+from datetime import datetime
+
+
+class RedeemedUpload(db.Model):
+    """Object key of an upload grant that has been confirmed; a grant is good for one use"""
+
+    __tablename__ = 'redeemed_uploads'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(255), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    # Rows older than the grant lifetime can go: their tokens no longer verify
+    redeemed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<RedeemedUpload {self.key}>'
@@ -85,7 +85,7 @@ class Review(db.Model):
         }
         
         if include_user:
-            data['author'] = self.author.to_dict()
+            data['author'] = self.author.to_public_dict()
         
         if include_property:
             data['property'] = self.property.to_dict()
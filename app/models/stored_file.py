@@ -0,0 +1,31 @@
+"""
+Stored File Model
+"""
+
+from extensions import db
+from datetime import datetime
+
+
+class StoredFile(db.Model):
+    """An uploaded object keyed by the hash of its content, shared by every row that uses it"""
+
+    __tablename__ = 'stored_files'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # {folder}/{content_hash}.{ext}
+    key = db.Column(db.String(255), unique=True, nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)
+    # Hash of the bytes as uploaded (before compression), so a repeat upload
+    # is recognised without re-encoding it
+    source_hash = db.Column(db.String(64), index=True)
+    size = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(50))
+    # Rows (property photos) pointing at this object; 0 means it may be deleted
+    ref_count = db.Column(db.Integer, default=0, nullable=False)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    # Last upload that produced or reused the object
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<StoredFile {self.key} refs={self.ref_count}>'
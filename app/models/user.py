@@ -129,8 +129,19 @@ class User(db.Model):
         """Return full name"""
         return f"{self.first_name} {self.last_name}"
     
-    def to_dict(self, include_email=False, include_cnic=False, include_blocked=True):
-        """Convert user to dictionary"""
+    def to_dict(self, include_email=False, include_cnic=False, include_blocked=False):
+        """
+        Convert user to dictionary
+
+        Prefer the profile helpers below: to_public_dict for users embedded in
+        other resources, to_self_dict for the account owner, to_admin_dict for
+        admin tooling.
+
+        Args:
+            include_email: Include contact details
+            include_cnic: Include CNIC verification fields
+            include_blocked: Include the IDs this user has blocked
+        """
         data = {
             'id': self.id,
             'username': self.username,
@@ -159,11 +170,29 @@ class User(db.Model):
             data['verification_photo_url'] = self.verification_photo_url
         
         if include_blocked:
-            # Requires the 'blocked' relationship defined in the previous step
-            data['blocked_user_ids'] = [u.id for u in self.blocked]
+            data['blocked_user_ids'] = sorted(self.blocked_user_ids())
     
         return data
-    
+
+    def to_public_dict(self):
+        """Profile shown to other users (hosts, guests, authors, senders)"""
+        return self.to_dict()
+
+    def to_self_dict(self, include_cnic=False):
+        """Profile returned to the account owner"""
+        return self.to_dict(include_email=True, include_cnic=include_cnic, include_blocked=True)
+
+    def to_admin_dict(self):
+        """Profile returned to admin tooling"""
+        return self.to_dict(include_email=True, include_cnic=True)
+
+    def blocked_user_ids(self):
+        """IDs of users this user has blocked, without loading the User rows"""
+        rows = db.session.query(blocked_users.c.blocked_id).filter(
+            blocked_users.c.blocker_id == self.id
+        )
+        return [row.blocked_id for row in rows]
+
     def block_user(self, user):
         """Blocks another user if not already blocked."""
         if not self.has_blocked(user):
@@ -177,8 +206,12 @@ class User(db.Model):
             db.session.commit()
 
     def has_blocked(self, user):
-        """Checks if this user has blocked the target user."""
-        return self.blocked.filter(blocked_users.c.blocked_id == user.id).count() > 0
+        """Checks if this user has blocked the target user (User or ID)."""
+        user_id = user if isinstance(user, int) else user.id
+        return db.session.query(blocked_users.c.blocked_id).filter(
+            blocked_users.c.blocker_id == self.id,
+            blocked_users.c.blocked_id == user_id
+        ).first() is not None
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -0,0 +1,211 @@
+"""
+Amenity Service
+Maps free-form amenity names to a canonical catalog, mirrors each listing's
+amenities into the indexed property_amenities table, and answers amenity
+filters and facet counts from it
+"""
+
+import unicodedata
+from itertools import chain
+from sqlalchemy import event, inspect, select, delete, insert, func, false
+from extensions import db
+from app.models.property import Property
+from app.models.amenity import Amenity, property_amenities
+
+
+def amenity_key(name):
+    """Lowercase letters and digits of a name, accents stripped ('Wi-Fi' -> 'wifi')"""
+    if not isinstance(name, str):
+        return None
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(c for c in decomposed.casefold() if c.isalnum() and not unicodedata.combining(c)) or None
+
+
+def _names_by_key(names):
+    """{key: first spelling} for a list of names, skipping ones without a key"""
+    found = {}
+    for name in names or []:
+        key = amenity_key(name)
+        if key and key not in found:
+            found[key] = ' '.join(name.split())[:100]
+    return found
+
+
+def _insert_ignoring_duplicates(session, table):
+    """INSERT that skips catalog rows whose key already exists"""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert(table).on_conflict_do_nothing(index_elements=['key'])
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert(table).on_conflict_do_nothing(index_elements=['key'])
+    return insert(table).prefix_with('IGNORE')
+
+
+class AmenityService:
+    """Service for the amenity catalog, filters and facets"""
+
+    @staticmethod
+    def init_app(app):
+        """Mirror Property.amenities into property_amenities on every flush"""
+        if not event.contains(db.session, 'before_flush', _collect_before_flush):
+            event.listen(db.session, 'before_flush', _collect_before_flush)
+            event.listen(db.session, 'after_flush', _sync_after_flush)
+            event.listen(db.session, 'after_soft_rollback', _forget_after_rollback)
+
+    @staticmethod
+    def ids_for(names, create=False, session=None):
+        """
+        Catalog ids of amenity names
+
+        Args:
+            names: Amenity names in any spelling
+            create: Add names missing from the catalog
+            session: Session to use (defaults to db.session)
+
+        Returns:
+            Dict {key: id}; unknown names are left out unless `create`
+        """
+        session = session or db.session
+        names = _names_by_key(names)
+        if not names:
+            return {}
+
+        table = Amenity.__table__
+        if create:
+            session.connection().execute(
+                _insert_ignoring_duplicates(session, table),
+                [{'key': key, 'name': name} for key, name in names.items()]
+            )
+        rows = session.connection().execute(
+            select(table.c.key, table.c.id).where(table.c.key.in_(list(names)))
+        )
+        return dict(rows.all())
+
+    @staticmethod
+    def sync(session, properties):
+        """Replace the property_amenities rows of flushed properties"""
+        wanted = {
+            obj.id: set(AmenityService.ids_for(obj.amenities, create=True, session=session).values())
+            for obj in properties
+        }
+        if not wanted:
+            return
+
+        rows = session.connection().execute(
+            select(property_amenities.c.property_id, property_amenities.c.amenity_id)
+            .where(property_amenities.c.property_id.in_(list(wanted)))
+        )
+        current = {}
+        for property_id, amenity_id in rows:
+            current.setdefault(property_id, set()).add(amenity_id)
+
+        stale = []
+        added = []
+        for property_id, amenity_ids in wanted.items():
+            have = current.get(property_id, set())
+            stale.extend((property_id, amenity_id) for amenity_id in have - amenity_ids)
+            added.extend({'property_id': property_id, 'amenity_id': amenity_id} for amenity_id in amenity_ids - have)
+
+        for property_id, amenity_id in stale:
+            session.connection().execute(
+                delete(property_amenities).where(
+                    property_amenities.c.property_id == property_id,
+                    property_amenities.c.amenity_id == amenity_id,
+                )
+            )
+        if added:
+            session.connection().execute(insert(property_amenities), added)
+
+    @staticmethod
+    def condition(names):
+        """
+        Filter for listings that have every one of `names`
+
+        One index-backed subquery however many amenities are asked for;
+        names missing from the catalog match nothing.
+        """
+        keys = _names_by_key(names)
+        if not keys:
+            return None
+        ids = AmenityService.ids_for(list(keys.values()))
+        if len(ids) < len(keys):
+            return false()
+
+        having_all = (
+            select(property_amenities.c.property_id)
+            .where(property_amenities.c.amenity_id.in_(list(ids.values())))
+            .group_by(property_amenities.c.property_id)
+            .having(func.count() == len(ids))
+        )
+        return Property.id.in_(having_all)
+
+    @staticmethod
+    def facet_counts(query):
+        """
+        Listings per amenity within a filtered property query, in one
+        grouped query
+
+        Args:
+            query: Property query (filters only; ordering is ignored)
+
+        Returns:
+            List of {'key', 'name', 'count'}, most common first
+        """
+        matching = query.order_by(None).with_entities(Property.id).subquery()
+        rows = db.session.execute(
+            select(Amenity.key, Amenity.name, func.count())
+            .select_from(property_amenities)
+            .join(Amenity, Amenity.id == property_amenities.c.amenity_id)
+            .where(property_amenities.c.property_id.in_(select(matching.c.id)))
+            .group_by(Amenity.id, Amenity.key, Amenity.name)
+        ).all()
+        facets = [{'key': key, 'name': name, 'count': count} for key, name, count in rows]
+        facets.sort(key=lambda facet: (-facet['count'], facet['key']))
+        return facets
+
+    @staticmethod
+    def rebuild():
+        """
+        Re-mirror every listing's amenities and drop rows of deleted listings
+
+        Returns:
+            Number of properties synced
+        """
+        properties = Property.query.all()
+        AmenityService.sync(db.session, properties)
+        db.session.execute(
+            delete(property_amenities).where(~property_amenities.c.property_id.in_(select(Property.id)))
+        )
+        db.session.commit()
+        return len(properties)
+
+
+def _collect_before_flush(session, flush_context, instances):
+    """Note properties whose amenities changed; their ids exist after the flush"""
+    pending = session.info.setdefault('amenity_sync', set())
+    for obj in chain(session.new, session.dirty):
+        if not isinstance(obj, Property):
+            continue
+        if obj in session.new or inspect(obj).attrs.amenities.history.has_changes():
+            pending.add(obj)
+
+
+def _sync_after_flush(session, flush_context):
+    pending = session.info.pop('amenity_sync', set())
+
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Property)]
+    if deleted:
+        # SQLite doesn't enforce the ON DELETE CASCADE
+        session.connection().execute(
+            delete(property_amenities).where(property_amenities.c.property_id.in_(deleted))
+        )
+
+    pending = [obj for obj in pending if obj.id is not None and obj not in session.deleted]
+    if pending:
+        AmenityService.sync(session, pending)
+
+
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop('amenity_sync', None)
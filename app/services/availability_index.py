@@ -0,0 +1,346 @@
+"""
+Availability Index Service
+Maintains per-property bitsets of booked and blocked days so availability
+checks, calendars and date-range searches become bit operations
+"""
+
+from datetime import date, datetime, timedelta
+from itertools import chain
+from sqlalchemy import event, select, insert, update, delete, bindparam, inspect
+from extensions import db
+from app.models.availability import PropertyAvailability
+from app.models.booking import Booking
+from app.models.blocked_date import BlockedDate
+from app.models.property import Property
+from app.services.calendar_service import CalendarService, PropertyCalendar
+
+
+# Rolling window covered by each bitset (~18 months)
+WINDOW_DAYS = 548
+
+# Booking columns whose changes affect the calendar
+BOOKING_CALENDAR_FIELDS = ('status', 'check_in', 'check_out', 'property_id')
+
+
+def _range_mask(offset, length):
+    """Bitmask with `length` bits set starting at `offset` (empty if length <= 0)"""
+    if length <= 0:
+        return 0
+    return ((1 << length) - 1) << offset
+
+
+def _iter_runs(bits):
+    """Yield (offset, length) for each run of set bits, lowest first"""
+    offset = 0
+    while bits:
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        offset += skip
+        # Number of trailing ones
+        length = ((bits ^ (bits + 1)) >> 1).bit_length()
+        yield offset, length
+        bits >>= length
+        offset += length
+
+
+class AvailabilityBitmap:
+    """In-memory bitsets for a single property"""
+
+    def __init__(self, property_id, window_start, window_days, booked=0, blocked=0):
+        self.property_id = property_id
+        self.window_start = window_start
+        self.window_days = window_days
+        self.booked = booked
+        self.blocked = blocked
+
+    @property
+    def window_end(self):
+        """Day after the last day covered"""
+        return self.window_start + timedelta(days=self.window_days)
+
+    @classmethod
+    def from_row(cls, row):
+        """Decode a PropertyAvailability row (or a row with the same columns)"""
+        return cls(
+            row.property_id,
+            row.window_start,
+            row.window_days,
+            int.from_bytes(row.booked_bits, 'little'),
+            int.from_bytes(row.blocked_bits, 'little'),
+        )
+
+    @classmethod
+    def from_calendar(cls, calendar):
+        """Encode a PropertyCalendar covering the whole window"""
+        bitmap = cls(calendar.property_id, calendar.start, (calendar.end - calendar.start).days)
+        for start, end in calendar.booked_ranges():
+            bitmap.booked |= bitmap._mask(start, end)
+        for start, end in calendar.blocked_ranges():
+            bitmap.blocked |= bitmap._mask(start, end)
+        return bitmap
+
+    def covers(self, start, end):
+        """Whether [start, end) lies inside the window"""
+        return self.window_start <= start and end <= self.window_end
+
+    def _mask(self, start, end):
+        return _range_mask((start - self.window_start).days, (end - start).days)
+
+    def is_available(self, check_in, check_out):
+        """True when no night in [check_in, check_out) is booked or blocked"""
+        return not (self.booked | self.blocked) & self._mask(check_in, check_out)
+
+    def to_calendar(self, start, end):
+        """Build a PropertyCalendar for [start, end) from the bitsets"""
+        calendar = PropertyCalendar(self.property_id, start, end)
+        offset = (start - self.window_start).days
+        mask = _range_mask(offset, (end - start).days)
+
+        for run_offset, length in _iter_runs(self.booked & mask):
+            run_start = self.window_start + timedelta(days=run_offset)
+            calendar.add_booking(run_start, run_start + timedelta(days=length))
+
+        for run_offset, length in _iter_runs(self.blocked & mask):
+            for day in range(run_offset, run_offset + length):
+                calendar.add_blocked(self.window_start + timedelta(days=day))
+
+        return calendar
+
+    def encode(self):
+        """Column values for storage"""
+        size = (self.window_days + 7) // 8
+        return {
+            'property_id': self.property_id,
+            'window_start': self.window_start,
+            'window_days': self.window_days,
+            'booked_bits': self.booked.to_bytes(size, 'little'),
+            'blocked_bits': self.blocked.to_bytes(size, 'little'),
+        }
+
+
+class AvailabilityIndex:
+    """Service for reading and maintaining the availability index"""
+
+    @staticmethod
+    def init_app(app):
+        """Keep the index in sync with booking and blocked date changes"""
+        if not event.contains(db.session, 'after_flush', _sync_after_flush):
+            event.listen(db.session, 'after_flush', _sync_after_flush)
+
+    @staticmethod
+    def bitmaps(property_ids, session=None):
+        """
+        Load stored bitmaps
+
+        Returns:
+            Dict of property_id -> AvailabilityBitmap for indexed properties
+        """
+        property_ids = list(property_ids)
+        if not property_ids:
+            return {}
+
+        session = session or db.session
+        rows = session.execute(
+            select(PropertyAvailability).where(PropertyAvailability.property_id.in_(property_ids))
+        ).scalars()
+        return {row.property_id: AvailabilityBitmap.from_row(row) for row in rows}
+
+    @staticmethod
+    def is_available(property_id, check_in, check_out):
+        """
+        Check availability from the index
+
+        Returns:
+            True/False, or None when the property is not indexed for that range
+        """
+        return AvailabilityIndex.filter_available([property_id], check_in, check_out).get(property_id)
+
+    @staticmethod
+    def filter_available(property_ids, check_in, check_out):
+        """
+        Check a date range for many properties with one index read
+
+        Returns:
+            Dict of property_id -> True/False for properties the index covers;
+            uncovered properties are left out so callers can fall back to SQL
+        """
+        return {
+            property_id: bitmap.is_available(check_in, check_out)
+            for property_id, bitmap in AvailabilityIndex.bitmaps(property_ids).items()
+            if bitmap.covers(check_in, check_out)
+        }
+
+    @staticmethod
+    def calendars(property_ids, start=None, end=None):
+        """
+        Build calendars from the index, falling back to SQL for properties
+        it does not cover
+
+        Returns:
+            Dict of property_id -> PropertyCalendar
+        """
+        if start is None or end is None:
+            start, end = CalendarService.default_window()
+
+        property_ids = list(dict.fromkeys(property_ids))
+        bitmaps = AvailabilityIndex.bitmaps(property_ids)
+
+        calendars = {
+            property_id: bitmap.to_calendar(start, end)
+            for property_id, bitmap in bitmaps.items()
+            if bitmap.covers(start, end)
+        }
+
+        missing = [pid for pid in property_ids if pid not in calendars]
+        if missing:
+            calendars.update(CalendarService.load(missing, start, end))
+
+        return calendars
+
+    @staticmethod
+    def compute(property_ids, window_start=None, session=None):
+        """Compute fresh bitmaps from the bookings and blocked_dates tables"""
+        window_start = window_start or date.today()
+        window_end = window_start + timedelta(days=WINDOW_DAYS)
+        calendars = CalendarService.load(property_ids, window_start, window_end, session=session)
+        return {pid: AvailabilityBitmap.from_calendar(cal) for pid, cal in calendars.items()}
+
+    @staticmethod
+    def rebuild(property_ids=None, session=None, chunk_size=500):
+        """
+        Rebuild index rows, rolling their window forward to today
+
+        Args:
+            property_ids: Properties to rebuild (all properties when None)
+            session: Session to write with (defaults to db.session)
+            chunk_size: Properties per batch
+
+        Returns:
+            Number of rows written
+        """
+        session = session or db.session
+
+        if property_ids is None:
+            property_ids = session.execute(select(Property.id)).scalars().all()
+        property_ids = list(dict.fromkeys(property_ids))
+
+        written = 0
+        for i in range(0, len(property_ids), chunk_size):
+            chunk = property_ids[i:i + chunk_size]
+            bitmaps = AvailabilityIndex.compute(chunk, session=session)
+
+            existing = set(session.execute(
+                select(PropertyAvailability.property_id).where(PropertyAvailability.property_id.in_(chunk))
+            ).scalars())
+
+            now = datetime.utcnow()
+            updates = []
+            inserts = []
+            for property_id, bitmap in bitmaps.items():
+                values = bitmap.encode()
+                values['updated_at'] = now
+                if property_id in existing:
+                    values['pid'] = values.pop('property_id')
+                    updates.append(values)
+                else:
+                    values['version'] = 1
+                    inserts.append(values)
+
+            if updates:
+                table = PropertyAvailability.__table__
+                session.connection().execute(
+                    update(table)
+                    .where(table.c.property_id == bindparam('pid'))
+                    .values(version=table.c.version + 1),
+                    updates
+                )
+            if inserts:
+                session.connection().execute(insert(PropertyAvailability.__table__), inserts)
+
+            written += len(bitmaps)
+
+        return written
+
+    @staticmethod
+    def check(property_ids=None):
+        """
+        Compare stored bitmaps against the bookings and blocked_dates tables
+
+        Returns:
+            List of problems, one dict per inconsistent property
+        """
+        if property_ids is None:
+            property_ids = db.session.execute(select(Property.id)).scalars().all()
+
+        stored = AvailabilityIndex.bitmaps(property_ids)
+        problems = []
+
+        for property_id in property_ids:
+            bitmap = stored.get(property_id)
+            if bitmap is None:
+                problems.append({'property_id': property_id, 'error': 'missing'})
+                continue
+
+            expected = CalendarService.load([property_id], bitmap.window_start, bitmap.window_end)[property_id]
+            expected = AvailabilityBitmap.from_calendar(expected)
+
+            problem = {}
+            for field in ('booked', 'blocked'):
+                diff = getattr(bitmap, field) ^ getattr(expected, field)
+                if diff:
+                    problem[f'{field}_mismatches'] = [
+                        (bitmap.window_start + timedelta(days=offset + n)).isoformat()
+                        for offset, length in _iter_runs(diff)
+                        for n in range(length)
+                    ]
+
+            if problem:
+                problem['property_id'] = property_id
+                problems.append(problem)
+
+        return problems
+
+
+def _touched_property_ids(session):
+    """Property IDs whose calendar changed in the current flush"""
+    touched = set()
+    deleted_properties = set()
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Property):
+            if obj in session.deleted:
+                deleted_properties.add(obj.id)
+            elif obj in session.new:
+                touched.add(obj.id)
+            continue
+
+        if isinstance(obj, Booking):
+            fields = BOOKING_CALENDAR_FIELDS
+        elif isinstance(obj, BlockedDate):
+            fields = ('blocked_date', 'property_id')
+        else:
+            continue
+
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[f].history.has_changes() for f in fields):
+            continue
+
+        touched.add(obj.property_id)
+        # Moving a row between properties affects both calendars
+        touched.update(v for v in state.attrs.property_id.history.deleted if v is not None)
+
+    return touched - deleted_properties, deleted_properties
+
+
+def _sync_after_flush(session, flush_context):
+    """Rebuild index rows for properties touched by this flush"""
+    touched, deleted = _touched_property_ids(session)
+
+    if deleted:
+        session.connection().execute(
+            delete(PropertyAvailability.__table__).where(
+                PropertyAvailability.__table__.c.property_id.in_(deleted)
+            )
+        )
+    if touched:
+        AvailabilityIndex.rebuild(touched, session=session)
@@ -0,0 +1,155 @@
+"""
+Calendar Service
+Bulk loading of booked and blocked dates for property calendars
+"""
+
+from datetime import date, timedelta
+from sqlalchemy import select
+from extensions import db
+from app.models.booking import Booking, BookingStatus
+from app.models.blocked_date import BlockedDate
+
+
+# Booking statuses that occupy nights on a calendar
+ACTIVE_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.PENDING)
+
+
+def merge_ranges(ranges):
+    """Merge overlapping or touching [start, end) ranges into a sorted list"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+class PropertyCalendar:
+    """Booked and blocked days of a single property inside a [start, end) window"""
+
+    def __init__(self, property_id, start, end):
+        self.property_id = property_id
+        self.start = start
+        self.end = end
+        self._booked = []
+        self._blocked = set()
+
+    def add_booking(self, check_in, check_out):
+        """Add a booking stay, clipped to the calendar window"""
+        check_in = max(check_in, self.start)
+        check_out = min(check_out, self.end)
+        if check_in < check_out:
+            self._booked.append((check_in, check_out))
+
+    def add_blocked(self, blocked_date):
+        """Add a single blocked day if it falls inside the calendar window"""
+        if self.start <= blocked_date < self.end:
+            self._blocked.add(blocked_date)
+
+    def booked_ranges(self):
+        """Booked nights as merged [start, end) pairs"""
+        return merge_ranges(self._booked)
+
+    def blocked_ranges(self):
+        """Blocked days as merged [start, end) pairs"""
+        return merge_ranges((d, d + timedelta(days=1)) for d in self._blocked)
+
+    def booked_days(self):
+        """Every booked night as a sorted list of dates"""
+        days = []
+        for start, end in self.booked_ranges():
+            current = start
+            while current < end:
+                days.append(current)
+                current += timedelta(days=1)
+        return days
+
+    def blocked_days(self):
+        """Every blocked day as a sorted list of dates"""
+        return sorted(self._blocked)
+
+    def to_dict(self, calendar_format='days'):
+        """
+        Serialize the calendar
+
+        Args:
+            calendar_format: 'days' for one ISO string per day, 'ranges' for
+                             compact [start, end) ISO pairs
+
+        Returns:
+            Dictionary with booked and blocked dates
+        """
+        if calendar_format == 'ranges':
+            return {
+                'booked_ranges': [[s.isoformat(), e.isoformat()] for s, e in self.booked_ranges()],
+                'blocked_ranges': [[s.isoformat(), e.isoformat()] for s, e in self.blocked_ranges()],
+            }
+
+        return {
+            'booked_dates': [d.isoformat() for d in self.booked_days()],
+            'blocked_dates': [d.isoformat() for d in self.blocked_days()],
+        }
+
+
+class CalendarService:
+    """Service for building property calendars in bulk"""
+
+    CALENDAR_FORMATS = ('days', 'ranges')
+
+    @staticmethod
+    def default_window():
+        """Window used by listing calendars: today through one year ahead (inclusive)"""
+        today = date.today()
+        return today, today + timedelta(days=366)
+
+    @staticmethod
+    def load(property_ids, start=None, end=None, statuses=ACTIVE_STATUSES, session=None):
+        """
+        Load calendars for many properties with two set-based queries
+
+        Args:
+            property_ids: Iterable of property IDs
+            start: First day of the window (defaults to today)
+            end: Day after the last day of the window (defaults to one year ahead)
+            statuses: Booking statuses that count as booked
+            session: Session to query with (defaults to db.session)
+
+        Returns:
+            Dict of property_id -> PropertyCalendar
+        """
+        if start is None or end is None:
+            default_start, default_end = CalendarService.default_window()
+            start = start or default_start
+            end = end or default_end
+
+        property_ids = list(dict.fromkeys(property_ids))
+        calendars = {pid: PropertyCalendar(pid, start, end) for pid in property_ids}
+        if not property_ids:
+            return calendars
+
+        session = session or db.session
+
+        bookings = session.execute(
+            select(Booking.property_id, Booking.check_in, Booking.check_out).where(
+                Booking.property_id.in_(property_ids),
+                Booking.status.in_(statuses),
+                Booking.check_in < end,
+                Booking.check_out > start,
+            )
+        )
+        for property_id, check_in, check_out in bookings:
+            calendars[property_id].add_booking(check_in, check_out)
+
+        blocked = session.execute(
+            select(BlockedDate.property_id, BlockedDate.blocked_date).where(
+                BlockedDate.property_id.in_(property_ids),
+                BlockedDate.blocked_date >= start,
+                BlockedDate.blocked_date < end,
+            )
+        )
+        for property_id, blocked_date in blocked:
+            calendars[property_id].add_blocked(blocked_date)
+
+        return calendars
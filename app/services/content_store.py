@@ -0,0 +1,230 @@
+"""
+Content Store Service
+Content-addressed uploads: objects are keyed by the hash of what is stored,
+repeat uploads are recognised by the hash of what was sent, and every object
+carries a count of the rows that use it
+"""
+
+import hashlib
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update, delete
+from extensions import db
+from app.models.stored_file import StoredFile
+from app.services.s3_service import S3Service
+
+
+# Bump when the upload normalization (compress_image_bytes) changes output,
+# so old source hashes stop matching
+NORMALIZATION_VERSION = 'v1'
+
+# An upload that reused an object may not have attached it to a row yet;
+# deletes leave objects used this recently alone (the orphan sweep gets them)
+REUSE_GRACE_SECONDS = 3600
+
+
+def _insert_ignoring_duplicates(table):
+    """INSERT that skips rows whose unique key already exists"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(table).on_conflict_do_nothing(index_elements=['key'])
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert(table).on_conflict_do_nothing(index_elements=['key'])
+    from sqlalchemy import insert
+    return insert(table).prefix_with('IGNORE')
+
+
+class ContentStore:
+    """Service for deduplicated, reference-counted uploads"""
+
+    @staticmethod
+    def source_hash(data, normalization):
+        """
+        Hash of uploaded bytes plus how they will be normalized
+
+        Args:
+            data: Bytes as uploaded
+            normalization: Short description of the processing, e.g. 'jpeg'
+                           or 'raw', so the same input stored two ways
+                           doesn't collide
+        """
+        digest = hashlib.sha256(f'{NORMALIZATION_VERSION}:{normalization}:'.encode())
+        digest.update(data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def content_key(folder, body, ext):
+        """
+        Returns:
+            (key, content_hash) for the bytes that will be stored
+        """
+        content_hash = hashlib.sha256(body).hexdigest()
+        return f"{folder}/{content_hash}.{ext}", content_hash
+
+    @staticmethod
+    def find_sources(source_hashes):
+        """
+        Objects previously stored for these uploads, marked as just used
+
+        Returns:
+            Dict {source_hash: key}
+        """
+        if not source_hashes:
+            return {}
+
+        rows = db.session.execute(
+            select(StoredFile.source_hash, StoredFile.key).where(StoredFile.source_hash.in_(set(source_hashes)))
+        ).all()
+        found = {source_hash: key for source_hash, key in rows}
+        ContentStore.touch(found.values())
+        return found
+
+    @staticmethod
+    def existing_keys(keys):
+        """Subset of `keys` already recorded"""
+        if not keys:
+            return set()
+        return set(db.session.execute(select(StoredFile.key).where(StoredFile.key.in_(set(keys)))).scalars())
+
+    @staticmethod
+    def record(entries):
+        """
+        Record stored objects in the current transaction
+
+        Objects that are already recorded (same content uploaded again) are
+        left as they are apart from last_used_at.
+
+        Args:
+            entries: Dicts with key, content_hash, source_hash, size, content_type
+        """
+        if not entries:
+            return
+
+        now = datetime.utcnow()
+        db.session.connection().execute(
+            _insert_ignoring_duplicates(StoredFile.__table__),
+            [dict(entry, ref_count=0, created_at=now, last_used_at=now) for entry in entries],
+        )
+        ContentStore.touch([entry['key'] for entry in entries])
+
+    @staticmethod
+    def touch(keys):
+        """Mark objects as just used so pending deletes leave them alone"""
+        keys = list(set(keys))
+        if keys:
+            db.session.connection().execute(
+                update(StoredFile.__table__)
+                .where(StoredFile.__table__.c.key.in_(keys))
+                .values(last_used_at=datetime.utcnow())
+            )
+
+    @staticmethod
+    def keys_by_url(urls):
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        if not bucket_name:
+            return {}
+        return {
+            url: S3Service.key_from_url(url, bucket_name)
+            for url in urls if url and f"{bucket_name}.s3." in url
+        }
+
+    @staticmethod
+    def acquire(urls, session=None):
+        """Count a new reference to each URL (once per occurrence)"""
+        ContentStore._adjust(urls, 1, session or db.session)
+
+    @staticmethod
+    def release(urls, session=None):
+        """
+        Drop a reference to each URL (once per occurrence)
+
+        Returns:
+            (managed, unreferenced): URLs that are reference counted, and the
+            subset nothing refers to any more
+        """
+        session = session or db.session
+        keys = ContentStore._adjust(urls, -1, session)
+        if not keys:
+            return set(), set()
+
+        table = StoredFile.__table__
+        rows = session.connection().execute(
+            select(table.c.key, table.c.ref_count).where(table.c.key.in_(set(keys.values())))
+        ).all()
+        counts = dict(rows)
+        managed = {url for url, key in keys.items() if key in counts}
+        unreferenced = {url for url in managed if counts[keys[url]] <= 0}
+        return managed, unreferenced
+
+    @staticmethod
+    def _adjust(urls, step, session):
+        keys = ContentStore.keys_by_url(urls)
+        per_key = {}
+        for url in urls:
+            if url in keys:
+                per_key[keys[url]] = per_key.get(keys[url], 0) + step
+
+        table = StoredFile.__table__
+        for key, delta in per_key.items():
+            # In SQL so concurrent requests don't lose counts
+            session.connection().execute(
+                update(table).where(table.c.key == key).values(ref_count=table.c.ref_count + delta)
+            )
+        return keys
+
+    @staticmethod
+    def protected_keys(keys):
+        """
+        Keys that must not be deleted: still referenced, or reused by an
+        upload within the grace period that may not be attached yet
+
+        Derivatives (`{stem}_w{width}.{ext}`) share the status of an original
+        in the same batch; they are always queued together.
+        """
+        if not keys:
+            return set()
+        cutoff = datetime.utcnow() - timedelta(seconds=REUSE_GRACE_SECONDS)
+
+        def stem(key):
+            return key.rsplit('.', 1)[0].rsplit('_w', 1)[0]
+
+        table = StoredFile.__table__
+        busy = db.session.execute(
+            select(table.c.key).where(
+                table.c.key.in_(set(keys)),
+                (table.c.ref_count > 0) | (table.c.last_used_at >= cutoff),
+            )
+        ).scalars().all()
+        busy_stems = {stem(key) for key in busy}
+        return {key for key in keys if stem(key) in busy_stems}
+
+    @staticmethod
+    def forget(keys):
+        """Remove records of objects about to be deleted"""
+        if keys:
+            db.session.execute(delete(StoredFile).where(StoredFile.key.in_(set(keys))))
+
+    @staticmethod
+    def recount():
+        """
+        Recompute every ref_count from property photo rows
+
+        Returns:
+            Number of records whose count changed
+        """
+        from app.models.property_image import PropertyImage
+
+        counts = {}
+        for (url,) in db.session.query(PropertyImage.original_url):
+            for key in ContentStore.keys_by_url([url]).values():
+                counts[key] = counts.get(key, 0) + 1
+
+        changed = 0
+        for stored in StoredFile.query.all():
+            if stored.ref_count != counts.get(stored.key, 0):
+                stored.ref_count = counts.get(stored.key, 0)
+                changed += 1
+        db.session.commit()
+        return changed
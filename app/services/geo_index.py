@@ -0,0 +1,502 @@
+"""
+Geo Index Service
+Geohash cells for property coordinates, stored in a B-tree indexed column,
+radius / nearest-neighbour search ordered by Haversine distance, and the
+per-cell aggregates behind map clusters
+"""
+
+import math
+from datetime import datetime
+from itertools import chain
+from sqlalchemy import event, inspect, select, delete, func, and_, or_, false
+from extensions import db
+from app.models.property import Property, PropertyStatus
+from app.models.geo_cell import PropertyGeoCell
+
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Stored precision; 9 characters is a cell of roughly 5m x 5m
+GEOHASH_PRECISION = 9
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+# Upper bound on cells (index range scans) per search; larger areas use
+# shorter, coarser prefixes
+MAX_CELLS = 16
+
+MAX_RADIUS_KM = 200
+
+# First ring tried by nearest(); doubled until enough listings are found
+NEAREST_START_KM = 5
+
+# Prefix lengths aggregated in property_geo_cells
+PYRAMID_PRECISIONS = (1, 2, 3, 4, 5, 6)
+
+# Cluster prefix length per map zoom level (index = zoom); deeper zooms
+# always get listings
+ZOOM_PRECISION = (1, 1, 2, 2, 2, 3, 3, 4, 4, 4, 5, 5, 6, 6)
+
+# Clusters per response whatever the viewport; wide views use coarser cells
+MAX_CLUSTERS = 256
+
+# Viewports holding this many listings or fewer get listings, not clusters
+CLUSTER_THRESHOLD = 100
+
+# Property columns that move a listing between cells or change a cell's aggregates
+CLUSTER_FIELDS = ('geohash', 'status', 'price_per_night')
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, or None if the coordinates are missing or invalid"""
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a cell with `precision` characters"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_box(latitude, longitude, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) enclosing a circle"""
+    dlat = radius_km / KM_PER_DEGREE
+    min_lat, max_lat = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    # Near the poles the circle covers every longitude
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 89.9:
+        return min_lat, -180.0, max_lat, 180.0
+    dlng = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+    if dlng >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    return min_lat, longitude - dlng, max_lat, longitude + dlng
+
+
+def unwrap_longitudes(min_lng, max_lng):
+    """
+    (min_lng, max_lng) of a map box with max_lng carried past 180 when the
+    box crosses the antimeridian (min_lng > max_lng), as the cell grid wants
+    """
+    if max_lng < min_lng:
+        return min_lng, max_lng + 360
+    return min_lng, max_lng
+
+
+def longitude_condition(min_lng, max_lng, column=None):
+    """Exact longitude bounds of a box, either side of the antimeridian when it wraps"""
+    column = Property.longitude if column is None else column
+    if max_lng < min_lng:
+        return or_(column >= min_lng, column <= max_lng)
+    return column.between(min_lng, max_lng)
+
+
+def within_longitudes(longitude, min_lng, max_lng):
+    """longitude_condition for a value already in hand"""
+    if max_lng < min_lng:
+        return longitude >= min_lng or longitude <= max_lng
+    return min_lng <= longitude <= max_lng
+
+
+def _successor(prefix):
+    """Smallest string after every string starting with `prefix`, or None"""
+    chars = list(prefix)
+    while chars:
+        position = BASE32.index(chars[-1])
+        if position + 1 < len(BASE32):
+            chars[-1] = BASE32[position + 1]
+            return ''.join(chars)
+        chars.pop()
+    return None
+
+
+def _grid(min_lat, min_lng, max_lat, max_lng, precision):
+    """Row and column indexes of the cells of one precision touching a box"""
+    height, width = cell_size(precision)
+    if max_lng - min_lng >= 360:
+        min_lng, max_lng = -180.0, 180.0
+    rows = range(
+        int(math.floor((max(min_lat, -90.0) + 90) / height)),
+        min(int(math.floor((min(max_lat, 90.0) + 90) / height)), int(round(180 / height)) - 1) + 1,
+    )
+    columns = range(int(math.floor((min_lng + 180) / width)), int(math.floor((max_lng + 180) / width)) + 1)
+    return rows, columns
+
+
+def cell_count(min_lat, min_lng, max_lat, max_lng, precision):
+    rows, columns = _grid(min_lat, min_lng, max_lat, max_lng, precision)
+    return len(rows) * min(len(columns), int(round(360 / cell_size(precision)[1])))
+
+
+def cells(min_lat, min_lng, max_lat, max_lng, precision):
+    """
+    Every cell of one precision touching a box
+
+    Longitudes outside [-180, 180] wrap, so boxes crossing the antimeridian
+    work.
+    """
+    height, width = cell_size(precision)
+    rows, columns = _grid(min_lat, min_lng, max_lat, max_lng, precision)
+    total_columns = int(round(360 / width))
+    found = set()
+    for row in rows:
+        for column in columns:
+            latitude = -90 + (row + 0.5) * height
+            longitude = -180 + ((column % total_columns) + 0.5) * width
+            found.add(encode(latitude, longitude, precision))
+    return sorted(found)
+
+
+def cover(min_lat, min_lng, max_lat, max_lng):
+    """
+    Geohash prefixes whose cells together cover a box, using the longest
+    prefixes that need at most MAX_CELLS cells
+
+    Returns:
+        Sorted list of prefixes
+    """
+    precision = GEOHASH_PRECISION
+    while precision > 1 and cell_count(min_lat, min_lng, max_lat, max_lng, precision) > MAX_CELLS:
+        precision -= 1
+    return cells(min_lat, min_lng, max_lat, max_lng, precision)
+
+
+def prefix_condition(prefixes, column=None):
+    """
+    Index range conditions matching geohashes under any of `prefixes`
+
+    Neighbouring prefixes are merged into one range, so the B-tree is
+    scanned once per run of adjacent cells.
+
+    Args:
+        prefixes: Geohash prefixes
+        column: Geohash column to match (default Property.geohash)
+
+    Returns:
+        Condition; false() when there are no prefixes (empty box)
+    """
+    column = Property.geohash if column is None else column
+    if not prefixes:
+        return false()
+    ranges = []
+    for prefix in sorted(prefixes):
+        upper = _successor(prefix)
+        if ranges and ranges[-1][1] is not None and ranges[-1][1] >= prefix:
+            if upper is None or upper > ranges[-1][1]:
+                ranges[-1][1] = upper
+            continue
+        ranges.append([prefix, upper])
+
+    clauses = []
+    for lower, upper in ranges:
+        if upper is None:
+            clauses.append(column >= lower)
+        else:
+            clauses.append(and_(column >= lower, column < upper))
+    return or_(*clauses)
+
+
+class GeoIndex:
+    """Service for geohash maintenance and spatial property search"""
+
+    @staticmethod
+    def init_app(app):
+        """Keep geohashes and cell aggregates in step with property changes"""
+        if not event.contains(db.session, 'before_flush', _sync_before_flush):
+            event.listen(db.session, 'before_flush', _sync_before_flush)
+            event.listen(db.session, 'after_flush', _sync_cells_after_flush)
+
+    @staticmethod
+    def box_condition(min_lat, min_lng, max_lat, max_lng):
+        """
+        Filter for properties inside a box: index ranges plus the exact bounds
+
+        min_lng > max_lng is a box across the antimeridian.
+        """
+        west, east = unwrap_longitudes(min_lng, max_lng)
+        return and_(
+            prefix_condition(cover(min_lat, west, max_lat, east)),
+            Property.latitude.between(min_lat, max_lat),
+            longitude_condition(min_lng, max_lng),
+        )
+
+    @staticmethod
+    def search(latitude, longitude, radius_km, limit=None, query=None):
+        """
+        Active properties within `radius_km`, nearest first
+
+        Only ids and coordinates of the candidate cells are read; distances
+        are computed here.
+
+        Args:
+            latitude, longitude: Centre of the search
+            radius_km: Search radius (capped at MAX_RADIUS_KM)
+            limit: Keep only the nearest `limit` results
+            query: Optional extra conditions (list of SQL expressions)
+
+        Returns:
+            List of (property_id, distance_km)
+        """
+        radius_km = min(float(radius_km), MAX_RADIUS_KM)
+        min_lat, min_lng, max_lat, max_lng = radius_box(latitude, longitude, radius_km)
+
+        conditions = [
+            Property.status == PropertyStatus.ACTIVE,
+            prefix_condition(cover(min_lat, min_lng, max_lat, max_lng)),
+            Property.latitude.between(min_lat, max_lat),
+        ]
+        # Boxes that wrap past the antimeridian rely on the cell ranges alone
+        if -180 <= min_lng and max_lng <= 180:
+            conditions.append(Property.longitude.between(min_lng, max_lng))
+        conditions.extend(query or [])
+
+        rows = db.session.execute(
+            select(Property.id, Property.latitude, Property.longitude).where(*conditions)
+        ).all()
+
+        found = []
+        for property_id, lat, lng in rows:
+            distance = haversine_km(latitude, longitude, lat, lng)
+            if distance <= radius_km:
+                found.append((property_id, distance))
+        found.sort(key=lambda item: (item[1], item[0]))
+        return found[:limit] if limit else found
+
+    @staticmethod
+    def nearest(latitude, longitude, k, max_radius_km=MAX_RADIUS_KM, query=None):
+        """
+        The `k` nearest active properties within `max_radius_km`
+
+        Searches growing circles so dense areas only read nearby cells.
+
+        Returns:
+            List of (property_id, distance_km)
+        """
+        radius = min(NEAREST_START_KM, max_radius_km)
+        while True:
+            found = GeoIndex.search(latitude, longitude, radius, limit=k, query=query)
+            if len(found) >= k or radius >= max_radius_km:
+                return found
+            radius = min(radius * 2, max_radius_km)
+
+    @staticmethod
+    def clusters(min_lat, min_lng, max_lat, max_lng, zoom):
+        """
+        Listing clusters for a map viewport, read from the cell pyramid
+
+        Args:
+            min_lat, min_lng, max_lat, max_lng: Viewport
+            zoom: Map zoom level
+
+        Returns:
+            List of cluster dicts (at most MAX_CLUSTERS), or None when the
+            zoom is deep enough to show listings
+        """
+        if zoom >= len(ZOOM_PRECISION):
+            return None
+
+        # A viewport across the antimeridian has min_lng > max_lng
+        west, east = unwrap_longitudes(min_lng, max_lng)
+        precision = ZOOM_PRECISION[max(zoom, 0)]
+        while precision > 1 and cell_count(min_lat, west, max_lat, east, precision) > MAX_CLUSTERS:
+            precision -= 1
+
+        rows = db.session.execute(
+            select(PropertyGeoCell).where(
+                PropertyGeoCell.precision == precision,
+                PropertyGeoCell.cell.in_(cells(min_lat, west, max_lat, east, precision)),
+            )
+        ).scalars()
+
+        clusters = []
+        for row in rows:
+            # Edge cells are shown when most of their listings are in view
+            if not (min_lat <= row.latitude <= max_lat and within_longitudes(row.longitude, min_lng, max_lng)):
+                continue
+            clusters.append({
+                'cell': row.cell,
+                'latitude': round(row.latitude, 6),
+                'longitude': round(row.longitude, 6),
+                'count': row.listing_count,
+                'min_price': float(row.min_price),
+            })
+        return clusters
+
+    @staticmethod
+    def refresh_cells(geohashes, session=None):
+        """
+        Recompute the pyramid cells containing the given geohashes
+
+        Args:
+            geohashes: Geohashes (old and new) of changed properties
+            session: Session to write with (defaults to db.session)
+        """
+        session = session or db.session
+        geohashes = {geohash for geohash in geohashes if geohash}
+        if not geohashes:
+            return
+
+        for precision in PYRAMID_PRECISIONS:
+            cell_ids = {geohash[:precision] for geohash in geohashes}
+            aggregates = _aggregate_cells(session, precision, prefix_condition(cell_ids))
+            found = {row['cell'] for row in aggregates}
+
+            table = PropertyGeoCell.__table__
+            empty = cell_ids - found
+            if empty:
+                session.connection().execute(
+                    delete(table).where(table.c.precision == precision, table.c.cell.in_(empty))
+                )
+            if aggregates:
+                session.connection().execute(_upsert_cells(session), aggregates)
+
+    @staticmethod
+    def rebuild_cells(session=None):
+        """
+        Recompute the whole pyramid from the properties table
+
+        Returns:
+            Number of cells written
+        """
+        session = session or db.session
+        session.connection().execute(delete(PropertyGeoCell.__table__))
+
+        written = 0
+        for precision in PYRAMID_PRECISIONS:
+            aggregates = _aggregate_cells(session, precision)
+            if aggregates:
+                session.connection().execute(_upsert_cells(session), aggregates)
+            written += len(aggregates)
+        return written
+
+    @staticmethod
+    def rebuild():
+        """
+        Recompute every property's geohash, then the cell pyramid
+
+        Returns:
+            (properties whose geohash changed, cells written)
+        """
+        changed = 0
+        for property in Property.query.all():
+            geohash = encode(property.latitude, property.longitude)
+            if property.geohash != geohash:
+                property.geohash = geohash
+                changed += 1
+        db.session.flush()
+
+        written = GeoIndex.rebuild_cells()
+        db.session.commit()
+        return changed, written
+
+
+def _aggregate_cells(session, precision, condition=None):
+    """Cell rows of one precision, grouped from active properties"""
+    cell = func.substr(Property.geohash, 1, precision)
+    query = select(
+        cell,
+        func.count(Property.id),
+        func.sum(Property.latitude),
+        func.sum(Property.longitude),
+        func.min(Property.price_per_night),
+    ).where(
+        Property.status == PropertyStatus.ACTIVE,
+        Property.geohash.isnot(None),
+    ).group_by(cell)
+    if condition is not None:
+        query = query.where(condition)
+
+    now = datetime.utcnow()
+    return [
+        {
+            'precision': precision,
+            'cell': cell_id,
+            'listing_count': count,
+            'latitude_sum': latitude_sum,
+            'longitude_sum': longitude_sum,
+            'min_price': min_price,
+            'updated_at': now,
+        }
+        for cell_id, count, latitude_sum, longitude_sum, min_price in session.execute(query)
+    ]
+
+
+def _upsert_cells(session):
+    """INSERT of cell rows that overwrites existing cells"""
+    table = PropertyGeoCell.__table__
+    columns = ('listing_count', 'latitude_sum', 'longitude_sum', 'min_price', 'updated_at')
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=['precision', 'cell'],
+            set_={column: stmt.excluded[column] for column in columns},
+        )
+    from sqlalchemy.dialects.mysql import insert
+    stmt = insert(table)
+    return stmt.on_duplicate_key_update({column: stmt.inserted[column] for column in columns})
+
+
+def _sync_before_flush(session, flush_context, instances):
+    """Recompute geohashes of properties whose coordinates changed"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Property):
+            continue
+        if obj not in session.new:
+            attrs = inspect(obj).attrs
+            if not (attrs.latitude.history.has_changes() or attrs.longitude.history.has_changes()):
+                continue
+        obj.geohash = encode(obj.latitude, obj.longitude)
+
+
+def _sync_cells_after_flush(session, flush_context):
+    """Refresh the cells of properties added, moved, repriced or removed"""
+    geohashes = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Property):
+            continue
+        state = inspect(obj)
+        if obj in session.dirty and not any(state.attrs[f].history.has_changes() for f in CLUSTER_FIELDS):
+            continue
+        geohashes.add(obj.geohash)
+        geohashes.update(state.attrs.geohash.history.deleted)
+
+    if geohashes:
+        GeoIndex.refresh_cells(geohashes, session=session)
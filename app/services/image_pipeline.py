@@ -0,0 +1,214 @@
+"""
+Image Upload Pipeline
+Compresses images in the image process pool and uploads them to S3 from a
+bounded thread pool, so a multi-image upload costs roughly one resize plus
+one PUT instead of the sum of all of them
+"""
+
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.services.s3_service import S3Service
+from app.services.content_store import ContentStore
+from app.services.image_processing import (
+    ImageProcessor, ImageJobError, ImageJobTimeout, ImageQueueFull, compress_image_bytes
+)
+
+
+# Extensions that get resized and re-encoded as JPEG before upload
+COMPRESSIBLE_EXTENSIONS = ('jpg', 'jpeg', 'png')
+
+
+def upload_threads():
+    """The shared bounded upload thread pool"""
+    return _PoolManager.threads(current_app.config.get('IMAGE_UPLOAD_THREADS', 8))
+
+
+class UploadResult:
+    """Outcome of uploading one file, at the file's position in the request"""
+
+    def __init__(self, index, filename, url=None, error=None):
+        self.index = index
+        self.filename = filename
+        self.url = url
+        self.error = error
+        # Content-addressed uploads: served from an earlier upload without
+        # compressing or uploading, or stored under a key that didn't exist
+        self.reused = False
+        self.created = False
+        self.stored = None
+
+    @property
+    def ok(self):
+        return self.url is not None
+
+    def to_dict(self):
+        return {
+            'index': self.index,
+            'filename': self.filename,
+            'url': self.url,
+            'error': self.error,
+        }
+
+
+class ImageUploadError(Exception):
+    """One or more files of a multi-file upload failed"""
+
+    def __init__(self, results):
+        self.results = results
+        failed = [r for r in results if not r.ok]
+        super().__init__(f'{len(failed)} of {len(results)} images failed to upload')
+
+    def to_dict(self):
+        return {
+            'error': str(self),
+            'files': [r.to_dict() for r in self.results],
+        }
+
+
+class _PoolManager:
+    """Per-process upload threads, recreated after a fork"""
+
+    _lock = threading.Lock()
+    _pid = None
+    _threads = None
+
+    @classmethod
+    def threads(cls, size):
+        if cls._pid != os.getpid():
+            with cls._lock:
+                if cls._pid != os.getpid():
+                    cls._threads = ThreadPoolExecutor(max_workers=size, thread_name_prefix='s3-upload')
+                    cls._pid = os.getpid()
+        return cls._threads
+
+
+class ImageUploadPipeline:
+    """Parallel compress-and-upload for multi-image requests"""
+
+    @staticmethod
+    def upload_files(files, folder='images', compress=True, dedupe=False):
+        """
+        Compress and upload files in parallel
+
+        Args:
+            files: File objects from request.files
+            folder: S3 folder/prefix
+            compress: Whether to compress images
+            dedupe: Store under a hash of the stored bytes and skip files
+                    uploaded before (see ContentStore); the caller commits
+                    the stored_files records
+
+        Returns:
+            List of UploadResult in the same order as `files`
+        """
+        config = current_app.config
+        bucket_name = config.get('S3_BUCKET_NAME')
+        region = config.get('AWS_REGION', 'us-east-1')
+        logger = current_app.logger
+
+        results = [UploadResult(i, getattr(f, 'filename', None)) for i, f in enumerate(files)]
+        if not bucket_name:
+            for result in results:
+                result.error = 'S3_BUCKET_NAME not configured'
+            return results
+
+        # Read everything on the request thread; file streams aren't shareable
+        jobs = []
+        for result, file in zip(results, files):
+            if not file or not S3Service.allowed_file(file.filename):
+                result.error = 'File type not allowed'
+                continue
+            ext = file.filename.rsplit('.', 1)[1].lower()
+            jobs.append((result, ext, file.read()))
+
+        source_hashes = {}
+        if dedupe:
+            for result, ext, data in jobs:
+                normalization = 'jpeg' if compress and ext in COMPRESSIBLE_EXTENSIONS else 'raw'
+                source_hashes[result.index] = ContentStore.source_hash(data, normalization)
+
+            # A repeat upload costs one indexed lookup: no compression, no PUT
+            found = ContentStore.find_sources(list(source_hashes.values()))
+            for result, ext, data in jobs:
+                if source_hashes[result.index] in found:
+                    result.url = S3Service.url_for_key(found[source_hashes[result.index]])
+                    result.reused = True
+            jobs = [job for job in jobs if not job[0].reused]
+
+        s3_client = S3Service.get_s3_client()
+        threads = upload_threads()
+        # Upload threads have no app context, so read settings here
+        job_timeout = ImageProcessor.settings()['job_timeout']
+
+        def put(result, ext, body, content_type, source_hash=None):
+            if dedupe:
+                key, content_hash = ContentStore.content_key(folder, body, ext)
+                result.stored = {
+                    'key': key,
+                    'content_hash': content_hash,
+                    'source_hash': source_hash,
+                    'size': len(body),
+                    'content_type': content_type,
+                }
+            else:
+                key = f"{folder}/{uuid.uuid4().hex}.{ext}"
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=body, ContentType=content_type)
+            return f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
+
+        def compress_then_put(result, ext, data, compressed_future):
+            # Only bytes processed the way the source hash says may be found
+            # by it later; anything else is stored without one
+            source_hash = source_hashes.get(result.index)
+            if not (compress and ext in COMPRESSIBLE_EXTENSIONS):
+                return put(result, ext, data, f'image/{ext}', source_hash)
+
+            try:
+                if compressed_future is None:
+                    body = compress_image_bytes(data)
+                else:
+                    try:
+                        body = ImageProcessor.result(compressed_future, job_timeout)
+                    except ImageJobTimeout:
+                        raise
+                    except ImageJobError:
+                        # The pool died under the job; it's rebuilt for the next one
+                        body = compress_image_bytes(data)
+            except Exception as e:
+                # Never store the original instead: it may be a decompression
+                # bomb, and it still carries its EXIF (GPS position)
+                logger.error(f'Image compression error: {str(e)}')
+                result.error = 'Image could not be processed'
+                return None
+
+            return put(result, 'jpg' if dedupe else ext, body, 'image/jpeg', source_hash)
+
+        pending = []
+        for result, ext, data in jobs:
+            compressed_future = None
+            if compress and ext in COMPRESSIBLE_EXTENSIONS:
+                try:
+                    compressed_future = ImageProcessor.submit(compress_image_bytes, data)
+                except ImageQueueFull as e:
+                    result.error = str(e)
+                    continue
+            pending.append((result, threads.submit(compress_then_put, result, ext, data, compressed_future)))
+
+        for result, future in pending:
+            try:
+                result.url = future.result()
+            except Exception as e:
+                logger.error(f'S3 upload error: {str(e)}')
+                result.error = str(e)
+
+        if dedupe:
+            stored = [result.stored for result in results if result.ok and result.stored]
+            existing = ContentStore.existing_keys([entry['key'] for entry in stored])
+            for result in results:
+                if result.ok and result.stored:
+                    result.created = result.stored['key'] not in existing
+            ContentStore.record(stored)
+
+        return results
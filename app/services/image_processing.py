@@ -0,0 +1,288 @@
+"""
+Image Processing Engine
+Fast decode/resize/encode helpers and a bounded process pool that runs them
+off the request thread
+"""
+
+import base64
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from PIL import Image, ImageOps
+
+
+# Refuse decompression bombs well before PIL's own (warning-only) limit
+MAX_PIXELS = 50_000_000
+
+EXIF_ORIENTATION = 0x0112
+# Orientations that swap width and height
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+WHITE = (255, 255, 255, 255)
+
+
+class ImageJobError(Exception):
+    """An image job could not be run"""
+
+
+class ImageQueueFull(ImageJobError):
+    """Every slot of the image pool stayed busy for IMAGE_QUEUE_WAIT_SECONDS"""
+
+
+class ImageJobTimeout(ImageJobError):
+    """An image job ran longer than IMAGE_JOB_TIMEOUT_SECONDS"""
+
+
+def open_image(data, max_size=None):
+    """
+    Decode an image, upright and without metadata
+
+    For JPEGs, `max_size` enables draft mode: libjpeg decodes straight to
+    1/2, 1/4 or 1/8 scale (never below the size the image will be shrunk
+    to), which skips most of the IDCT work for large photos.
+
+    Args:
+        data: Encoded image bytes
+        max_size: (width, height) box the caller will shrink into, upright
+
+    Returns:
+        (PIL image, ICC profile bytes or None)
+    """
+    img = Image.open(io.BytesIO(data))
+    if img.width * img.height > MAX_PIXELS:
+        raise ValueError(f'Image too large: {img.width}x{img.height}')
+
+    if max_size and img.format == 'JPEG':
+        box = max_size
+        if img.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+            # Draft sizes are in stored (pre-rotation) coordinates
+            box = (max_size[1], max_size[0])
+        scale = min(box[0] / img.width, box[1] / img.height, 1)
+        img.draft('RGB', (max(1, round(img.width * scale)), max(1, round(img.height * scale))))
+
+    icc_profile = img.info.get('icc_profile')
+    img = ImageOps.exif_transpose(img)
+    # EXIF (GPS position, device serials) and XMP never leave the server
+    img.info = {}
+    return img, icc_profile
+
+
+def flatten(img):
+    """RGB copy with any transparency composited onto white"""
+    if img.mode == 'RGB':
+        return img
+    if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+        img = img.convert('RGBA')
+        background = Image.new('RGBA', img.size, WHITE)
+        return Image.alpha_composite(background, img).convert('RGB')
+    return img.convert('RGB')
+
+
+def encode(img, fmt, quality, icc_profile=None):
+    """Encode as progressive JPEG or WebP"""
+    output = io.BytesIO()
+    if fmt == 'webp':
+        img.save(output, format='WEBP', quality=quality, method=4, icc_profile=icc_profile)
+    else:
+        img.save(output, format='JPEG', quality=quality, optimize=True, progressive=True,
+                 icc_profile=icc_profile)
+    return output.getvalue()
+
+
+def compress_image_bytes(data, max_size=(1920, 1080), quality=85):
+    """
+    Shrink an image into `max_size` and re-encode it as JPEG
+
+    Args:
+        data: Original image bytes
+        max_size: Max dimensions (width, height)
+        quality: JPEG quality (1-100)
+
+    Returns:
+        Compressed JPEG bytes
+    """
+    img, icc_profile = open_image(data, max_size)
+    # Flatten first: resampling RGBA (premultiplied) costs twice as much as RGB
+    img = flatten(img)
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    return encode(img, 'jpeg', quality, icc_profile)
+
+
+def make_derivatives(data, widths, formats, quality=80, placeholder_size=16):
+    """
+    Resize an image to several widths and formats
+
+    Widths larger than the original are clamped to the original width.
+
+    Args:
+        data: Original image bytes
+        widths: Target widths in px
+        formats: Any of 'webp', 'jpeg'
+        quality: Output quality (1-100)
+        placeholder_size: Bounding box of the LQIP placeholder
+
+    Returns:
+        Dict with width, height (of the upright original), placeholder
+        (data URI) and variants {width: {format: bytes}}
+    """
+    probe = Image.open(io.BytesIO(data))
+    width, height = probe.size
+    if probe.format == 'JPEG' and probe.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    probe.close()
+
+    largest = min(max(widths), width)
+    img, icc_profile = open_image(data, (largest, height))
+    img = flatten(img)
+
+    variants = {}
+    # Largest first, each step resized from the previous one
+    source = img
+    for target in sorted({min(w, width) for w in widths}, reverse=True):
+        if target != source.width:
+            source = source.resize(
+                (target, max(1, round(height * target / width))), Image.Resampling.LANCZOS
+            )
+        variants[target] = {fmt: encode(source, fmt, quality, icc_profile) for fmt in formats}
+
+    tiny = source.copy()
+    tiny.thumbnail((placeholder_size, placeholder_size), Image.Resampling.BILINEAR)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(encode(tiny, 'webp', 40)).decode('ascii')
+
+    return {
+        'width': width,
+        'height': height,
+        'placeholder': placeholder,
+        'variants': variants,
+    }
+
+
+class ImageProcessor:
+    """
+    Per-process pool for CPU-bound image jobs
+
+    At most IMAGE_QUEUE_SIZE jobs are queued or running; callers wait up to
+    IMAGE_QUEUE_WAIT_SECONDS for a slot, then get ImageQueueFull. A job that
+    runs past its timeout has its workers terminated so it can't keep a core
+    busy. The pool is rebuilt lazily after a fork or a failure.
+    """
+
+    _lock = threading.Lock()
+    _pid = None
+    _pool = None
+    _slots = None
+
+    @staticmethod
+    def settings():
+        config = current_app.config
+        workers = config.get('IMAGE_PROCESS_WORKERS', min(4, os.cpu_count() or 1))
+        return {
+            'workers': workers,
+            'queue_size': config.get('IMAGE_QUEUE_SIZE', max(workers, 1) * 4),
+            'queue_wait': config.get('IMAGE_QUEUE_WAIT_SECONDS', 10),
+            'job_timeout': config.get('IMAGE_JOB_TIMEOUT_SECONDS', 30),
+        }
+
+    @classmethod
+    def _ensure(cls, settings):
+        if cls._pid == os.getpid() and (cls._pool is not None or settings['workers'] <= 0):
+            return
+        with cls._lock:
+            if cls._pid != os.getpid():
+                cls._slots = threading.BoundedSemaphore(settings['queue_size'])
+                cls._pool = None
+                cls._pid = os.getpid()
+            if cls._pool is None and settings['workers'] > 0:
+                # Never fork a process that may be running threads (outbox
+                # workers, S3 pools); start clean interpreters instead
+                method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                cls._pool = ProcessPoolExecutor(
+                    max_workers=settings['workers'],
+                    mp_context=multiprocessing.get_context(method),
+                )
+
+    @classmethod
+    def submit(cls, fn, *args):
+        """
+        Queue a picklable function
+
+        Returns:
+            Future; with IMAGE_PROCESS_WORKERS = 0 the job runs inline and
+            the future is already resolved
+        """
+        settings = cls.settings()
+        cls._ensure(settings)
+        slots = cls._slots
+
+        if not slots.acquire(timeout=settings['queue_wait']):
+            raise ImageQueueFull('Image processing queue is full')
+
+        pool = cls._pool
+        if pool is not None:
+            try:
+                future = pool.submit(fn, *args)
+                future.add_done_callback(lambda _: slots.release())
+                return future
+            except (BrokenProcessPool, RuntimeError):
+                cls.discard(pool)
+
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            slots.release()
+        return future
+
+    @classmethod
+    def result(cls, future, timeout=None):
+        """
+        Wait for a job
+
+        Raises:
+            ImageJobTimeout: The job ran too long (its pool is recycled)
+            ImageJobError: The pool died under the job
+        """
+        timeout = timeout or cls.settings()['job_timeout']
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            cls.discard(cls._pool, terminate=True)
+            raise ImageJobTimeout(f'Image job exceeded {timeout}s')
+        except BrokenProcessPool as e:
+            cls.discard(cls._pool)
+            raise ImageJobError('Image worker died') from e
+
+    @classmethod
+    def run(cls, fn, *args, timeout=None):
+        """
+        submit() and result(); retried inline once if the pool is broken
+
+        A full queue or a job that ran too long is raised, never retried
+        inline, so the queue bound holds for every caller.
+        """
+        try:
+            return cls.result(cls.submit(fn, *args), timeout)
+        except (ImageQueueFull, ImageJobTimeout):
+            raise
+        except ImageJobError:
+            return fn(*args)
+
+    @classmethod
+    def discard(cls, pool, terminate=False):
+        """Drop a pool so the next job starts a fresh one"""
+        if pool is None:
+            return
+        with cls._lock:
+            if cls._pool is pool:
+                cls._pool = None
+        if terminate:
+            # The executor has no public way to stop a running job
+            for process in list((getattr(pool, '_processes', None) or {}).values()):
+                process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
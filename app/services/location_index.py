@@ -0,0 +1,241 @@
+"""
+Location Index Service
+Normalized city/country keys for indexed location search, and an in-memory
+prefix trie of the cities that have active listings, for autocomplete
+"""
+
+import threading
+import time
+import unicodedata
+from itertools import chain
+from flask import current_app
+from sqlalchemy import event, inspect, select, func
+from extensions import db
+from app.models.property import Property, PropertyStatus
+
+
+DEFAULTS = {
+    # The trie is per process and follows this process's commits at once;
+    # a full reload picks up other workers' changes
+    'LOCATION_INDEX_REFRESH_SECONDS': 300,
+}
+
+MAX_SUGGESTIONS = 20
+
+def location_key(value):
+    """Casefolded, accent-stripped, whitespace-collapsed form of a place name"""
+    if not value:
+        return None
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split()) or None
+
+
+def prefix_filter(column, value):
+    """Condition matching keys that start with the normalized `value`"""
+    return column.startswith(location_key(value), autoescape=True)
+
+
+class _Node:
+    __slots__ = ('children', 'locations')
+
+    def __init__(self):
+        self.children = {}
+        self.locations = set()
+
+
+class LocationTrie:
+    """
+    Cities with listing counts, reachable from the start of any word of the
+    city name ("york" finds "new york")
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = _Node()
+        # (city_key, country_key) -> [city, country, listing count]
+        self._locations = {}
+
+    def add(self, city_key, country_key, city, country, delta=1):
+        """Change a city's listing count, inserting it on first sight"""
+        location = (city_key, country_key)
+        with self._lock:
+            entry = self._locations.get(location)
+            if entry is None:
+                if delta <= 0:
+                    return
+                entry = self._locations[location] = [' '.join(city.split()), ' '.join((country or '').split()), 0]
+                for suffix in self._word_suffixes(city_key):
+                    self._node(suffix, create=True).locations.add(location)
+            entry[2] += delta
+            if entry[2] <= 0:
+                del self._locations[location]
+                for suffix in self._word_suffixes(city_key):
+                    self._node(suffix).locations.discard(location)
+
+    def search(self, prefix, country_key=None, limit=10):
+        """
+        Cities matching a normalized prefix, most listings first
+
+        Returns:
+            List of dicts with city, country and count
+        """
+        with self._lock:
+            node = self._node(prefix)
+            if node is None:
+                return []
+
+            found = set()
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                found.update(current.locations)
+                stack.extend(current.children.values())
+
+            matches = [
+                self._locations[location] for location in found
+                if country_key is None or (location[1] or '').startswith(country_key)
+            ]
+
+        matches.sort(key=lambda entry: (-entry[2], entry[0]))
+        return [{'city': city, 'country': country, 'count': count} for city, country, count in matches[:limit]]
+
+    def _node(self, key, create=False):
+        node = self._root
+        for char in key:
+            child = node.children.get(char)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[char] = _Node()
+            node = child
+        return node
+
+    @staticmethod
+    def _word_suffixes(key):
+        words = key.split(' ')
+        return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class LocationIndex:
+    """Service for location keys and city autocomplete"""
+
+    _lock = threading.Lock()
+
+    @staticmethod
+    def init_app(app):
+        """Maintain keys on flush and apply committed changes to the trie"""
+        for key, value in DEFAULTS.items():
+            app.config.setdefault(key, value)
+        app.extensions['location_index'] = {'trie': None, 'loaded_at': 0.0}
+
+        if not event.contains(db.session, 'before_flush', _sync_before_flush):
+            event.listen(db.session, 'before_flush', _sync_before_flush)
+            event.listen(db.session, 'after_commit', _apply_after_commit)
+            event.listen(db.session, 'after_soft_rollback', _forget_after_rollback)
+
+    @staticmethod
+    def trie():
+        """The loaded trie, reloaded from the database when stale"""
+        state = current_app.extensions['location_index']
+        max_age = current_app.config['LOCATION_INDEX_REFRESH_SECONDS']
+        if state['trie'] is not None and time.monotonic() - state['loaded_at'] < max_age:
+            return state['trie']
+
+        with LocationIndex._lock:
+            if state['trie'] is None or time.monotonic() - state['loaded_at'] >= max_age:
+                state['trie'] = LocationIndex.load()
+                state['loaded_at'] = time.monotonic()
+        return state['trie']
+
+    @staticmethod
+    def load():
+        """Build a trie from one grouped query over active listings"""
+        trie = LocationTrie()
+        rows = db.session.execute(
+            select(
+                Property.city_key,
+                Property.country_key,
+                func.min(Property.city),
+                func.min(Property.country),
+                func.count(Property.id),
+            ).where(
+                Property.status == PropertyStatus.ACTIVE,
+                Property.city_key.isnot(None),
+            ).group_by(Property.city_key, Property.country_key)
+        )
+        for city_key, country_key, city, country, count in rows:
+            trie.add(city_key, country_key, city, country, count)
+        return trie
+
+    @staticmethod
+    def autocomplete(query, country=None, limit=10):
+        """Cities starting with `query` (any word), most listings first"""
+        prefix = location_key(query)
+        if not prefix:
+            return []
+        return LocationIndex.trie().search(prefix, location_key(country), max(1, min(limit, MAX_SUGGESTIONS)))
+
+
+def _sync_before_flush(session, flush_context, instances):
+    """Normalize changed city/country and remember per-city count changes"""
+    changed = []
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Property):
+            continue
+        attrs = inspect(obj).attrs
+        if obj in session.new or attrs.city.history.has_changes() or attrs.country.history.has_changes():
+            obj.city_key = location_key(obj.city)
+            obj.country_key = location_key(obj.country)
+        elif obj in session.dirty and not attrs.status.history.has_changes():
+            continue
+        changed.append(obj)
+
+    if changed:
+        session.info.setdefault('location_changes', []).extend(_count_changes(session, changed))
+
+
+def _is_active(status):
+    # New rows get the ACTIVE column default at insert
+    return status is None or status == PropertyStatus.ACTIVE
+
+
+def _count_changes(session, properties):
+    """
+    (city_key, country_key, city, country, delta) for each listing leaving or
+    joining a city; previous values are read from the database, since
+    attributes expired by a commit carry no history
+    """
+    ids = [obj.id for obj in properties if obj.id is not None]
+    before = {}
+    if ids:
+        rows = session.connection().execute(
+            select(Property.id, Property.city_key, Property.country_key, Property.city,
+                   Property.country, Property.status).where(Property.id.in_(ids))
+        )
+        before = {row.id: row for row in rows}
+
+    changes = []
+    for obj in properties:
+        old = before.get(obj.id)
+        if old is not None and old.city_key and _is_active(old.status):
+            changes.append((old.city_key, old.country_key, old.city, old.country, -1))
+        if obj not in session.deleted and obj.city_key and _is_active(obj.status):
+            changes.append((obj.city_key, obj.country_key, obj.city, obj.country, 1))
+    return changes
+
+
+def _apply_after_commit(session):
+    changes = session.info.pop('location_changes', None)
+    if not changes:
+        return
+    trie = current_app.extensions['location_index']['trie']
+    # Nothing loaded yet: the first load reads the committed rows
+    if trie is None:
+        return
+    for city_key, country_key, city, country, delta in changes:
+        trie.add(city_key, country_key, city, country, delta)
+
+
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop('location_changes', None)
@@ -0,0 +1,420 @@
+"""
+Outbox Service
+Queues push notifications, Pusher events and storage work in the
+outbox_events table inside the request's transaction and delivers them from
+background workers with retries, backoff and batching
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, select
+from extensions import db
+from app.models.outbox import OutboxEvent, OutboxStatus
+
+
+logger = logging.getLogger(__name__)
+
+# Channels
+PUSH = 'push'
+PUSHER = 'pusher'
+IMAGE_DERIVATIVES = 'image_derivatives'
+S3_DELETE = 's3_delete'
+
+# Pusher accepts at most 10 events per trigger_batch call
+PUSHER_BATCH_SIZE = 10
+
+# Serializes claims between threads of one process; across processes
+# SKIP LOCKED does the same on databases that support it
+_claim_lock = threading.Lock()
+
+DEFAULTS = {
+    'OUTBOX_WORKERS': 2,
+    'OUTBOX_BATCH_SIZE': 100,
+    'OUTBOX_MAX_ATTEMPTS': 8,
+    'OUTBOX_RETRY_BASE_SECONDS': 5,
+    'OUTBOX_RETRY_MAX_SECONDS': 3600,
+    'OUTBOX_LEASE_SECONDS': 60,
+    'OUTBOX_POLL_SECONDS': 5,
+    'PUSH_COALESCE_SECONDS': 2,
+    'OUTBOX_FAKE_TRANSPORTS': False,
+}
+
+
+class PermanentDeliveryError(Exception):
+    """Delivery can never succeed (no device token, Pusher disabled), so don't retry"""
+
+
+def deliver_push(payloads):
+    """
+    Send push notifications through FCM, batched and coalesced per user
+
+    Returns:
+        One entry per payload: None on success, else the exception
+    """
+    from app.services.push_service import PushService
+
+    return PushService.send(payloads)
+
+
+def deliver_pusher(payloads):
+    """
+    Trigger Pusher events, up to PUSHER_BATCH_SIZE per API call
+
+    Returns:
+        One entry per payload: None on success, else the exception
+    """
+    from extensions import pusher_client
+
+    if pusher_client is None:
+        return [PermanentDeliveryError('Pusher is disabled')] * len(payloads)
+
+    results = []
+    for i in range(0, len(payloads), PUSHER_BATCH_SIZE):
+        chunk = payloads[i:i + PUSHER_BATCH_SIZE]
+        try:
+            pusher_client.trigger_batch([
+                {'channel': p['channel'], 'name': p['event'], 'data': p['data']} for p in chunk
+            ])
+            results.extend([None] * len(chunk))
+        except Exception as e:
+            results.extend([e] * len(chunk))
+    return results
+
+
+def deliver_image_derivatives(payloads):
+    """
+    Generate resized property photos
+
+    Returns:
+        One entry per payload: None on success, else the exception
+    """
+    from app.services.property_image_service import deliver_image_derivatives as deliver
+
+    return deliver(payloads)
+
+
+def deliver_s3_delete(payloads):
+    """
+    Delete S3 objects, merging every payload's keys into DeleteObjects calls
+
+    Returns:
+        One entry per payload: None on success, else the exception
+    """
+    from app.services.storage_cleanup_service import deliver_s3_delete as deliver
+
+    return deliver(payloads)
+
+
+class RecordingTransport:
+    """Local stand-in for FCM or Pusher that records payloads instead of sending them"""
+
+    def __init__(self):
+        self.delivered = []
+        # Set to an exception to make every delivery fail with it
+        self.error = None
+
+    def __call__(self, payloads):
+        if self.error is not None:
+            return [self.error] * len(payloads)
+        self.delivered.extend(payloads)
+        return [None] * len(payloads)
+
+
+class OutboxWorkerPool:
+    """In-process delivery threads, woken after commits that enqueued events"""
+
+    def __init__(self, app, size, poll_seconds):
+        self.app = app
+        self.size = size
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = None
+
+    def wake(self, delay=0):
+        self._ensure_started()
+        if delay > 0:
+            timer = threading.Timer(delay, self._wakeup.set)
+            timer.daemon = True
+            timer.start()
+        else:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        # Threads don't survive fork (gunicorn --preload), so start them
+        # lazily in whichever process first enqueues
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._wakeup = threading.Event()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'outbox-worker-{i}', daemon=True)
+                for i in range(self.size)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.poll_seconds)
+            self._wakeup.clear()
+            try:
+                with self.app.app_context():
+                    OutboxService.drain()
+            except Exception:
+                logger.exception('Outbox worker failed')
+
+
+class OutboxService:
+    """Service for queueing and delivering outbound events"""
+
+    @staticmethod
+    def init_app(app):
+        """Set up transports and the worker pool, and wake it on commit"""
+        for key, value in DEFAULTS.items():
+            app.config.setdefault(key, value)
+
+        if app.config['OUTBOX_FAKE_TRANSPORTS']:
+            transports = {
+                PUSH: RecordingTransport(),
+                PUSHER: RecordingTransport(),
+                IMAGE_DERIVATIVES: RecordingTransport(),
+                S3_DELETE: RecordingTransport(),
+            }
+        else:
+            transports = {
+                PUSH: deliver_push,
+                PUSHER: deliver_pusher,
+                IMAGE_DERIVATIVES: deliver_image_derivatives,
+                S3_DELETE: deliver_s3_delete,
+            }
+
+        pool = None
+        if app.config['OUTBOX_WORKERS'] > 0:
+            pool = OutboxWorkerPool(app, app.config['OUTBOX_WORKERS'], app.config['OUTBOX_POLL_SECONDS'])
+
+        app.extensions['outbox'] = {'transports': transports, 'pool': pool}
+
+        if not event.contains(db.session, 'after_commit', _wake_after_commit):
+            event.listen(db.session, 'after_commit', _wake_after_commit)
+            event.listen(db.session, 'after_soft_rollback', _forget_after_rollback)
+
+    @staticmethod
+    def transports():
+        return current_app.extensions['outbox']['transports']
+
+    @staticmethod
+    def enqueue(channel, payload, delay=0, session=None):
+        """
+        Add an event to the current transaction; it is only delivered if the
+        transaction commits
+
+        Args:
+            channel: PUSH, PUSHER, IMAGE_DERIVATIVES or S3_DELETE
+            payload: JSON-serializable dict for the channel's transport
+            delay: Seconds to hold the event back
+            session: Session to add to (defaults to db.session), e.g. from
+                     inside a flush event
+
+        Returns:
+            OutboxEvent
+        """
+        session = session or db.session
+        outbox_event = OutboxEvent(
+            channel=channel,
+            payload=payload,
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+        )
+        session.add(outbox_event)
+        session.info['outbox_enqueued'] = True
+        if delay:
+            session.info['outbox_delay'] = max(delay, session.info.get('outbox_delay', 0))
+        return outbox_event
+
+    @staticmethod
+    def enqueue_push(user_id, title, body, data=None, collapse_key=None):
+        """
+        Queue a push notification to every device of a user
+
+        Pushes with a collapse_key are held for PUSH_COALESCE_SECONDS so a
+        burst (e.g. several chat messages) goes out as one notification.
+        """
+        delay = current_app.config['PUSH_COALESCE_SECONDS'] if collapse_key else 0
+        return OutboxService.enqueue(PUSH, {
+            'user_id': user_id,
+            'title': title,
+            'body': body,
+            'data': {k: str(v) for k, v in (data or {}).items()},
+            'collapse_key': collapse_key,
+        }, delay=delay)
+
+    @staticmethod
+    def enqueue_pusher(channel, event_name, data):
+        """Queue a Pusher event"""
+        return OutboxService.enqueue(PUSHER, {'channel': channel, 'event': event_name, 'data': data})
+
+    @staticmethod
+    def backoff(attempts):
+        """Delay before retry number `attempts` (exponential, capped)"""
+        base = current_app.config['OUTBOX_RETRY_BASE_SECONDS']
+        cap = current_app.config['OUTBOX_RETRY_MAX_SECONDS']
+        return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+    @staticmethod
+    def claim(batch_size=None):
+        """
+        Lease a batch of due events to this worker
+
+        Claimed events are pushed out by OUTBOX_LEASE_SECONDS, so if the worker
+        dies they are picked up again once the lease runs out. Delivery is
+        therefore at-least-once.
+
+        Returns:
+            List of OutboxEvent, oldest first
+        """
+        batch_size = batch_size or current_app.config['OUTBOX_BATCH_SIZE']
+
+        with _claim_lock:
+            now = datetime.utcnow()
+            events = db.session.execute(
+                select(OutboxEvent)
+                .where(OutboxEvent.status == OutboxStatus.PENDING.value, OutboxEvent.next_attempt_at <= now)
+                .order_by(OutboxEvent.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+
+            lease_until = now + timedelta(seconds=current_app.config['OUTBOX_LEASE_SECONDS'])
+            for outbox_event in events:
+                outbox_event.attempts += 1
+                outbox_event.next_attempt_at = lease_until
+            db.session.commit()
+
+        return events
+
+    @staticmethod
+    def process_batch(batch_size=None):
+        """
+        Claim and deliver one batch, grouping events per channel so each
+        transport can batch its API calls
+
+        Returns:
+            Number of events processed
+        """
+        events = OutboxService.claim(batch_size)
+        if not events:
+            return 0
+
+        by_channel = {}
+        for outbox_event in events:
+            by_channel.setdefault(outbox_event.channel, []).append(outbox_event)
+
+        transports = OutboxService.transports()
+        max_attempts = current_app.config['OUTBOX_MAX_ATTEMPTS']
+        now = datetime.utcnow()
+
+        for channel, channel_events in by_channel.items():
+            transport = transports.get(channel)
+            if transport is None:
+                results = [PermanentDeliveryError(f'Unknown channel: {channel}')] * len(channel_events)
+            else:
+                try:
+                    results = transport([e.payload for e in channel_events])
+                except Exception as e:
+                    results = [e] * len(channel_events)
+
+            for outbox_event, error in zip(channel_events, results):
+                if error is None:
+                    outbox_event.status = OutboxStatus.DELIVERED.value
+                    outbox_event.delivered_at = now
+                    outbox_event.last_error = None
+                    continue
+
+                outbox_event.last_error = str(error) or error.__class__.__name__
+                if isinstance(error, PermanentDeliveryError) or outbox_event.attempts >= max_attempts:
+                    outbox_event.status = OutboxStatus.FAILED.value
+                    logger.warning(f'Outbox event {outbox_event.id} failed: {outbox_event.last_error}')
+                else:
+                    outbox_event.next_attempt_at = now + OutboxService.backoff(outbox_event.attempts)
+
+        db.session.commit()
+        return len(events)
+
+    @staticmethod
+    def drain(max_batches=None):
+        """
+        Deliver due events until none are left
+
+        Returns:
+            Number of events processed
+        """
+        processed = 0
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            count = OutboxService.process_batch()
+            if not count:
+                break
+            processed += count
+            batches += 1
+        return processed
+
+    @staticmethod
+    def retry_failed(event_ids=None):
+        """
+        Put failed events back in the queue
+
+        Returns:
+            Number of events requeued
+        """
+        query = OutboxEvent.query.filter(OutboxEvent.status == OutboxStatus.FAILED.value)
+        if event_ids:
+            query = query.filter(OutboxEvent.id.in_(event_ids))
+
+        count = query.update({
+            'status': OutboxStatus.PENDING.value,
+            'attempts': 0,
+            'next_attempt_at': datetime.utcnow(),
+        }, synchronize_session=False)
+        db.session.commit()
+        return count
+
+    @staticmethod
+    def purge_delivered(older_than_days=7):
+        """
+        Delete delivered events older than `older_than_days`
+
+        Returns:
+            Number of events deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        count = OutboxEvent.query.filter(
+            OutboxEvent.status == OutboxStatus.DELIVERED.value,
+            OutboxEvent.delivered_at < cutoff,
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        return count
+
+
+def _wake_after_commit(session):
+    """Wake the in-process workers once queued events are committed"""
+    delay = session.info.pop('outbox_delay', 0)
+    if not session.info.pop('outbox_enqueued', False):
+        return
+
+    outbox = current_app.extensions.get('outbox')
+    if outbox and outbox['pool'] is not None:
+        outbox['pool'].wake()
+        if delay:
+            outbox['pool'].wake(delay)
+
+
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop('outbox_enqueued', None)
+    session.info.pop('outbox_delay', None)
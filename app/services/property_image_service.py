@@ -0,0 +1,240 @@
+"""
+Property Image Service
+Keeps property_images rows in step with Property.images and generates the
+resized WebP/JPEG derivatives and placeholders for each photo
+"""
+
+import logging
+from flask import current_app
+from sqlalchemy import event, inspect
+from extensions import db
+from app.models.property import Property
+from app.models.property_image import (
+    PropertyImage, PropertyImageStatus, DERIVATIVE_WIDTHS, DERIVATIVE_FORMATS
+)
+from app.services.outbox_service import OutboxService, IMAGE_DERIVATIVES
+from app.services.s3_service import S3Service
+from app.services.content_store import ContentStore
+from app.services.image_pipeline import upload_threads
+from app.services.image_processing import ImageProcessor, make_derivatives
+
+
+logger = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+FORMAT_CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# Derivative keys never change content, so clients and CDNs may cache forever
+DERIVATIVE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def flatten_images(images):
+    """Property.images ({category: [urls]} or a legacy list) as [(category, url)]"""
+    if isinstance(images, dict):
+        return [
+            (category, url)
+            for category, urls in images.items() if isinstance(urls, list)
+            for url in urls if url
+        ]
+    if isinstance(images, list):
+        return [('Other', url) for url in images if url]
+    return []
+
+
+class PropertyImageService:
+    """Service for property photo records and their derivatives"""
+
+    @staticmethod
+    def init_app(app):
+        """Mirror Property.images into property_images on every flush"""
+        if not event.contains(db.session, 'before_flush', _sync_before_flush):
+            event.listen(db.session, 'before_flush', _sync_before_flush)
+
+    @staticmethod
+    def sync(session, property):
+        """
+        Reconcile a property's image rows with its images column, queueing
+        derivative generation for new photos
+        """
+        existing = {photo.original_url: photo for photo in property.photos}
+        photos = []
+        added = []
+
+        for position, (category, url) in enumerate(flatten_images(property.images)):
+            photo = existing.pop(url, None)
+            if photo is None:
+                photo = PropertyImage(original_url=url)
+                added.append(photo)
+            photo.category = category
+            photo.position = position
+            photos.append(photo)
+
+        if added:
+            ContentStore.acquire([photo.original_url for photo in added], session=session)
+            PropertyImageService.prepare(session, added)
+
+        # Rows left in `existing` are orphaned and deleted by the cascade
+        removed = [photo for photo in existing.values() if photo.id is not None]
+        if removed:
+            PropertyImageService.release(session, property, removed)
+
+        property.photos = photos
+
+    @staticmethod
+    def prepare(session, photos):
+        """
+        Give new rows derivatives: copied from another row of the same
+        (deduplicated) original when there is one, else generated later
+        """
+        with session.no_autoflush:
+            ready = {
+                photo.original_url: photo
+                for photo in session.query(PropertyImage).filter(
+                    PropertyImage.original_url.in_({photo.original_url for photo in photos}),
+                    PropertyImage.status == PropertyImageStatus.READY.value,
+                )
+            }
+
+        for photo in photos:
+            source = ready.get(photo.original_url)
+            if source is not None:
+                photo.variants = source.variants
+                photo.width = source.width
+                photo.height = source.height
+                photo.placeholder = source.placeholder
+                photo.status = PropertyImageStatus.READY.value
+            elif PropertyImageService.is_stored_in_bucket(photo.original_url):
+                OutboxService.enqueue(IMAGE_DERIVATIVES, {'url': photo.original_url}, session=session)
+            else:
+                # Local uploads have nothing to resize from; serve the original
+                photo.status = PropertyImageStatus.READY.value
+
+    @staticmethod
+    def release(session, property, photos):
+        """
+        Drop photos' references and queue deletion of the files (original
+        and derivatives) nothing else uses
+
+        Deduplicated uploads go by their reference count; older uploads are
+        kept if another listing's row still points at them.
+        """
+        from app.services.storage_cleanup_service import StorageCleanupService
+
+        urls = [photo.original_url for photo in photos]
+        managed, unreferenced = ContentStore.release(urls, session=session)
+
+        legacy = [url for url in urls if url not in managed]
+        shared = set()
+        if legacy:
+            with session.no_autoflush:
+                shared = {
+                    url for (url,) in session.query(PropertyImage.original_url).filter(
+                        PropertyImage.original_url.in_(legacy),
+                        PropertyImage.property_id != property.id,
+                    )
+                }
+
+        deletable = unreferenced | (set(legacy) - shared)
+        StorageCleanupService.delete_later(
+            [url for photo in photos if photo.original_url in deletable for url in photo.all_urls()],
+            session=session,
+        )
+
+    @staticmethod
+    def is_stored_in_bucket(url):
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        return bool(bucket_name) and f"{bucket_name}.s3." in url
+
+    @staticmethod
+    def generate(url):
+        """
+        Build and upload derivatives for every photo row with this original URL
+
+        Returns:
+            Number of rows updated
+        """
+        photos = PropertyImage.query.filter_by(original_url=url).all()
+        if not photos:
+            return 0
+
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        key = S3Service.key_from_url(url, bucket_name)
+        s3_client = S3Service.get_s3_client()
+        data = s3_client.get_object(Bucket=bucket_name, Key=key)['Body'].read()
+
+        result = ImageProcessor.run(make_derivatives, data, DERIVATIVE_WIDTHS, DERIVATIVE_FORMATS)
+
+        stem = key.rsplit('.', 1)[0]
+        uploads = []
+        variants = {}
+        for width, formats in result['variants'].items():
+            for fmt, body in formats.items():
+                derived_key = f"{stem}_w{width}.{FORMAT_EXTENSIONS[fmt]}"
+                uploads.append((derived_key, body, FORMAT_CONTENT_TYPES[fmt]))
+                variants.setdefault(str(width), {})[fmt] = S3Service.url_for_key(derived_key)
+
+        def put(derived_key, body, content_type):
+            s3_client.put_object(
+                Bucket=bucket_name, Key=derived_key, Body=body,
+                ContentType=content_type, CacheControl=DERIVATIVE_CACHE_CONTROL,
+            )
+
+        threads = upload_threads()
+        for future in [threads.submit(put, *upload) for upload in uploads]:
+            future.result()
+
+        for photo in photos:
+            photo.variants = variants
+            photo.width = result['width']
+            photo.height = result['height']
+            photo.placeholder = result['placeholder']
+            photo.status = PropertyImageStatus.READY.value
+
+        return len(photos)
+
+    @staticmethod
+    def backfill(property_ids=None):
+        """
+        Create rows for properties whose images predate property_images
+
+        Returns:
+            Number of properties synced
+        """
+        query = Property.query
+        if property_ids:
+            query = query.filter(Property.id.in_(property_ids))
+
+        count = 0
+        for property in query.all():
+            PropertyImageService.sync(db.session, property)
+            count += 1
+        db.session.commit()
+        return count
+
+
+def deliver_image_derivatives(payloads):
+    """
+    Outbox transport for IMAGE_DERIVATIVES events
+
+    Returns:
+        One entry per payload: None on success, else the exception
+    """
+    results = []
+    for payload in payloads:
+        try:
+            PropertyImageService.generate(payload['url'])
+            results.append(None)
+        except Exception as e:
+            logger.error(f"Image derivative error for {payload.get('url')}: {e}")
+            results.append(e)
+    return results
+
+
+def _sync_before_flush(session, flush_context, instances):
+    """Sync image rows for properties whose images column changed"""
+    for obj in list(session.new) + list(session.dirty):
+        if not isinstance(obj, Property):
+            continue
+        if obj not in session.new and not inspect(obj).attrs.images.history.has_changes():
+            continue
+        PropertyImageService.sync(session, obj)
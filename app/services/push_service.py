@@ -0,0 +1,167 @@
+"""
+Push Service
+Batched FCM delivery to every registered device of a user
+"""
+
+import logging
+from firebase_admin import messaging
+from app.models.device_token import DeviceToken
+from app.services.outbox_service import PermanentDeliveryError
+
+
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 messages per send_each call
+FCM_BATCH_SIZE = 500
+
+# FCM errors meaning the token will never work again
+INVALID_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+
+
+class NoDeviceTokens(PermanentDeliveryError):
+    """The user has no registered devices"""
+
+
+def build_message(token, title, body, data=None, collapse_key=None):
+    """
+    A "Data-Only" message for Android (to force a custom popup) and a
+    standard Notification for iOS. Messages sharing a collapse_key replace
+    each other on the device.
+    """
+    # FCM requires all data values to be strings; title/body are repeated in
+    # data so the Flutter background handler can read them on Android
+    clean_data = {k: str(v) for k, v in (data or {}).items()}
+    clean_data['title'] = title
+    clean_data['body'] = body
+
+    return messaging.Message(
+        token=token,
+        data=clean_data,
+        android=messaging.AndroidConfig(
+            priority='high',
+            collapse_key=collapse_key,
+        ),
+        apns=messaging.APNSConfig(
+            headers={'apns-collapse-id': collapse_key} if collapse_key else None,
+            payload=messaging.APNSPayload(
+                aps=messaging.Aps(
+                    alert=messaging.ApsAlert(
+                        title=title,
+                        body=body,
+                    ),
+                    sound="default",
+                    content_available=True  # Helps wake up the app in background
+                )
+            )
+        )
+    )
+
+
+def coalesce(notifications):
+    """
+    Collapse notifications to the same user with the same collapse_key into
+    one, keeping the newest and counting the rest
+
+    Args:
+        notifications: List of dicts with user_id, title, body, data, collapse_key
+
+    Returns:
+        (merged notifications, list mapping each input index to its merged index)
+    """
+    merged = []
+    positions = {}
+    index_map = []
+
+    for notification in notifications:
+        collapse_key = notification.get('collapse_key')
+        key = (notification['user_id'], collapse_key) if collapse_key else None
+
+        if key is None or key not in positions:
+            if key is not None:
+                positions[key] = len(merged)
+            merged.append(dict(notification, count=1))
+            index_map.append(len(merged) - 1)
+            continue
+
+        position = positions[key]
+        count = merged[position]['count'] + 1
+        merged[position] = dict(notification, count=count)
+        index_map.append(position)
+
+    for notification in merged:
+        if notification['count'] > 1:
+            notification['body'] = f"{notification['count']} new messages"
+            notification['data'] = dict(notification.get('data') or {}, count=str(notification['count']))
+
+    return merged, index_map
+
+
+class PushService:
+    """Service for sending push notifications through FCM"""
+
+    @staticmethod
+    def send(notifications):
+        """
+        Send notifications to every device of each user, coalescing bursts
+        and pruning tokens FCM reports as invalid (the caller commits)
+
+        Args:
+            notifications: List of dicts with user_id, title, body and
+                           optionally data and collapse_key
+
+        Returns:
+            One entry per notification: None when at least one device got it,
+            else the exception (NoDeviceTokens when there is nothing to send to)
+        """
+        merged, index_map = coalesce(notifications)
+        tokens = DeviceToken.tokens_for({n['user_id'] for n in merged})
+
+        # Flatten to one message per (notification, device)
+        messages = []
+        owners = []
+        for position, notification in enumerate(merged):
+            for token in tokens.get(notification['user_id'], []):
+                messages.append(build_message(
+                    token,
+                    notification['title'],
+                    notification['body'],
+                    notification.get('data'),
+                    notification.get('collapse_key'),
+                ))
+                owners.append(position)
+
+        delivered = set()
+        errors = {}
+        invalid_tokens = []
+
+        for i in range(0, len(messages), FCM_BATCH_SIZE):
+            chunk = messages[i:i + FCM_BATCH_SIZE]
+            try:
+                response = messaging.send_each(chunk)
+            except Exception as e:
+                for position in owners[i:i + FCM_BATCH_SIZE]:
+                    errors[position] = e
+                continue
+
+            for offset, result in enumerate(response.responses):
+                position = owners[i + offset]
+                if result.success:
+                    delivered.add(position)
+                elif isinstance(result.exception, INVALID_TOKEN_ERRORS):
+                    invalid_tokens.append(chunk[offset].token)
+                else:
+                    errors[position] = result.exception
+
+        if invalid_tokens:
+            pruned = DeviceToken.prune(invalid_tokens)
+            logger.info(f'Pruned {pruned} invalid FCM tokens')
+
+        results = []
+        for position in index_map:
+            if position in delivered:
+                results.append(None)
+            elif position in errors:
+                results.append(errors[position])
+            else:
+                results.append(NoDeviceTokens(f"User {merged[position]['user_id']} has no valid device tokens"))
+        return results
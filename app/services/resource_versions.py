@@ -0,0 +1,117 @@
+"""
+Resource Versions
+One aggregate query per endpoint that changes whenever the endpoint's
+response would, so conditional GETs can be answered without loading the
+objects behind it
+"""
+
+from datetime import date
+from sqlalchemy import select, func
+from extensions import db
+from app.models.property import Property
+from app.models.property_image import PropertyImage
+from app.models.availability import PropertyAvailability
+from app.models.booking import Booking, BookingStatus
+from app.models.user import User
+
+
+# Bookings listed by /bookings/my-bookings
+GUEST_LIST_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.COMPLETED)
+
+
+def _photos_version(property_ids):
+    """(count, latest update) of the photos of the selected properties"""
+    condition = PropertyImage.property_id.in_(property_ids)
+    return (
+        select(func.count(PropertyImage.id)).where(condition).correlate(None).scalar_subquery(),
+        select(func.max(PropertyImage.updated_at)).where(condition).correlate(None).scalar_subquery(),
+    )
+
+
+class ResourceVersions:
+    """Cheap change versions for conditional GETs"""
+
+    @staticmethod
+    def property_detail(property_id):
+        """
+        Property row, host profile, photos and calendar index
+
+        Returns:
+            Version tuple, or None if the property doesn't exist
+        """
+        row = db.session.execute(
+            select(
+                Property.updated_at,
+                Property.view_count,
+                User.updated_at,
+                PropertyAvailability.version,
+                *_photos_version([property_id]),
+            )
+            .outerjoin(User, User.id == Property.host_id)
+            .outerjoin(PropertyAvailability, PropertyAvailability.property_id == Property.id)
+            .where(Property.id == property_id)
+        ).first()
+        if row is None:
+            return None
+        # The embedded calendar starts today
+        return (*row, date.today())
+
+    @staticmethod
+    def guest_bookings(user_id):
+        """A guest's confirmed and completed bookings and their properties"""
+        condition = (Booking.guest_id == user_id) & Booking.status.in_(GUEST_LIST_STATUSES)
+        row = db.session.execute(
+            select(
+                func.count(Booking.id),
+                func.max(Booking.updated_at),
+                func.max(Property.updated_at),
+                func.sum(Property.view_count),
+                *_photos_version(select(Booking.property_id).where(condition).correlate(None)),
+            )
+            .select_from(Booking)
+            .outerjoin(Property, Property.id == Booking.property_id)
+            .where(condition)
+        ).one()
+        # Statuses are moved to completed once check-out has passed
+        return (user_id, *row, date.today())
+
+    @staticmethod
+    def host_bookings(user_id):
+        """Every booking of a host's properties, with properties and guests"""
+        condition = Booking.host_id == user_id
+        row = db.session.execute(
+            select(
+                func.count(Booking.id),
+                func.max(Booking.updated_at),
+                func.max(Property.updated_at),
+                func.sum(Property.view_count),
+                func.max(User.updated_at),
+                *_photos_version(select(Booking.property_id).where(condition).correlate(None)),
+            )
+            .select_from(Booking)
+            .outerjoin(Property, Property.id == Booking.property_id)
+            .outerjoin(User, User.id == Booking.guest_id)
+            .where(condition)
+        ).one()
+        # Grouping into ongoing and past depends on the date
+        return (user_id, *row, date.today())
+
+    @staticmethod
+    def host_calendar(user_id):
+        """
+        A host's properties and their calendars
+
+        Every booking or blocked date change rebuilds the property's index
+        row, bumping its version, so the sum of versions moves with them.
+        """
+        row = db.session.execute(
+            select(
+                func.count(Property.id),
+                func.max(Property.updated_at),
+                func.sum(PropertyAvailability.version),
+                func.max(PropertyAvailability.updated_at),
+            )
+            .outerjoin(PropertyAvailability, PropertyAvailability.property_id == Property.id)
+            .where(Property.host_id == user_id)
+        ).one()
+        return (user_id, *row)
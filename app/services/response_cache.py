@@ -0,0 +1,396 @@
+"""
+Response Cache Service
+Read-through cache for public GET endpoints, keyed by the normalized query
+string and invalidated by tag when the rows behind a response change
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request, make_response
+from sqlalchemy import event
+from extensions import db
+from app.models.property import Property
+from app.models.property_image import PropertyImage
+from app.models.booking import Booking
+from app.models.blocked_date import BlockedDate
+from app.models.user import User
+from app.services.location_index import location_key
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # 'lru' (per process), 'redis' (REDIS_URL, shared) or 'none'
+    'RESPONSE_CACHE_BACKEND': 'lru',
+    'RESPONSE_CACHE_TTL_SECONDS': 60,
+    'RESPONSE_CACHE_MAX_ENTRIES': 2000,
+    # How long other requests wait for the one rebuilding a missing entry
+    'RESPONSE_CACHE_LOCK_SECONDS': 5,
+}
+
+# Every listing/search response; any property insert, update or delete drops them
+LISTS_TAG = 'property-lists'
+# Responses filtered by dates; booking and blocked date changes drop them
+AVAILABILITY_TAG = 'availability'
+
+# Query parameters the endpoints match on normalized keys (location_key)
+CASEFOLD_PARAMS = ('city', 'country')
+
+
+def property_tag(property_id):
+    return f'property:{property_id}'
+
+
+def user_tag(user_id):
+    return f'user:{user_id}'
+
+
+class CachedResponse:
+    """What is kept per entry"""
+
+    def __init__(self, body, status, mimetype):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+
+    def to_json(self):
+        return json.dumps({'body': self.body.decode('utf-8'), 'status': self.status, 'mimetype': self.mimetype})
+
+    @classmethod
+    def from_json(cls, raw):
+        data = json.loads(raw)
+        return cls(data['body'].encode('utf-8'), data['status'], data['mimetype'])
+
+
+class LRUCacheBackend:
+    """
+    Per-process LRU with TTLs and a tag index
+
+    Invalidation only reaches the process it runs in; other workers serve
+    their copy until it expires.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (expires_at, CachedResponse, tags)
+        self._tags = {}  # tag -> set of keys
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl, tags):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in self._tags.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    # Single flight within the process is enough for a per-process cache
+    def acquire(self, key, seconds):
+        return True
+
+    def release(self, key):
+        pass
+
+
+class RedisCacheBackend:
+    """Shared cache in Redis; tags are sets of keys"""
+
+    PREFIX = 'response_cache:'
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self.client.get(self.PREFIX + key)
+        return CachedResponse.from_json(raw) if raw else None
+
+    def set(self, key, value, ttl, tags):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.set(self.PREFIX + key, value.to_json(), ex=ttl)
+        for tag in tags:
+            tag_key = f'{self.PREFIX}tag:{tag}'
+            pipe.sadd(tag_key, key)
+            # Outlives its entries; stale members only cost a no-op DEL
+            pipe.expire(tag_key, ttl * 2)
+        pipe.execute()
+
+    def invalidate(self, tags):
+        tag_keys = [f'{self.PREFIX}tag:{tag}' for tag in tags]
+        pipe = self.client.pipeline(transaction=False)
+        for tag_key in tag_keys:
+            pipe.smembers(tag_key)
+        members = pipe.execute()
+        keys = {self.PREFIX + member.decode('utf-8') for keys in members for member in keys}
+        if keys or tag_keys:
+            self.client.delete(*keys, *tag_keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(f'{self.PREFIX}*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def acquire(self, key, seconds):
+        """Cross-process rebuild lock; expires on its own if the holder dies"""
+        return bool(self.client.set(f'{self.PREFIX}lock:{key}', 1, nx=True, ex=max(int(seconds), 1)))
+
+    def release(self, key):
+        self.client.delete(f'{self.PREFIX}lock:{key}')
+
+
+class ResponseCache:
+    """Service for cached public responses"""
+
+    # Per-process single flight: one rebuild per key, the rest wait for it
+    _flights_lock = threading.Lock()
+    _flights = {}
+
+    @staticmethod
+    def init_app(app):
+        """Set up the backend and tag invalidation on commit"""
+        for key, value in DEFAULTS.items():
+            app.config.setdefault(key, value)
+
+        backend_name = app.config['RESPONSE_CACHE_BACKEND']
+        if backend_name == 'redis':
+            backend = RedisCacheBackend(app.config['REDIS_URL'])
+        elif backend_name == 'lru':
+            backend = LRUCacheBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        else:
+            backend = None
+        app.extensions['response_cache'] = backend
+
+        if not event.contains(db.session, 'after_flush', _collect_tags_after_flush):
+            event.listen(db.session, 'after_flush', _collect_tags_after_flush)
+            event.listen(db.session, 'after_commit', _invalidate_after_commit)
+            event.listen(db.session, 'after_soft_rollback', _forget_after_rollback)
+
+    @staticmethod
+    def backend():
+        return current_app.extensions.get('response_cache')
+
+    @staticmethod
+    def key(namespace, view_args, args, params=None):
+        """
+        Cache key from the endpoint, its URL arguments and the query string
+
+        Parameters are sorted, blank ones dropped, repeated ones sorted, and
+        case-insensitive ones (CASEFOLD_PARAMS) folded, so equivalent
+        requests share an entry. With `params`, other parameters are ignored.
+        """
+        names = set(args.keys())
+        if params is not None:
+            names &= set(params)
+        parts = []
+        for name in sorted(names):
+            values = [value.strip() for value in args.getlist(name) if value.strip()]
+            if name in CASEFOLD_PARAMS:
+                values = [location_key(value) for value in values]
+            parts.extend(f'{name}={value}' for value in sorted(values))
+
+        path = ','.join(f'{name}={view_args[name]}' for name in sorted(view_args))
+        return f"{namespace}:{path}?{'&'.join(parts)}"
+
+    @staticmethod
+    def tag(*tags):
+        """Tag the response being built; call from inside a cached view"""
+        if 'response_cache_tags' in g:
+            g.response_cache_tags.update(tags)
+
+    @staticmethod
+    def invalidate(tags):
+        backend = ResponseCache.backend()
+        if backend is None or not tags:
+            return
+        try:
+            backend.invalidate(tags)
+        except Exception as e:
+            logger.warning(f'Response cache invalidation error: {e}')
+
+    @staticmethod
+    def get_or_build(key, build, ttl):
+        """
+        Cached response for `key`, else build it once and cache it
+
+        Concurrent misses for the same key wait for the first request's
+        rebuild (up to RESPONSE_CACHE_LOCK_SECONDS) instead of all hitting
+        the database.
+        """
+        backend = ResponseCache.backend()
+        cached = ResponseCache._get(backend, key)
+        if cached is not None:
+            return ResponseCache._respond(cached, 'HIT')
+
+        lock_seconds = current_app.config['RESPONSE_CACHE_LOCK_SECONDS']
+        with ResponseCache._flights_lock:
+            flight = ResponseCache._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = ResponseCache._flights[key] = threading.Event()
+
+        if not leader:
+            flight.wait(lock_seconds)
+            cached = ResponseCache._get(backend, key)
+            if cached is not None:
+                return ResponseCache._respond(cached, 'HIT')
+            return ResponseCache._build(backend, key, build, ttl, store=False)
+
+        try:
+            # Another process may be rebuilding the same shared entry
+            deadline = time.monotonic() + lock_seconds
+            while not ResponseCache._acquire(backend, key, lock_seconds) and time.monotonic() < deadline:
+                time.sleep(0.05)
+                cached = ResponseCache._get(backend, key)
+                if cached is not None:
+                    return ResponseCache._respond(cached, 'HIT')
+            try:
+                return ResponseCache._build(backend, key, build, ttl, store=True)
+            finally:
+                ResponseCache._release(backend, key)
+        finally:
+            with ResponseCache._flights_lock:
+                ResponseCache._flights.pop(key, None)
+            flight.set()
+
+    @staticmethod
+    def _build(backend, key, build, ttl, store):
+        g.response_cache_tags = set()
+        response = make_response(build())
+        tags = g.pop('response_cache_tags', set())
+
+        if store and response.status_code == 200:
+            try:
+                backend.set(key, CachedResponse(response.get_data(), 200, response.mimetype), ttl, tags)
+            except Exception as e:
+                logger.warning(f'Response cache write error: {e}')
+
+        response.headers['X-Cache'] = 'MISS'
+        return response
+
+    @staticmethod
+    def _respond(cached, state):
+        response = current_app.response_class(cached.body, status=cached.status, mimetype=cached.mimetype)
+        response.headers['X-Cache'] = state
+        return response
+
+    @staticmethod
+    def _get(backend, key):
+        try:
+            return backend.get(key)
+        except Exception as e:
+            logger.warning(f'Response cache read error: {e}')
+            return None
+
+    @staticmethod
+    def _acquire(backend, key, seconds):
+        try:
+            return backend.acquire(key, seconds)
+        except Exception:
+            return True
+
+    @staticmethod
+    def _release(backend, key):
+        try:
+            backend.release(key)
+        except Exception:
+            pass
+
+
+def cached_response(namespace, ttl=None, params=None):
+    """
+    Serve a view from the response cache
+
+    Args:
+        namespace: Key prefix, unique per view
+        ttl: Seconds to keep entries (default RESPONSE_CACHE_TTL_SECONDS)
+        params: Query parameters the response depends on (default all)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if ResponseCache.backend() is None:
+                return view(*args, **kwargs)
+
+            key = ResponseCache.key(namespace, kwargs, request.args, params)
+            # Under conditional_get: only a body built for the current
+            # version may be served with its ETag
+            if 'resource_version' in g:
+                key = f'{key}#{g.resource_version}'
+            return ResponseCache.get_or_build(
+                key,
+                lambda: view(*args, **kwargs),
+                ttl or current_app.config['RESPONSE_CACHE_TTL_SECONDS'],
+            )
+        return wrapper
+    return decorator
+
+
+def _tags_for(obj):
+    if isinstance(obj, Property):
+        return {property_tag(obj.id), LISTS_TAG}
+    if isinstance(obj, (Booking, BlockedDate)):
+        return {property_tag(obj.property_id), AVAILABILITY_TAG}
+    if isinstance(obj, PropertyImage):
+        return {property_tag(obj.property_id)}
+    if isinstance(obj, User):
+        return {user_tag(obj.id)}
+    return set()
+
+
+def _collect_tags_after_flush(session, flush_context):
+    """Remember which cached responses this transaction makes stale"""
+    tags = session.info.setdefault('response_cache_tags', set())
+    for obj in list(session.new) + list(session.deleted):
+        tags.update(_tags_for(obj))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            tags.update(_tags_for(obj))
+
+
+def _invalidate_after_commit(session):
+    tags = session.info.pop('response_cache_tags', None)
+    if tags:
+        ResponseCache.invalidate(tags)
+
+
+def _forget_after_rollback(session, previous_transaction):
+    session.info.pop('response_cache_tags', None)
@@ -4,13 +4,89 @@ Handles image uploads to AWS S3
 """
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from flask import current_app
 from werkzeug.utils import secure_filename
 import os
+import threading
 import uuid
-from PIL import Image
 import io
+from app.services.image_processing import ImageProcessor, ImageJobTimeout, ImageQueueFull, compress_image_bytes
+
+
+# S3 DeleteObjects accepts at most 1000 keys per call
+DELETE_BATCH_SIZE = 1000
+
+
+class S3ClientManager:
+    """
+    Process-wide S3 client
+
+    boto3 clients are thread-safe and keep a connection pool, so one client
+    per process is shared by every request. It is built lazily and rebuilt
+    after a fork (gunicorn --preload) or when the settings change.
+    """
+
+    _lock = threading.Lock()
+    _client = None
+    _pid = None
+    _settings = None
+
+    @staticmethod
+    def settings():
+        config = current_app.config
+        return (
+            config.get('AWS_ACCESS_KEY_ID'),
+            config.get('AWS_SECRET_ACCESS_KEY'),
+            config.get('AWS_REGION', 'us-east-1'),
+            config.get('S3_ENDPOINT_URL'),
+            config.get('S3_MAX_POOL_CONNECTIONS', 20),
+            config.get('S3_MAX_ATTEMPTS', 3),
+            config.get('S3_CONNECT_TIMEOUT', 5),
+            config.get('S3_READ_TIMEOUT', 30),
+        )
+
+    @classmethod
+    def get_client(cls):
+        settings = cls.settings()
+        client = cls._client
+        if client is not None and cls._pid == os.getpid() and cls._settings == settings:
+            return client
+
+        with cls._lock:
+            if cls._client is None or cls._pid != os.getpid() or cls._settings != settings:
+                cls._client = cls._build(settings)
+                cls._pid = os.getpid()
+                cls._settings = settings
+            return cls._client
+
+    @staticmethod
+    def _build(settings):
+        access_key, secret_key, region, endpoint_url, pool_size, max_attempts, connect_timeout, read_timeout = settings
+        # A private Session: the default one is shared module state and not thread-safe
+        session = boto3.session.Session()
+        return session.client(
+            's3',
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name=region,
+            endpoint_url=endpoint_url,
+            config=Config(
+                max_pool_connections=pool_size,
+                retries={'total_max_attempts': max_attempts, 'mode': 'standard'},
+                connect_timeout=connect_timeout,
+                read_timeout=read_timeout,
+            )
+        )
+
+    @classmethod
+    def reset(cls):
+        """Drop the cached client (e.g. after changing credentials)"""
+        with cls._lock:
+            cls._client = None
+            cls._pid = None
+            cls._settings = None
 
 
 class S3Service:
@@ -18,13 +94,8 @@ class S3Service:
     
     @staticmethod
     def get_s3_client():
-        """Get initialized S3 client"""
-        return boto3.client(
-            's3',
-            aws_access_key_id=current_app.config.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=current_app.config.get('AWS_SECRET_ACCESS_KEY'),
-            region_name=current_app.config.get('AWS_REGION', 'us-east-1')
-        )
+        """Get the shared S3 client"""
+        return S3ClientManager.get_client()
     
     @staticmethod
     def allowed_file(filename):
@@ -45,29 +116,17 @@ class S3Service:
             quality: JPEG quality (1-100)
         
         Returns:
-            Compressed image as bytes
+            Compressed JPEG as a BytesIO, or None if it couldn't be decoded
+        
+        Raises:
+            ImageQueueFull, ImageJobTimeout: The image pool refused or gave up
         """
         try:
-            # Open image
-            img = Image.open(image_file)
-            
-            # Convert RGBA to RGB if necessary
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Resize if larger than max_size
-            img.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Save to bytes
-            output = io.BytesIO()
-            img.save(output, format='JPEG', quality=quality, optimize=True)
-            output.seek(0)
-            
-            return output
+            data = image_file if isinstance(image_file, bytes) else image_file.read()
+            compressed = ImageProcessor.run(compress_image_bytes, data, max_size, quality)
+            return io.BytesIO(compressed)
+        except (ImageQueueFull, ImageJobTimeout):
+            raise
         except Exception as e:
             current_app.logger.error(f'Image compression error: {str(e)}')
             return None
@@ -137,7 +196,7 @@ class S3Service:
     @staticmethod
     def upload_multiple_files(files, folder='images', compress=True):
         """
-        Upload multiple files to S3
+        Upload multiple files to S3 in parallel
         
         Args:
             files: List of file objects
@@ -145,14 +204,28 @@ class S3Service:
             compress: Whether to compress images
         
         Returns:
-            List of S3 URLs
+            List of S3 URLs of the files that uploaded, in order. Use
+            ImageUploadPipeline.upload_files for per-file results.
         """
-        urls = []
-        for file in files:
-            url = S3Service.upload_file(file, folder, compress)
-            if url:
-                urls.append(url)
-        return urls
+        from app.services.image_pipeline import ImageUploadPipeline
+        
+        results = ImageUploadPipeline.upload_files(files, folder, compress)
+        return [result.url for result in results if result.ok]
+    
+    @staticmethod
+    def url_for_key(key):
+        """Public URL of an object in the configured bucket"""
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        region = current_app.config.get('AWS_REGION', 'us-east-1')
+        return f"https://{bucket_name}.s3.{region}.amazonaws.com/{key}"
+    
+    @staticmethod
+    def key_from_url(s3_url, bucket_name):
+        """
+        Extract the object key from an S3 URL
+        Format: https://bucket-name.s3.region.amazonaws.com/folder/filename.ext
+        """
+        return s3_url.split(f"{bucket_name}.s3.")[1].split('/', 1)[1]
     
     @staticmethod
     def delete_file(s3_url):
@@ -168,10 +241,7 @@ class S3Service:
         try:
             s3_client = S3Service.get_s3_client()
             bucket_name = current_app.config.get('S3_BUCKET_NAME')
-            
-            # Extract key from URL
-            # Format: https://bucket-name.s3.region.amazonaws.com/folder/filename.ext
-            key = s3_url.split(f"{bucket_name}.s3.")[1].split('/', 1)[1]
+            key = S3Service.key_from_url(s3_url, bucket_name)
             
             s3_client.delete_object(Bucket=bucket_name, Key=key)
             return True
@@ -183,7 +253,7 @@ class S3Service:
     @staticmethod
     def delete_multiple_files(s3_urls):
         """
-        Delete multiple files from S3
+        Delete multiple files from S3 with batched DeleteObjects calls
         
         Args:
             s3_urls: List of S3 URLs
@@ -191,10 +261,31 @@ class S3Service:
         Returns:
             Number of successfully deleted files
         """
-        deleted_count = 0
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        
+        keys = []
         for url in s3_urls:
-            if S3Service.delete_file(url):
-                deleted_count += 1
+            try:
+                keys.append(S3Service.key_from_url(url, bucket_name))
+            except (IndexError, AttributeError):
+                current_app.logger.error(f'S3 delete error: not an S3 URL: {url}')
+        
+        deleted_count = 0
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            chunk = keys[i:i + DELETE_BATCH_SIZE]
+            try:
+                response = S3Service.get_s3_client().delete_objects(
+                    Bucket=bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True}
+                )
+            except Exception as e:
+                current_app.logger.error(f'S3 delete error: {str(e)}')
+                continue
+            
+            errors = response.get('Errors', [])
+            for error in errors:
+                current_app.logger.error(f"S3 delete error: {error.get('Key')}: {error.get('Message')}")
+            deleted_count += len(chunk) - len(errors)
         return deleted_count
 
 
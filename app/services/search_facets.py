@@ -0,0 +1,90 @@
+"""
+Search Facets
+Counts per property type, bedroom count, price bucket and amenity for the
+listings matching a search, so the search screen can show them without
+loading the listings
+"""
+
+from collections import Counter
+from sqlalchemy import case, func
+from app.models.property import Property
+from app.services.amenity_service import AmenityService
+
+
+# Price bucket edges on a 1-1.5-2-3-5-7 scale, fine enough for a histogram
+# whatever the currency
+PRICE_STEPS = (1, 1.5, 2, 3, 5, 7)
+PRICE_EDGES = tuple(int(step * 10 ** power) for power in range(1, 6) for step in PRICE_STEPS) + (1_000_000,)
+
+# Bedroom counts from here up share a facet ("5+")
+MAX_BEDROOMS_FACET = 5
+
+
+def _price_bucket(column):
+    """Index of the bucket a price falls in ([edge i-1, edge i))"""
+    return case(
+        *[(column < edge, index) for index, edge in enumerate(PRICE_EDGES)],
+        else_=len(PRICE_EDGES),
+    )
+
+
+def _price_histogram(counts):
+    """Buckets from the cheapest to the dearest listing, empty ones between kept"""
+    if not counts:
+        return []
+    edges = (0,) + PRICE_EDGES + (None,)
+    return [
+        {'min': edges[index], 'max': edges[index + 1], 'count': counts.get(index, 0)}
+        for index in range(min(counts), max(counts) + 1)
+    ]
+
+
+class SearchFacets:
+    """Service for search facet counts"""
+
+    @staticmethod
+    def compute(query):
+        """
+        Facets of a filtered property query
+
+        Type, bedroom and price counts come from one query grouped by all
+        three; amenity counts from one more over the property_amenities index.
+
+        Args:
+            query: Property query (filters only; ordering is ignored)
+
+        Returns:
+            Dict with total, property_type, bedrooms, price and amenities;
+            bedroom and price entries are {'min', 'max', 'count'} ranges
+            (max exclusive for prices, None when open-ended)
+        """
+        bucket = _price_bucket(Property.price_per_night)
+        rows = (
+            query.order_by(None)
+            .with_entities(Property.property_type, Property.bedrooms, bucket, func.count(Property.id))
+            .group_by(Property.property_type, Property.bedrooms, bucket)
+            .all()
+        )
+
+        types = Counter()
+        bedrooms = Counter()
+        prices = Counter()
+        for property_type, beds, price_bucket, count in rows:
+            types[property_type.value] += count
+            if beds is not None:
+                bedrooms[min(beds, MAX_BEDROOMS_FACET)] += count
+            prices[price_bucket] += count
+
+        return {
+            'total': sum(types.values()),
+            'property_type': [
+                {'value': value, 'count': count}
+                for value, count in sorted(types.items(), key=lambda item: (-item[1], item[0]))
+            ],
+            'bedrooms': [
+                {'min': beds, 'max': None if beds == MAX_BEDROOMS_FACET else beds, 'count': count}
+                for beds, count in sorted(bedrooms.items())
+            ],
+            'price': _price_histogram(prices),
+            'amenities': AmenityService.facet_counts(query) if rows else [],
+        }
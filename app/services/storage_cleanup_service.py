@@ -0,0 +1,175 @@
+"""
+Storage Cleanup Service
+Deletes S3 objects in the background through the outbox, batching keys from
+many requests into DeleteObjects calls, and sweeps the bucket for objects no
+database row refers to
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from extensions import db
+from app.models.property import Property
+from app.models.property_image import PropertyImage
+from app.models.user import User
+from app.services.outbox_service import OutboxService, S3_DELETE
+from app.services.s3_service import S3Service, DELETE_BATCH_SIZE
+from app.services.property_image_service import flatten_images
+from app.services.content_store import ContentStore
+
+
+logger = logging.getLogger(__name__)
+
+# Bucket prefixes whose objects are owned by database rows
+SWEEP_PREFIXES = ('properties/', 'profile-pictures/', 'cnic/', 'verification_photo/')
+
+
+class StorageCleanupService:
+    """Service for deferred S3 deletion and orphan sweeps"""
+
+    @staticmethod
+    def keys_for(urls):
+        """Object keys of the URLs that point into the configured bucket"""
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        if not bucket_name:
+            return []
+
+        keys = []
+        for url in urls:
+            if url and f"{bucket_name}.s3." in url:
+                keys.append(S3Service.key_from_url(url, bucket_name))
+        return list(dict.fromkeys(keys))
+
+    @staticmethod
+    def delete_later(urls, session=None):
+        """
+        Queue objects for deletion in the current transaction
+
+        Nothing is deleted unless the transaction commits, so a failed
+        request never leaves rows pointing at missing files. URLs outside
+        the bucket (local uploads) are ignored.
+
+        Args:
+            urls: S3 URLs
+            session: Session to add to (defaults to db.session)
+
+        Returns:
+            Number of keys queued
+        """
+        keys = StorageCleanupService.keys_for(urls)
+        # Hold deletions briefly so the worker can merge several requests' keys
+        delay = current_app.config.get('S3_DELETE_DELAY_SECONDS', 5)
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            OutboxService.enqueue(S3_DELETE, {'keys': keys[i:i + DELETE_BATCH_SIZE]}, delay=delay, session=session)
+        return len(keys)
+
+    @staticmethod
+    def deliver(payloads):
+        """
+        Delete the keys of several outbox events with as few DeleteObjects
+        calls as possible
+
+        Returns:
+            One entry per payload: None on success, else the exception
+        """
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        s3_client = S3Service.get_s3_client()
+
+        keys = list(dict.fromkeys(key for payload in payloads for key in payload.get('keys', [])))
+
+        # Shared uploads someone (re)used since the delete was queued stay;
+        # records of the rest go first so nothing reuses them mid-delete
+        protected = ContentStore.protected_keys(keys)
+        keys = [key for key in keys if key not in protected]
+        ContentStore.forget(keys)
+        db.session.commit()
+
+        failed = {}
+        for i in range(0, len(keys), DELETE_BATCH_SIZE):
+            chunk = keys[i:i + DELETE_BATCH_SIZE]
+            try:
+                response = s3_client.delete_objects(
+                    Bucket=bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in chunk], 'Quiet': True}
+                )
+            except Exception as e:
+                failed.update((key, str(e)) for key in chunk)
+                continue
+            for error in response.get('Errors', []):
+                failed[error.get('Key')] = error.get('Message') or error.get('Code')
+
+        results = []
+        for payload in payloads:
+            errors = [f"{key}: {failed[key]}" for key in payload.get('keys', []) if key in failed]
+            # Deleting is idempotent, so a retry may repeat the keys that succeeded
+            results.append(Exception('; '.join(errors[:5])) if errors else None)
+        return results
+
+    @staticmethod
+    def referenced_keys():
+        """Every bucket key a database row points at"""
+        urls = []
+
+        for (images,) in db.session.query(Property.images):
+            urls.extend(url for _, url in flatten_images(images))
+
+        for original_url, variants in db.session.query(PropertyImage.original_url, PropertyImage.variants):
+            urls.append(original_url)
+            for formats in (variants or {}).values():
+                urls.extend(formats.values())
+
+        for row in db.session.query(User.profile_picture, User.cnic_image_url, User.verification_photo_url):
+            urls.extend(row)
+
+        return set(StorageCleanupService.keys_for(urls))
+
+    @staticmethod
+    def sweep_orphans(prefixes=None, grace_hours=None, dry_run=False):
+        """
+        Queue deletion of bucket objects that no row refers to
+
+        Objects younger than the grace period are kept: they may belong to
+        an upload whose transaction hasn't committed or a direct upload that
+        hasn't been confirmed yet.
+
+        Args:
+            prefixes: Bucket prefixes to scan (default SWEEP_PREFIXES)
+            grace_hours: Minimum age of an orphan (default S3_ORPHAN_GRACE_HOURS)
+            dry_run: Only count and return the orphans
+
+        Returns:
+            Dict with scanned count and the orphaned keys
+        """
+        bucket_name = current_app.config.get('S3_BUCKET_NAME')
+        if not bucket_name:
+            raise ValueError('S3_BUCKET_NAME not configured')
+
+        if grace_hours is None:
+            grace_hours = current_app.config.get('S3_ORPHAN_GRACE_HOURS', 24)
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=grace_hours)
+
+        # Snapshot references before listing, so anything written meanwhile is
+        # either referenced here or still inside the grace period
+        referenced = StorageCleanupService.referenced_keys()
+
+        paginator = S3Service.get_s3_client().get_paginator('list_objects_v2')
+        scanned = 0
+        orphans = []
+        for prefix in prefixes or SWEEP_PREFIXES:
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+                for obj in page.get('Contents', []):
+                    scanned += 1
+                    if obj['Key'] not in referenced and obj['LastModified'] < cutoff:
+                        orphans.append(obj['Key'])
+
+        if orphans and not dry_run:
+            for i in range(0, len(orphans), DELETE_BATCH_SIZE):
+                OutboxService.enqueue(S3_DELETE, {'keys': orphans[i:i + DELETE_BATCH_SIZE]})
+            db.session.commit()
+
+        logger.info(f'Orphan sweep: {scanned} objects scanned, {len(orphans)} orphaned')
+        return {'scanned': scanned, 'orphans': orphans}
+
+
+def deliver_s3_delete(payloads):
+    return StorageCleanupService.deliver(payloads)
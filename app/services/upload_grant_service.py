@@ -0,0 +1,237 @@
+"""
+Upload Grant Service
+Short-lived presigned S3 uploads so clients send image bytes straight to the
+bucket instead of through the API workers
+"""
+
+import uuid
+from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
+from flask import current_app
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from sqlalchemy import insert, delete
+from extensions import db
+from app.models.redeemed_upload import RedeemedUpload
+from app.services.s3_service import S3Service
+
+
+IMAGE_CONTENT_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+# What each kind of upload may contain and where it is stored
+PURPOSES = {
+    'property_image': {'folder': 'properties', 'content_types': IMAGE_CONTENT_TYPES, 'max_files': 10},
+    'profile_picture': {'folder': 'profile-pictures', 'content_types': IMAGE_CONTENT_TYPES, 'max_files': 1},
+    'verification_photo': {'folder': 'verification_photo', 'content_types': IMAGE_CONTENT_TYPES, 'max_files': 1},
+    'cnic': {
+        'folder': 'cnic',
+        'content_types': dict(IMAGE_CONTENT_TYPES, **{'application/pdf': 'pdf'}),
+        'max_files': 1,
+    },
+}
+
+UPLOAD_METHODS = ('post', 'put')
+
+
+class UploadGrantError(ValueError):
+    """Raised when a grant cannot be issued or an upload cannot be confirmed"""
+
+
+def _insert_ignoring_duplicates(table):
+    """INSERT that skips rows whose key already exists"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        return dialect_insert(table).on_conflict_do_nothing(index_elements=['key'])
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        return dialect_insert(table).on_conflict_do_nothing(index_elements=['key'])
+    return insert(table).prefix_with('IGNORE')
+
+
+class UploadGrantService:
+    """Service for issuing and redeeming presigned upload grants"""
+
+    @staticmethod
+    def _serializer():
+        return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt='upload-grant')
+
+    @staticmethod
+    def is_available():
+        """Direct uploads need a real bucket"""
+        return bool(current_app.config.get('AWS_ACCESS_KEY_ID') and current_app.config.get('S3_BUCKET_NAME'))
+
+    @staticmethod
+    def issue(user_id, purpose, files):
+        """
+        Create one presigned upload per file
+
+        Args:
+            user_id: Uploading user
+            purpose: Key of PURPOSES
+            files: List of dicts with content_type, and size (required for 'put')
+                   and method ('post' by default)
+
+        Returns:
+            List of grant dicts: method, url, fields/headers, key, token,
+            max_bytes, expires_at
+        """
+        rules = PURPOSES.get(purpose)
+        if rules is None:
+            raise UploadGrantError(f"Invalid purpose. Allowed: {', '.join(PURPOSES)}")
+        if not files:
+            raise UploadGrantError('No files requested')
+        if len(files) > rules['max_files']:
+            raise UploadGrantError(f"Maximum {rules['max_files']} files allowed")
+
+        config = current_app.config
+        bucket_name = config.get('S3_BUCKET_NAME')
+        max_bytes = config.get('UPLOAD_GRANT_MAX_BYTES', 16 * 1024 * 1024)
+        expires_in = config.get('UPLOAD_GRANT_EXPIRES_SECONDS', 600)
+        expires_at = (datetime.utcnow() + timedelta(seconds=expires_in)).isoformat()
+
+        s3_client = S3Service.get_s3_client()
+        serializer = UploadGrantService._serializer()
+        grants = []
+
+        for file in files:
+            content_type = (file.get('content_type') or '').lower()
+            ext = rules['content_types'].get(content_type)
+            if ext is None:
+                raise UploadGrantError(
+                    f"Invalid content type. Allowed: {', '.join(rules['content_types'])}"
+                )
+
+            method = (file.get('method') or 'post').lower()
+            if method not in UPLOAD_METHODS:
+                raise UploadGrantError("Invalid method. Allowed: post, put")
+
+            size = file.get('size')
+            if size is not None:
+                if not isinstance(size, int) or not 0 < size <= max_bytes:
+                    raise UploadGrantError(f'File size must be between 1 and {max_bytes} bytes')
+
+            key = f"{rules['folder']}/{uuid.uuid4().hex}.{ext}"
+            grant = {
+                'method': method,
+                'key': key,
+                'max_bytes': max_bytes,
+                'expires_at': expires_at,
+                'token': serializer.dumps({'u': user_id, 'p': purpose, 'k': key}),
+            }
+
+            if method == 'post':
+                # The policy lets S3 itself reject oversized or mistyped bodies
+                presigned = s3_client.generate_presigned_post(
+                    Bucket=bucket_name,
+                    Key=key,
+                    Fields={'Content-Type': content_type},
+                    Conditions=[
+                        {'Content-Type': content_type},
+                        ['content-length-range', 1, max_bytes],
+                    ],
+                    ExpiresIn=expires_in,
+                )
+                grant['url'] = presigned['url']
+                grant['fields'] = presigned['fields']
+            else:
+                # A PUT can only be bounded by signing the exact length
+                if size is None:
+                    raise UploadGrantError('size is required for PUT uploads')
+                grant['url'] = s3_client.generate_presigned_url(
+                    'put_object',
+                    Params={'Bucket': bucket_name, 'Key': key, 'ContentType': content_type, 'ContentLength': size},
+                    ExpiresIn=expires_in,
+                )
+                grant['headers'] = {'Content-Type': content_type, 'Content-Length': str(size)}
+
+            grants.append(grant)
+
+        return grants
+
+    @staticmethod
+    def _max_age():
+        """Seconds a grant token stays redeemable"""
+        config = current_app.config
+        return config.get('UPLOAD_GRANT_EXPIRES_SECONDS', 600) + config.get('UPLOAD_GRANT_CONFIRM_SECONDS', 3600)
+
+    @staticmethod
+    def redeem(user_id, purpose, token):
+        """
+        Check a grant token and that its object was uploaded within limits,
+        and mark the grant used
+
+        The mark is written in the current transaction, so a request that
+        rolls back leaves the grant redeemable; the caller commits.
+
+        Returns:
+            Public URL of the uploaded object
+
+        Raises:
+            UploadGrantError: Invalid, expired, already used, or the object
+                              is missing or outside the grant's limits
+        """
+        config = current_app.config
+        max_age = UploadGrantService._max_age()
+
+        try:
+            grant = UploadGrantService._serializer().loads(token, max_age=max_age)
+        except SignatureExpired:
+            raise UploadGrantError('Upload grant expired')
+        except BadSignature:
+            raise UploadGrantError('Invalid upload grant')
+
+        if grant.get('u') != user_id or grant.get('p') != purpose:
+            raise UploadGrantError('Upload grant does not match this request')
+
+        rules = PURPOSES[purpose]
+        bucket_name = config.get('S3_BUCKET_NAME')
+        key = grant['k']
+
+        try:
+            head = S3Service.get_s3_client().head_object(Bucket=bucket_name, Key=key)
+        except ClientError:
+            raise UploadGrantError(f'File {key} was not uploaded')
+
+        if head.get('ContentLength', 0) > config.get('UPLOAD_GRANT_MAX_BYTES', 16 * 1024 * 1024):
+            raise UploadGrantError(f'File {key} is too large')
+        if head.get('ContentType') not in rules['content_types']:
+            raise UploadGrantError(f'File {key} has an invalid content type')
+
+        # One object per grant, attached once: a second listing sharing the
+        # uuid key would lose the image when the first one is deleted
+        inserted = db.session.connection().execute(
+            _insert_ignoring_duplicates(RedeemedUpload.__table__),
+            [{'key': key, 'user_id': user_id, 'redeemed_at': datetime.utcnow()}],
+        )
+        if inserted.rowcount == 0:
+            raise UploadGrantError(f'Upload grant for {key} was already used')
+
+        return S3Service.url_for_key(key)
+
+    @staticmethod
+    def purge_redeemed():
+        """
+        Forget redemptions whose tokens have expired anyway
+
+        Returns:
+            Number of rows deleted
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=UploadGrantService._max_age())
+        deleted = db.session.execute(delete(RedeemedUpload).where(RedeemedUpload.redeemed_at < cutoff))
+        db.session.commit()
+        return deleted.rowcount
+
+    @staticmethod
+    def redeem_many(user_id, purpose, tokens):
+        """
+        redeem() for several tokens, preserving order
+
+        All or nothing once the caller's transaction ends: on an error it
+        must not commit the grants redeemed before the failing one.
+        """
+        return [UploadGrantService.redeem(user_id, purpose, token) for token in tokens]
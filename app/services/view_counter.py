@@ -0,0 +1,193 @@
+"""
+View Counter Service
+Buffers property detail views and writes them to properties.view_count in
+periodic batched UPDATEs, so viewing a listing doesn't open a write
+transaction
+"""
+
+import atexit
+import logging
+import os
+import threading
+from flask import current_app
+from sqlalchemy import update, bindparam
+from extensions import db
+from app.models.property import Property
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # 'local' counts per process; 'redis' shares counts between processes
+    'VIEW_COUNTER_BACKEND': 'local',
+    # 0 disables the background flusher (tests, scripts call flush())
+    'VIEW_COUNTER_FLUSH_SECONDS': 30,
+}
+
+REDIS_KEY = 'property_views'
+
+
+class LocalCounterStore:
+    """Per-process counts; each worker flushes its own"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def incr(self, property_id, n=1):
+        with self._lock:
+            self._counts[property_id] = self._counts.get(property_id, 0) + n
+
+    def get(self, property_id):
+        with self._lock:
+            return self._counts.get(property_id, 0)
+
+    def take(self):
+        """Remove and return every pending count"""
+        with self._lock:
+            counts, self._counts = self._counts, {}
+        return counts
+
+    def restore(self, counts):
+        """Put back counts that couldn't be written"""
+        for property_id, n in counts.items():
+            self.incr(property_id, n)
+
+
+class RedisCounterStore:
+    """Counts in one Redis hash shared by every worker"""
+
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def incr(self, property_id, n=1):
+        self.client.hincrby(REDIS_KEY, property_id, n)
+
+    def get(self, property_id):
+        return int(self.client.hget(REDIS_KEY, property_id) or 0)
+
+    def take(self):
+        # Read and clear atomically so increments between the two aren't lost
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hgetall(REDIS_KEY)
+        pipe.delete(REDIS_KEY)
+        counts, _ = pipe.execute()
+        return {int(k): int(v) for k, v in counts.items()}
+
+    def restore(self, counts):
+        pipe = self.client.pipeline(transaction=False)
+        for property_id, n in counts.items():
+            pipe.hincrby(REDIS_KEY, property_id, n)
+        pipe.execute()
+
+
+class ViewFlusher:
+    """Background thread that flushes pending views every few seconds"""
+
+    def __init__(self, app, interval):
+        self.app = app
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def ensure_started(self):
+        # Started lazily so each forked worker gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            threading.Thread(target=self._run, name='view-flusher', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        try:
+            with self.app.app_context():
+                ViewCounter.flush()
+        except Exception:
+            logger.exception('View count flush failed')
+
+
+class ViewCounter:
+    """Service for buffered property view counts"""
+
+    @staticmethod
+    def init_app(app):
+        """Set up the counter store and the flusher"""
+        for key, value in DEFAULTS.items():
+            app.config.setdefault(key, value)
+
+        if app.config['VIEW_COUNTER_BACKEND'] == 'redis':
+            store = RedisCounterStore(app.config['REDIS_URL'])
+        else:
+            store = LocalCounterStore()
+
+        flusher = None
+        if app.config['VIEW_COUNTER_FLUSH_SECONDS'] > 0:
+            flusher = ViewFlusher(app, app.config['VIEW_COUNTER_FLUSH_SECONDS'])
+            # Write what this process still holds on a clean shutdown
+            atexit.register(flusher.flush)
+
+        app.extensions['view_counter'] = {'store': store, 'flusher': flusher}
+
+    @staticmethod
+    def store():
+        return current_app.extensions['view_counter']['store']
+
+    @staticmethod
+    def record(property_id):
+        """Count a view; never fails the request"""
+        try:
+            ViewCounter.store().incr(property_id)
+            flusher = current_app.extensions['view_counter']['flusher']
+            if flusher is not None:
+                flusher.ensure_started()
+        except Exception as e:
+            logger.warning(f'View count error: {e}')
+
+    @staticmethod
+    def pending(property_id):
+        """Views counted but not yet written"""
+        try:
+            return ViewCounter.store().get(property_id)
+        except Exception:
+            return 0
+
+    @staticmethod
+    def flush():
+        """
+        Write pending views with one batched UPDATE
+
+        Returns:
+            Number of properties updated
+        """
+        store = ViewCounter.store()
+        counts = store.take()
+        if not counts:
+            return 0
+
+        table = Property.__table__
+        try:
+            # Relative increments, so concurrent flushers never overwrite each
+            # other; a view isn't an edit, so updated_at keeps its value
+            db.session.connection().execute(
+                update(table)
+                .where(table.c.id == bindparam('pid'))
+                .values(view_count=db.func.coalesce(table.c.view_count, 0) + bindparam('n'),
+                        updated_at=table.c.updated_at),
+                [{'pid': property_id, 'n': n} for property_id, n in counts.items()]
+            )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            store.restore(counts)
+            raise
+
+        return len(counts)
@@ -0,0 +1,112 @@
+"""
+Conditional GET helpers
+"""
+
+import hashlib
+import logging
+from datetime import date, datetime, time, timezone
+from functools import wraps
+from flask import current_app, g, request, make_response
+
+
+logger = logging.getLogger(__name__)
+
+
+def last_modified_of(parts):
+    """
+    Latest timestamp among the version parts, as an aware UTC datetime
+    truncated to the second (HTTP dates have no fractions)
+
+    Dates count as their midnight, so responses derived from "today" change
+    when the day does. Sent as Last-Modified for information only; see
+    not_modified.
+    """
+    stamps = []
+    for value in parts:
+        if isinstance(value, datetime):
+            stamps.append(value)
+        elif isinstance(value, date):
+            stamps.append(datetime.combine(value, time.min))
+    if not stamps:
+        return None
+    return max(stamps).replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def etag_of(parts):
+    """Validator for a version, scoped to the URL it was computed for"""
+    args = sorted((name, value) for name in request.args for value in request.args.getlist(name))
+    raw = repr((request.path, args, tuple(parts))).encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def not_modified(etag):
+    """
+    Whether the client's cached copy is still current
+
+    Only If-None-Match is answered. Versions include counters and version
+    numbers, and a max(updated_at) can go down when a row is deleted, so the
+    latest timestamp doesn't cover every change; If-Modified-Since alone
+    always gets the full response (RFC 9110 allows ignoring it).
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    return False
+
+
+def _set_validators(response, etag, last_modified, private):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Clients and shared caches may store it but must revalidate first
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    return response
+
+
+def conditional_get(version, private=False):
+    """
+    Answer If-None-Match from a cheap version query, before the view loads
+    or serializes anything
+
+    Put it above @cached_response: cache entries are then keyed on the
+    version too, so a body cached before another worker's change is never
+    served under the new ETag.
+
+    Args:
+        version: Callable taking the view's arguments and returning a tuple
+                 that changes whenever the response would (timestamps,
+                 counts, version columns), or None to skip the check
+                 (e.g. the resource doesn't exist)
+        private: The response depends on the caller
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                parts = version(*args, **kwargs)
+            except Exception as e:
+                # A failed check only costs the shortcut
+                logger.warning(f'Version check failed for {request.path}: {e}')
+                parts = None
+
+            if parts is None:
+                return view(*args, **kwargs)
+
+            etag = etag_of(parts)
+            last_modified = last_modified_of(parts)
+            if not_modified(etag):
+                response = current_app.response_class(status=304)
+                return _set_validators(response, etag, last_modified, private)
+
+            # Lets a cached_response below key its entry on this version
+            g.resource_version = etag
+            try:
+                response = make_response(view(*args, **kwargs))
+            finally:
+                g.pop('resource_version', None)
+            if response.status_code == 200:
+                _set_validators(response, etag, last_modified, private)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,206 @@
+"""
+Keyset (cursor) pagination helpers
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from flask import request
+from sqlalchemy import func, or_, and_
+
+
+MAX_PER_PAGE = 100
+
+
+class CursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class SortKey:
+    """One column of a keyset ordering"""
+
+    def __init__(self, column, descending=False, default=None):
+        """
+        Args:
+            column: Mapped attribute, e.g. Property.created_at
+            descending: Sort direction
+            default: Substitute for NULLs so the ordering is total
+        """
+        self.column = column
+        self.descending = descending
+        self.default = default
+        self.name = column.key
+
+    @property
+    def expression(self):
+        if self.default is None:
+            return self.column
+        return func.coalesce(self.column, self.default)
+
+    def order_clause(self):
+        return self.expression.desc() if self.descending else self.expression.asc()
+
+    def value_of(self, row):
+        value = getattr(row, self.name)
+        return self.default if value is None else value
+
+    def after(self, value):
+        """Condition for rows strictly past `value` in sort order"""
+        return self.expression < value if self.descending else self.expression > value
+
+    def signature(self):
+        return f"{self.name}:{'desc' if self.descending else 'asc'}"
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+        if 'dec' in value:
+            return Decimal(value['dec'])
+    return value
+
+
+def encode_cursor(sort_keys, row):
+    """Opaque cursor pointing just after `row`"""
+    payload = {
+        's': ','.join(key.signature() for key in sort_keys),
+        'v': [_encode_value(key.value_of(row)) for key in sort_keys],
+    }
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(sort_keys, cursor):
+    """Decode a cursor produced by encode_cursor for the same ordering"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = [_decode_value(v) for v in payload['v']]
+    except (ValueError, KeyError, TypeError) as e:
+        raise CursorError('Invalid cursor') from e
+
+    if payload.get('s') != ','.join(key.signature() for key in sort_keys) or len(values) != len(sort_keys):
+        raise CursorError('Cursor does not match the requested sort order')
+
+    return values
+
+
+def keyset_filter(sort_keys, values):
+    """
+    Row-value comparison expanded for mixed sort directions:
+    (a > va) OR (a = va AND b > vb) OR ...
+    """
+    clauses = []
+    for i, key in enumerate(sort_keys):
+        equal_prefix = [prev.expression == values[j] for j, prev in enumerate(sort_keys[:i])]
+        clauses.append(and_(*equal_prefix, key.after(values[i])))
+    return or_(*clauses)
+
+
+class CursorPage:
+    """A page of results fetched with keyset pagination"""
+
+    def __init__(self, items, next_cursor, per_page, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.per_page = per_page
+        self.total = total
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+    def meta(self):
+        """Pagination fields for the JSON response"""
+        data = {
+            'next_cursor': self.next_cursor,
+            'has_more': self.has_more,
+            'per_page': self.per_page,
+        }
+        if self.total is not None:
+            data['total'] = self.total
+        return data
+
+
+def keyset_paginate(query, sort_keys, cursor=None, per_page=20, include_total=False):
+    """
+    Fetch one page after `cursor`
+
+    Args:
+        query: Filtered query without ORDER BY
+        sort_keys: List of SortKey; the last one must be unique (usually id)
+        cursor: Cursor from a previous page, or None for the first page
+        per_page: Page size
+        include_total: Also run a COUNT(*) over the filtered query
+
+    Returns:
+        CursorPage
+    """
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    total = query.order_by(None).count() if include_total else None
+
+    if cursor:
+        query = query.filter(keyset_filter(sort_keys, decode_cursor(sort_keys, cursor)))
+
+    rows = query.order_by(*[key.order_clause() for key in sort_keys]).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(sort_keys, rows[-1])
+
+    return CursorPage(rows, next_cursor, per_page, total)
+
+
+def wants_cursor_pagination():
+    """Cursor mode is opt-in via ?cursor=... or ?pagination=cursor"""
+    return 'cursor' in request.args or request.args.get('pagination') == 'cursor'
+
+
+def paginate_from_request(query, sort_keys, default_per_page=20):
+    """keyset_paginate driven by the cursor, per_page and include_total query args"""
+    return keyset_paginate(
+        query,
+        sort_keys,
+        cursor=request.args.get('cursor') or None,
+        per_page=request.args.get('per_page', default_per_page, type=int),
+        include_total=request.args.get('include_total', 'false').lower() == 'true',
+    )
+
+
+def paginate_request(query, sort_keys, default_per_page=20):
+    """
+    Paginate with cursors when the client opted in, else with page/per_page
+
+    Returns:
+        (items, pagination fields for the JSON response)
+    """
+    if wants_cursor_pagination():
+        cursor_page = paginate_from_request(query, sort_keys, default_per_page)
+        return cursor_page.items, cursor_page.meta()
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', default_per_page, type=int)
+    paginated = query.order_by(*[key.order_clause() for key in sort_keys]).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    return paginated.items, {
+        'total': paginated.total,
+        'pages': paginated.pages,
+        'current_page': page,
+        'per_page': per_page,
+    }
@@ -24,6 +24,21 @@ class Config:
     PUSHER_SECRET = os.getenv('PUSHER_SECRET')
     PUSHER_CLUSTER = os.getenv('PUSHER_CLUSTER', 'mt1')
 
+    # Outbound push/Pusher delivery (see app/services/outbox_service.py).
+    # Set OUTBOX_WORKERS=0 to deliver from scripts/outbox_worker.py instead.
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 2))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))
+    OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 5))
+
+    # Listing views are buffered and written every VIEW_COUNTER_FLUSH_SECONDS;
+    # 'redis' (REDIS_URL) shares the buffer between processes
+    VIEW_COUNTER_BACKEND = os.getenv('VIEW_COUNTER_BACKEND', 'local')
+    VIEW_COUNTER_FLUSH_SECONDS = int(os.getenv('VIEW_COUNTER_FLUSH_SECONDS', 30))
+    # Public property endpoints: 'lru' (per process), 'redis' (shared) or 'none'
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'lru')
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', 60))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 2000))
+
     SAFEPAY_ENVIRONMENT = os.getenv('SAFEPAY_ENVIRONMENT', 'sandbox')
     SAFEPAY_API_KEY = os.getenv('SAFEPAY_API_KEY')
     SAFEPAY_V1_SECRET = os.getenv('SAFEPAY_V1_SECRET')
@@ -39,6 +54,26 @@ class Config:
     AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
     S3_BUCKET_NAME = os.getenv('S3_BUCKET_NAME')
     AWS_REGION = os.getenv('AWS_REGION', 'us-east-1')
+    # Shared S3 client (see S3ClientManager); S3_ENDPOINT_URL points at a local S3 stand-in
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL')
+    S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 20))
+    S3_MAX_ATTEMPTS = int(os.getenv('S3_MAX_ATTEMPTS', 3))
+    S3_CONNECT_TIMEOUT = int(os.getenv('S3_CONNECT_TIMEOUT', 5))
+    S3_READ_TIMEOUT = int(os.getenv('S3_READ_TIMEOUT', 30))
+    # Background deletes (see StorageCleanupService): hold time for batching, and
+    # how old an unreferenced object must be before the orphan sweep removes it
+    S3_DELETE_DELAY_SECONDS = int(os.getenv('S3_DELETE_DELAY_SECONDS', 5))
+    S3_ORPHAN_GRACE_HOURS = int(os.getenv('S3_ORPHAN_GRACE_HOURS', 24))
+    # Parallel image uploads: processes for resizing (0 = resize in the upload threads)
+    IMAGE_PROCESS_WORKERS = int(os.getenv('IMAGE_PROCESS_WORKERS', min(4, os.cpu_count() or 1)))
+    IMAGE_UPLOAD_THREADS = int(os.getenv('IMAGE_UPLOAD_THREADS', 8))
+    # Image jobs queued or running at once, how long a caller waits for a slot, and per-job limit
+    IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', 4 * max(IMAGE_PROCESS_WORKERS, 1)))
+    IMAGE_QUEUE_WAIT_SECONDS = int(os.getenv('IMAGE_QUEUE_WAIT_SECONDS', 10))
+    IMAGE_JOB_TIMEOUT_SECONDS = int(os.getenv('IMAGE_JOB_TIMEOUT_SECONDS', 30))
+    # Presigned direct-to-S3 uploads (/api/upload/grants)
+    UPLOAD_GRANT_MAX_BYTES = int(os.getenv('UPLOAD_GRANT_MAX_BYTES', 16 * 1024 * 1024))
+    UPLOAD_GRANT_EXPIRES_SECONDS = int(os.getenv('UPLOAD_GRANT_EXPIRES_SECONDS', 600))
     
     # Stripe Configuration
     STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
@@ -105,6 +140,11 @@ class TestingConfig(Config):
     SQLALCHEMY_ECHO = False
     WTF_CSRF_ENABLED = False
 
+    # Record deliveries locally; tests call OutboxService.drain() themselves
+    OUTBOX_WORKERS = 0
+    OUTBOX_FAKE_TRANSPORTS = True
+    VIEW_COUNTER_FLUSH_SECONDS = 0
+
 
 # Configuration dictionary
 config = {
@@ -0,0 +1,69 @@
+"""add amenities and property_amenities
+
+Revision ID: 0b6e4d9f2a17
+Revises: f3b8d1e6a2c9
+Create Date: 2026-10-17 16:48:52.730164
+
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e4d9f2a17'
+down_revision = 'f3b8d1e6a2c9'
+branch_labels = None
+depends_on = None
+
+
+def _amenity_key(name):
+    # Frozen copy of app.services.amenity_service.amenity_key
+    if not isinstance(name, str):
+        return None
+    decomposed = unicodedata.normalize('NFKD', name)
+    return ''.join(c for c in decomposed.casefold() if c.isalnum() and not unicodedata.combining(c)) or None
+
+
+def upgrade():
+    amenities = op.create_table('amenities',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    property_amenities = op.create_table('property_amenities',
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('amenity_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['amenity_id'], ['amenities.id'], ),
+    sa.ForeignKeyConstraint(['property_id'], ['properties.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('property_id', 'amenity_id')
+    )
+    op.create_index('ix_property_amenities_amenity_property', 'property_amenities', ['amenity_id', 'property_id'])
+
+    # Amenity filters switch to the table, so fill it from the JSON column now
+    bind = op.get_bind()
+    properties = sa.table('properties', sa.column('id', sa.Integer), sa.column('amenities', sa.JSON))
+    catalog = {}
+    links = set()
+    for property_id, names in bind.execute(sa.select(properties.c.id, properties.c.amenities)):
+        for name in names if isinstance(names, list) else []:
+            key = _amenity_key(name)
+            if not key:
+                continue
+            if key not in catalog:
+                catalog[key] = {'id': len(catalog) + 1, 'key': key, 'name': ' '.join(name.split())[:100]}
+            links.add((property_id, catalog[key]['id']))
+
+    if catalog:
+        op.bulk_insert(amenities, list(catalog.values()))
+        op.bulk_insert(property_amenities, [{'property_id': p, 'amenity_id': a} for p, a in sorted(links)])
+        if bind.dialect.name == 'postgresql':
+            op.execute("SELECT setval('amenities_id_seq', (SELECT MAX(id) FROM amenities))")
+
+
+def downgrade():
+    op.drop_index('ix_property_amenities_amenity_property', table_name='property_amenities')
+    op.drop_table('property_amenities')
+    op.drop_table('amenities')
@@ -0,0 +1,72 @@
+"""add denormalized conversation counters
+
+Revision ID: 3f6b2e8d9a14
+Revises: c1e9a4d27b30
+Create Date: 2026-10-16 14:26:03.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f6b2e8d9a14'
+down_revision = 'c1e9a4d27b30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('last_message_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_message_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('user1_last_read_message_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('user2_last_read_message_id', sa.Integer(), nullable=True))
+
+    # Backfill counters and last-message pointers
+    op.execute("""
+        UPDATE conversations SET
+            message_count = (
+                SELECT COUNT(*) FROM messages WHERE messages.conversation_id = conversations.id
+            ),
+            last_message_id = (
+                SELECT MAX(messages.id) FROM messages WHERE messages.conversation_id = conversations.id
+            ),
+            last_message_at = (
+                SELECT MAX(messages.created_at) FROM messages WHERE messages.conversation_id = conversations.id
+            )
+    """)
+
+    # Read counts become last-read pointers: the Nth message of the conversation
+    bind = op.get_bind()
+    conversations = bind.execute(sa.text(
+        "SELECT id, user1_read_count, user2_read_count FROM conversations WHERE message_count > 0"
+    )).fetchall()
+
+    for convo_id, user1_read, user2_read in conversations:
+        message_ids = [row[0] for row in bind.execute(
+            sa.text("SELECT id FROM messages WHERE conversation_id = :cid ORDER BY id"),
+            {'cid': convo_id}
+        )]
+
+        def pointer(read_count):
+            read_count = min(read_count or 0, len(message_ids))
+            return message_ids[read_count - 1] if read_count else None
+
+        bind.execute(
+            sa.text(
+                "UPDATE conversations SET user1_last_read_message_id = :u1, "
+                "user2_last_read_message_id = :u2 WHERE id = :cid"
+            ),
+            {'u1': pointer(user1_read), 'u2': pointer(user2_read), 'cid': convo_id}
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_column('user2_last_read_message_id')
+        batch_op.drop_column('user1_last_read_message_id')
+        batch_op.drop_column('last_message_at')
+        batch_op.drop_column('last_message_id')
+        batch_op.drop_column('message_count')
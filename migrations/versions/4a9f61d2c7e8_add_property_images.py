@@ -0,0 +1,42 @@
+"""add property_images
+
+Revision ID: 4a9f61d2c7e8
+Revises: b57e2a9c3d61
+Create Date: 2026-10-16 18:05:44.213960
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a9f61d2c7e8'
+down_revision = 'b57e2a9c3d61'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows for existing listings are created by scripts/property_images.py sync
+    op.create_table('property_images',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('property_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('original_url', sa.String(length=500), nullable=False),
+    sa.Column('variants', sa.JSON(), nullable=True),
+    sa.Column('width', sa.Integer(), nullable=True),
+    sa.Column('height', sa.Integer(), nullable=True),
+    sa.Column('placeholder', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['property_id'], ['properties.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_property_images_property_position', 'property_images', ['property_id', 'position'])
+
+
+def downgrade():
+    op.drop_index('ix_property_images_property_position', table_name='property_images')
+    op.drop_table('property_images')
@@ -0,0 +1,35 @@
+"""add property availability index
+
+Revision ID: 754db337e5f8
+Revises: 5a8ea21a8d86
+Create Date: 2026-10-16 09:12:41.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '754db337e5f8'
+down_revision = '5a8ea21a8d86'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('property_availability',
+        sa.Column('property_id', sa.Integer(), nullable=False),
+        sa.Column('window_start', sa.Date(), nullable=False),
+        sa.Column('window_days', sa.Integer(), nullable=False),
+        sa.Column('booked_bits', sa.LargeBinary(), nullable=False),
+        sa.Column('blocked_bits', sa.LargeBinary(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['property_id'], ['properties.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('property_id')
+    )
+    # Populate with: python scripts/availability_index.py rebuild
+
+
+def downgrade():
+    op.drop_table('property_availability')
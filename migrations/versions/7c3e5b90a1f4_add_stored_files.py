@@ -0,0 +1,39 @@
+"""add stored_files
+
+Revision ID: 7c3e5b90a1f4
+Revises: 4a9f61d2c7e8
+Create Date: 2026-10-16 22:40:12.508331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5b90a1f4'
+down_revision = '4a9f61d2c7e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing uploads keep their uuid keys and are not reference counted
+    op.create_table('stored_files',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('content_hash', sa.String(length=64), nullable=False),
+    sa.Column('source_hash', sa.String(length=64), nullable=True),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('content_type', sa.String(length=50), nullable=True),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_used_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_index(op.f('ix_stored_files_source_hash'), 'stored_files', ['source_hash'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stored_files_source_hash'), table_name='stored_files')
+    op.drop_table('stored_files')
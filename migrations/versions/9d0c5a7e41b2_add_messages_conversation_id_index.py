@@ -0,0 +1,27 @@
+"""add messages (conversation_id, id) index
+
+Revision ID: 9d0c5a7e41b2
+Revises: 3f6b2e8d9a14
+Create Date: 2026-10-16 15:40:55.872310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d0c5a7e41b2'
+down_revision = '3f6b2e8d9a14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The composite index covers every lookup the single-column one served
+    op.create_index('ix_messages_conversation_id_id', 'messages', ['conversation_id', 'id'])
+    op.drop_index('ix_messages_conversation_id', table_name='messages')
+
+
+def downgrade():
+    op.create_index('ix_messages_conversation_id', 'messages', ['conversation_id'])
+    op.drop_index('ix_messages_conversation_id_id', table_name='messages')
@@ -0,0 +1,41 @@
+"""forget source hashes of uncompressed fallback uploads
+
+Revision ID: a7d3c5e9b140
+Revises: 0b6e4d9f2a17
+Create Date: 2026-10-18 10:12:37.415902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3c5e9b140'
+down_revision = '0b6e4d9f2a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Compressed uploads are stored as .jpg with image/jpeg; a JPEG or PNG
+    # stored any other way is an original kept after compression failed,
+    # and must not be handed out again for its source hash
+    stored_files = sa.table('stored_files',
+        sa.column('key', sa.String),
+        sa.column('content_type', sa.String),
+        sa.column('source_hash', sa.String),
+    )
+    op.execute(
+        stored_files.update()
+        .where(stored_files.c.source_hash.isnot(None))
+        .where(sa.or_(
+            stored_files.c.content_type.in_(['image/jpg', 'image/png']),
+            stored_files.c.key.like('%.jpeg'),
+        ))
+        .values(source_hash=None)
+    )
+
+
+def downgrade():
+    # The hashes can't be recovered; the next upload of each file stores it again
+    pass
@@ -0,0 +1,45 @@
+"""add device_tokens
+
+Revision ID: b57e2a9c3d61
+Revises: e8b14c0f7d25
+Create Date: 2026-10-16 16:58:21.640935
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b57e2a9c3d61'
+down_revision = 'e8b14c0f7d25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('device_tokens',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=512), nullable=False),
+    sa.Column('platform', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token')
+    )
+    op.create_index(op.f('ix_device_tokens_user_id'), 'device_tokens', ['user_id'], unique=False)
+
+    # Carry over the single token each user had registered
+    op.execute("""
+        INSERT INTO device_tokens (user_id, token, created_at, last_seen_at)
+        SELECT MIN(id), fcm_token, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+        FROM users
+        WHERE fcm_token IS NOT NULL AND fcm_token <> ''
+        GROUP BY fcm_token
+    """)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_device_tokens_user_id'), table_name='device_tokens')
+    op.drop_table('device_tokens')
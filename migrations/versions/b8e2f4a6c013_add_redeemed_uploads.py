@@ -0,0 +1,33 @@
+"""add redeemed_uploads
+
+Revision ID: b8e2f4a6c013
+Revises: a7d3c5e9b140
+Create Date: 2026-10-18 11:05:42.118306
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e2f4a6c013'
+down_revision = 'a7d3c5e9b140'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('redeemed_uploads',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('redeemed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('key')
+    )
+    op.create_index(op.f('ix_redeemed_uploads_redeemed_at'), 'redeemed_uploads', ['redeemed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_redeemed_uploads_redeemed_at'), table_name='redeemed_uploads')
+    op.drop_table('redeemed_uploads')
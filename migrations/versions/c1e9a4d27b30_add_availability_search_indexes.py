@@ -0,0 +1,28 @@
+"""add availability search indexes
+
+Revision ID: c1e9a4d27b30
+Revises: 754db337e5f8
+Create Date: 2026-10-16 11:02:17.530941
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e9a4d27b30'
+down_revision = '754db337e5f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_bookings_property_dates', 'bookings',
+                    ['property_id', 'check_in', 'check_out', 'status'])
+    op.create_index('ix_blocked_dates_property_date', 'blocked_dates',
+                    ['property_id', 'blocked_date'])
+
+
+def downgrade():
+    op.drop_index('ix_blocked_dates_property_date', table_name='blocked_dates')
+    op.drop_index('ix_bookings_property_dates', table_name='bookings')
@@ -0,0 +1,29 @@
+"""add properties.geohash
+
+Revision ID: d2f7a61c8e53
+Revises: 7c3e5b90a1f4
+Create Date: 2026-10-17 09:20:37.614022
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a61c8e53'
+down_revision = '7c3e5b90a1f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index(batch_op.f('ix_properties_geohash'), ['geohash'], unique=False)
+    # Populate with: python scripts/geo_index.py rebuild
+
+
+def downgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_properties_geohash'))
+        batch_op.drop_column('geohash')
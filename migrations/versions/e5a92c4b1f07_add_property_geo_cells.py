@@ -0,0 +1,34 @@
+"""add property_geo_cells
+
+Revision ID: e5a92c4b1f07
+Revises: d2f7a61c8e53
+Create Date: 2026-10-17 11:02:18.390741
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a92c4b1f07'
+down_revision = 'd2f7a61c8e53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('property_geo_cells',
+    sa.Column('precision', sa.Integer(), nullable=False),
+    sa.Column('cell', sa.String(length=12), nullable=False),
+    sa.Column('listing_count', sa.Integer(), nullable=False),
+    sa.Column('latitude_sum', sa.Float(), nullable=False),
+    sa.Column('longitude_sum', sa.Float(), nullable=False),
+    sa.Column('min_price', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('precision', 'cell')
+    )
+    # Populate with: python scripts/geo_index.py rebuild
+
+
+def downgrade():
+    op.drop_table('property_geo_cells')
@@ -0,0 +1,37 @@
+"""add outbox_events
+
+Revision ID: e8b14c0f7d25
+Revises: 9d0c5a7e41b2
+Create Date: 2026-10-16 16:12:37.504118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8b14c0f7d25'
+down_revision = '9d0c5a7e41b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox_events',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(length=20), nullable=False),
+    sa.Column('payload', sa.JSON(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_events_status_next_attempt', 'outbox_events', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_outbox_events_status_next_attempt', table_name='outbox_events')
+    op.drop_table('outbox_events')
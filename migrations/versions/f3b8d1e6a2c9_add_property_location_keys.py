@@ -0,0 +1,58 @@
+"""add properties.city_key and country_key
+
+Revision ID: f3b8d1e6a2c9
+Revises: e5a92c4b1f07
+Create Date: 2026-10-17 14:31:09.118246
+
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d1e6a2c9'
+down_revision = 'e5a92c4b1f07'
+branch_labels = None
+depends_on = None
+
+
+def _location_key(value):
+    # Frozen copy of app.services.location_index.location_key
+    if not value:
+        return None
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split()) or None
+
+
+def upgrade():
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('city_key', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('country_key', sa.String(length=100), nullable=True))
+
+    # Searches switch to the keys, so fill them before any code uses them
+    bind = op.get_bind()
+    properties = sa.table('properties',
+        sa.column('id', sa.Integer), sa.column('city', sa.String), sa.column('country', sa.String),
+        sa.column('city_key', sa.String), sa.column('country_key', sa.String))
+    rows = bind.execute(sa.select(properties.c.id, properties.c.city, properties.c.country)).all()
+    if rows:
+        bind.execute(
+            properties.update().where(properties.c.id == sa.bindparam('pid')).values(
+                city_key=sa.bindparam('ck'), country_key=sa.bindparam('cok')),
+            [{'pid': pid, 'ck': _location_key(city), 'cok': _location_key(country)} for pid, city, country in rows]
+        )
+
+    op.create_index('ix_properties_city_key', 'properties', ['city_key'],
+                    postgresql_ops={'city_key': 'text_pattern_ops'})
+    op.create_index('ix_properties_country_key', 'properties', ['country_key'],
+                    postgresql_ops={'country_key': 'text_pattern_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_properties_country_key', table_name='properties')
+    op.drop_index('ix_properties_city_key', table_name='properties')
+    with op.batch_alter_table('properties', schema=None) as batch_op:
+        batch_op.drop_column('country_key')
+        batch_op.drop_column('city_key')
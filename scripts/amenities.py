@@ -0,0 +1,35 @@
+"""
+Script to maintain the amenity catalog tables
+Usage: python scripts/amenities.py rebuild
+
+Re-mirrors every listing's amenities column into property_amenities, e.g.
+after changing how names are normalized.
+"""
+
+import sys
+import os
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from app import create_app
+from app.services.amenity_service import AmenityService
+
+
+def rebuild():
+    """Sync property_amenities with Property.amenities for every listing"""
+    app = create_app()
+
+    with app.app_context():
+        synced = AmenityService.rebuild()
+        print(f"✅ Synced amenities for {synced} properties")
+        return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python scripts/amenities.py rebuild")
+        sys.exit(1)
+
+    sys.exit(0 if rebuild() else 1)
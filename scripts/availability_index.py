@@ -0,0 +1,57 @@
+"""
+Script to maintain the property availability index
+Usage: python scripts/availability_index.py rebuild [property_id ...]
+       python scripts/availability_index.py check [property_id ...]
+
+Run `rebuild` daily (e.g. from cron) to roll every window forward.
+"""
+
+import sys
+import os
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from app import create_app
+from extensions import db
+from app.services.availability_index import AvailabilityIndex
+
+
+def rebuild(property_ids=None):
+    """Rebuild index rows from the bookings and blocked_dates tables"""
+    app = create_app()
+
+    with app.app_context():
+        written = AvailabilityIndex.rebuild(property_ids)
+        db.session.commit()
+        print(f"✅ Rebuilt availability for {written} properties")
+        return True
+
+
+def check(property_ids=None):
+    """Compare index rows against the bookings and blocked_dates tables"""
+    app = create_app()
+
+    with app.app_context():
+        problems = AvailabilityIndex.check(property_ids)
+
+        if not problems:
+            print("✅ Availability index is consistent")
+            return True
+
+        print(f"❌ {len(problems)} inconsistent properties")
+        for problem in problems:
+            print(f"   - {problem}")
+        return False
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('rebuild', 'check'):
+        print("Usage: python scripts/availability_index.py <rebuild|check> [property_id ...]")
+        print("Example: python scripts/availability_index.py check 12 15")
+        sys.exit(1)
+
+    ids = [int(arg) for arg in sys.argv[2:]] or None
+    command = rebuild if sys.argv[1] == 'rebuild' else check
+    sys.exit(0 if command(ids) else 1)
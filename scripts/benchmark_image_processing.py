@@ -0,0 +1,132 @@
+"""
+Micro-benchmark image decode/resize/encode against the previous implementation
+Usage: python scripts/benchmark_image_processing.py [corpus_dir] [--repeat N]
+
+corpus_dir holds sample photos (jpg/jpeg/png). Without it a synthetic corpus
+is generated: camera-sized JPEGs with a rotation EXIF tag and GPS data, and
+PNGs with transparency.
+"""
+
+import sys
+import os
+import io
+import statistics
+import time
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from PIL import Image
+from app.models.property_image import DERIVATIVE_WIDTHS, DERIVATIVE_FORMATS
+from app.services.image_processing import compress_image_bytes, make_derivatives
+
+
+def legacy_compress(data, max_size=(1920, 1080), quality=85):
+    """S3Service.compress_image before the fast decode path"""
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    img.thumbnail(max_size, Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def photo_like(size, seed):
+    """Smooth shapes plus sensor grain; pure noise would make encoding dominate"""
+    coarse = Image.merge('RGB', [
+        Image.effect_noise((size[0] // 64, size[1] // 64), 60 + seed + c).convert('L') for c in range(3)
+    ])
+    grain = Image.effect_noise(size, 8).convert('RGB')
+    return Image.blend(coarse.resize(size, Image.Resampling.BICUBIC), grain, 0.15)
+
+
+def make_corpus():
+    """(name, bytes) samples covering the slow cases"""
+    corpus = []
+    for i, size in enumerate([(4032, 3024), (4000, 3000), (3024, 4032)]):
+        img = photo_like(size, i)
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Rotated 90° CW, as most phones store portrait shots
+        exif.get_ifd(0x8825)[2] = (31.0, 30.0, 0.0)  # GPS latitude
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=92, exif=exif)
+        corpus.append((f'phone_{size[0]}x{size[1]}.jpg', output.getvalue()))
+
+    img = photo_like((2400, 1600), 5).convert('RGBA')
+    img.putalpha(Image.linear_gradient('L').resize(img.size))
+    output = io.BytesIO()
+    img.save(output, format='PNG')
+    corpus.append(('alpha_2400x1600.png', output.getvalue()))
+    return corpus
+
+
+def load_corpus(directory):
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        if name.rsplit('.', 1)[-1].lower() in ('jpg', 'jpeg', 'png'):
+            with open(os.path.join(directory, name), 'rb') as f:
+                corpus.append((name, f.read()))
+    return corpus
+
+
+def timed(fn, data, repeat):
+    """Median wall time in ms and the last output"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = fn(data)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), output
+
+
+def describe(output):
+    img = Image.open(io.BytesIO(output))
+    gps = bool(img.getexif().get_ifd(0x8825))
+    return f"{img.width}x{img.height} {len(output) // 1024} KB{' GPS!' if gps else ''}"
+
+
+def run(corpus, repeat):
+    print(f"📸 {len(corpus)} images, median of {repeat} runs")
+    legacy_total = fast_total = 0
+    for name, data in corpus:
+        legacy_ms, legacy_out = timed(legacy_compress, data, repeat)
+        fast_ms, fast_out = timed(compress_image_bytes, data, repeat)
+        legacy_total += legacy_ms
+        fast_total += fast_ms
+        print(f"   {name}")
+        print(f"      legacy: {legacy_ms:7.1f} ms  {describe(legacy_out)}")
+        print(f"      fast:   {fast_ms:7.1f} ms  {describe(fast_out)}")
+
+    print(f"   compress speed-up: {legacy_total / fast_total:.1f}x")
+
+    derivative_ms = [
+        timed(lambda d: make_derivatives(d, DERIVATIVE_WIDTHS, DERIVATIVE_FORMATS), data, repeat)[0]
+        for _, data in corpus
+    ]
+    print(f"   derivatives ({len(DERIVATIVE_WIDTHS)} widths x {len(DERIVATIVE_FORMATS)} formats): "
+          f"{statistics.mean(derivative_ms):.1f} ms per image")
+    return True
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    repeat = 3
+    if '--repeat' in sys.argv:
+        repeat = int(sys.argv[sys.argv.index('--repeat') + 1])
+        args.remove(str(repeat))
+
+    if args:
+        corpus = load_corpus(args[0])
+        if not corpus:
+            print(f"❌ No jpg/png images in {args[0]}")
+            sys.exit(1)
+    else:
+        corpus = make_corpus()
+
+    sys.exit(0 if run(corpus, repeat) else 1)
@@ -0,0 +1,115 @@
+"""
+Benchmark the parallel image upload pipeline against the serial path
+Usage: python scripts/benchmark_image_upload.py [images] [latency_ms]
+       python scripts/benchmark_image_upload.py 10 80 --endpoint http://localhost:9000
+
+Without --endpoint uploads go to an in-memory S3 stand-in that sleeps
+latency_ms per PUT. With --endpoint they go to a local S3-compatible server
+(e.g. MinIO) using S3_BUCKET_NAME and the AWS_* credentials.
+"""
+
+import sys
+import os
+import io
+import time
+import threading
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+from app import create_app
+from app.services.s3_service import S3Service
+from app.services.image_pipeline import ImageUploadPipeline
+
+
+class LocalS3:
+    """In-memory stand-in for the S3 client with a fixed per-request latency"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def _store(self, key, body):
+        time.sleep(self.latency)
+        with self._lock:
+            self.objects[key] = body
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self._store(key, fileobj.read())
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self._store(Key, Body)
+
+
+def make_images(count, size=(4032, 3024)):
+    """Camera-sized JPEGs with enough detail to make resizing realistic"""
+    images = []
+    for i in range(count):
+        img = Image.effect_noise(size, 40 + i).convert('RGB')
+        output = io.BytesIO()
+        img.save(output, format='JPEG', quality=92)
+        images.append(output.getvalue())
+    return images
+
+
+def as_files(images):
+    return [
+        FileStorage(stream=io.BytesIO(data), filename=f'photo_{i}.jpg', content_type='image/jpeg')
+        for i, data in enumerate(images)
+    ]
+
+
+def serial_upload(files):
+    """The previous implementation: compress and upload one file at a time"""
+    return [S3Service.upload_file(file, 'benchmark', True) for file in files]
+
+
+def run(count, latency_ms, endpoint=None):
+    app = create_app()
+
+    with app.app_context():
+        if endpoint:
+            app.config['S3_ENDPOINT_URL'] = endpoint
+        else:
+            app.config['S3_BUCKET_NAME'] = app.config.get('S3_BUCKET_NAME') or 'benchmark'
+            stand_in = LocalS3(latency_ms / 1000)
+            S3Service.get_s3_client = staticmethod(lambda: stand_in)
+
+        images = make_images(count)
+        print(f"📸 {count} images, {sum(map(len, images)) // 1024} KB total, "
+              f"{'endpoint ' + endpoint if endpoint else f'{latency_ms} ms simulated PUT latency'}")
+
+        # Warm up the process pool so its start-up isn't billed to one run
+        ImageUploadPipeline.upload_files(as_files(images[:1]), 'benchmark')
+
+        start = time.perf_counter()
+        serial_urls = serial_upload(as_files(images))
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        results = ImageUploadPipeline.upload_files(as_files(images), 'benchmark')
+        parallel = time.perf_counter() - start
+
+        failed = [r.to_dict() for r in results if not r.ok]
+        print(f"   serial:   {serial:.2f}s ({sum(1 for u in serial_urls if u)}/{count} uploaded)")
+        print(f"   parallel: {parallel:.2f}s ({count - len(failed)}/{count} uploaded)")
+        print(f"   speed-up: {serial / parallel:.1f}x")
+        for failure in failed:
+            print(f"   - {failure}")
+        return not failed
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    endpoint = None
+    if '--endpoint' in sys.argv:
+        endpoint = sys.argv[sys.argv.index('--endpoint') + 1]
+        args.remove(endpoint)
+
+    count = int(args[0]) if args else 10
+    latency_ms = int(args[1]) if len(args) > 1 else 80
+    sys.exit(0 if run(count, latency_ms, endpoint) else 1)
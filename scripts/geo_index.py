@@ -0,0 +1,37 @@
+"""
+Script to maintain property geohashes and the map cluster cells
+Usage: python scripts/geo_index.py rebuild
+
+Run `rebuild` once after the geohash and geo cell migrations; afterwards
+both are kept current on every save. Running it nightly also repairs cells
+that concurrent edits to the same area left stale.
+"""
+
+import sys
+import os
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from app import create_app
+from app.services.geo_index import GeoIndex
+
+
+def rebuild():
+    """Recompute every property's geohash and the cluster cells"""
+    app = create_app()
+
+    with app.app_context():
+        changed, written = GeoIndex.rebuild()
+        print(f"✅ Updated geohash for {changed} properties")
+        print(f"✅ Rebuilt {written} cluster cells")
+        return True
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2 or sys.argv[1] != 'rebuild':
+        print("Usage: python scripts/geo_index.py rebuild")
+        sys.exit(1)
+
+    sys.exit(0 if rebuild() else 1)
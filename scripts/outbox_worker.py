@@ -0,0 +1,76 @@
+"""
+Script to deliver queued push notifications and Pusher events
+Usage: python scripts/outbox_worker.py run
+       python scripts/outbox_worker.py drain
+       python scripts/outbox_worker.py retry [event_id ...]
+       python scripts/outbox_worker.py purge [days]
+
+`run` polls forever; use it when the web processes run with OUTBOX_WORKERS=0.
+Run `purge` daily to delete old delivered events.
+"""
+
+import sys
+import os
+import time
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from app import create_app
+from app.services.outbox_service import OutboxService
+
+
+def run(args):
+    """Deliver events as they become due until interrupted"""
+    app = create_app()
+
+    with app.app_context():
+        poll_seconds = app.config['OUTBOX_POLL_SECONDS']
+        print(f"🚀 Outbox worker polling every {poll_seconds}s")
+        while True:
+            if not OutboxService.drain():
+                time.sleep(poll_seconds)
+
+
+def drain(args):
+    """Deliver every event that is due now"""
+    app = create_app()
+
+    with app.app_context():
+        processed = OutboxService.drain()
+        print(f"✅ Processed {processed} outbox events")
+        return True
+
+
+def retry(args):
+    """Requeue failed events"""
+    app = create_app()
+
+    with app.app_context():
+        count = OutboxService.retry_failed([int(arg) for arg in args] or None)
+        print(f"✅ Requeued {count} failed events")
+        return True
+
+
+def purge(args):
+    """Delete delivered events"""
+    app = create_app()
+
+    with app.app_context():
+        days = int(args[0]) if args else 7
+        count = OutboxService.purge_delivered(days)
+        print(f"✅ Deleted {count} delivered events older than {days} days")
+        return True
+
+
+COMMANDS = {'run': run, 'drain': drain, 'retry': retry, 'purge': purge}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print("Usage: python scripts/outbox_worker.py <run|drain|retry|purge> [args ...]")
+        print("Example: python scripts/outbox_worker.py retry 41 42")
+        sys.exit(1)
+
+    sys.exit(0 if COMMANDS[sys.argv[1]](sys.argv[2:]) else 1)
@@ -0,0 +1,65 @@
+"""
+Script to maintain property_images rows and their resized derivatives
+Usage: python scripts/property_images.py sync [property_id ...]
+       python scripts/property_images.py generate [property_id ...]
+
+`sync` creates rows for listings whose photos predate property_images and
+queues derivative generation; `generate` builds missing derivatives now.
+"""
+
+import sys
+import os
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from app import create_app
+from extensions import db
+from app.models.property_image import PropertyImage, PropertyImageStatus
+from app.services.property_image_service import PropertyImageService
+
+
+def sync(property_ids=None):
+    """Create or refresh rows from Property.images"""
+    app = create_app()
+
+    with app.app_context():
+        count = PropertyImageService.backfill(property_ids)
+        print(f"✅ Synced photos of {count} properties")
+        return True
+
+
+def generate(property_ids=None):
+    """Generate derivatives for photos that don't have them yet"""
+    app = create_app()
+
+    with app.app_context():
+        query = PropertyImage.query.filter_by(status=PropertyImageStatus.PENDING.value)
+        if property_ids:
+            query = query.filter(PropertyImage.property_id.in_(property_ids))
+
+        urls = sorted({photo.original_url for photo in query.all()})
+        failed = 0
+        for url in urls:
+            try:
+                PropertyImageService.generate(url)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                failed += 1
+                print(f"   - {url}: {e}")
+
+        print(f"{'❌' if failed else '✅'} Generated derivatives for {len(urls) - failed}/{len(urls)} photos")
+        return not failed
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ('sync', 'generate'):
+        print("Usage: python scripts/property_images.py <sync|generate> [property_id ...]")
+        print("Example: python scripts/property_images.py generate 12 15")
+        sys.exit(1)
+
+    ids = [int(arg) for arg in sys.argv[2:]] or None
+    command = sync if sys.argv[1] == 'sync' else generate
+    sys.exit(0 if command(ids) else 1)
@@ -0,0 +1,82 @@
+"""
+Script to find and delete S3 objects no database row refers to
+Usage: python scripts/storage_sweeper.py sweep [--dry-run] [prefix ...]
+       python scripts/storage_sweeper.py run [interval_hours]
+       python scripts/storage_sweeper.py recount
+
+`sweep` queues orphans for the outbox workers to delete and forgets expired
+upload grant redemptions; run it daily from cron, or keep `run` going to
+sweep every interval_hours (default 24).
+`recount` recomputes the reference counts of deduplicated uploads.
+"""
+
+import sys
+import os
+import time
+
+# Add project root to Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Now import
+from app import create_app
+from app.services.storage_cleanup_service import StorageCleanupService, SWEEP_PREFIXES
+from app.services.content_store import ContentStore
+from app.services.upload_grant_service import UploadGrantService
+
+
+def sweep(args):
+    """Queue deletion of orphaned objects once"""
+    dry_run = '--dry-run' in args
+    prefixes = [arg for arg in args if not arg.startswith('--')] or SWEEP_PREFIXES
+    app = create_app()
+
+    with app.app_context():
+        try:
+            result = StorageCleanupService.sweep_orphans(prefixes, dry_run=dry_run)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+
+        for key in result['orphans'][:20]:
+            print(f"   - {key}")
+        if len(result['orphans']) > 20:
+            print(f"   ... and {len(result['orphans']) - 20} more")
+
+        action = 'would be deleted' if dry_run else 'queued for deletion'
+        print(f"✅ Scanned {result['scanned']} objects in {', '.join(prefixes)}; "
+              f"{len(result['orphans'])} orphans {action}")
+
+        if not dry_run:
+            print(f"✅ Forgot {UploadGrantService.purge_redeemed()} expired upload grant redemptions")
+        return True
+
+
+def run(args):
+    """Sweep every interval until interrupted"""
+    interval_hours = float(args[0]) if args else 24
+    print(f"🚀 Sweeping for orphaned objects every {interval_hours}h")
+    while True:
+        sweep([])
+        time.sleep(interval_hours * 3600)
+
+
+def recount(args):
+    """Recompute stored file reference counts from property photos"""
+    app = create_app()
+
+    with app.app_context():
+        changed = ContentStore.recount()
+        print(f"✅ Corrected {changed} reference counts")
+        return True
+
+
+COMMANDS = {'sweep': sweep, 'run': run, 'recount': recount}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print("Usage: python scripts/storage_sweeper.py <sweep|run|recount> [args ...]")
+        print("Example: python scripts/storage_sweeper.py sweep --dry-run cnic/")
+        sys.exit(1)
+
+    sys.exit(0 if COMMANDS[sys.argv[1]](sys.argv[2:]) else 1)